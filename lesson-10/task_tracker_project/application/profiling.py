@@ -0,0 +1,201 @@
+import cProfile
+import io
+import marshal
+import pstats
+import random
+import threading
+import tracemalloc
+from collections import deque
+from contextlib import ExitStack
+from time import perf_counter, time
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse, JsonResponse
+
+# Per-request profiling, off unless settings.PROFILING_ENABLED: when off the
+# middleware removes itself from the chain (MiddlewareNotUsed) and costs
+# nothing. When on, every response gets a Server-Timing header
+#   total;dur=12.3, db;dur=4.1;desc="3 queries", render;dur=1.2
+# (render: template responses only, the JSON views of tracker have none),
+# and per-view totals are kept for GET /profiling/. A
+# settings.PROFILING_SAMPLE_RATE share of requests also runs under cProfile
+# and tracemalloc (adds mem to the header); the last settings.PROFILING_KEEP
+# of those are served by GET /profiling/<id>/ as pstats text, or
+# ?format=prof for snakeviz and co.
+# One sampled request at a time, both tools are process wide. Everything is
+# per process. Times of streaming responses stop when the body starts.
+
+
+class QueryTimer:
+    # connection.execute_wrapper counting queries and their time
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        t1 = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += perf_counter() - t1
+
+
+class Profiles:
+    def __init__(self):
+        self.views = {}
+        self.samples = deque()
+        self._ids = 0
+        self._lock = threading.Lock()
+        self.sampling = threading.Lock()
+
+    def record(self, view, seconds, queries, db_seconds, render_seconds):
+        with self._lock:
+            totals = self.views.setdefault(
+                view, {'requests': 0, 'seconds': 0.0, 'queries': 0, 'db_seconds': 0.0, 'render_seconds': 0.0},
+            )
+            totals['requests'] += 1
+            totals['seconds'] += seconds
+            totals['queries'] += queries
+            totals['db_seconds'] += db_seconds
+            totals['render_seconds'] += render_seconds
+
+    def add_sample(self, profiler, **info):
+        with self._lock:
+            self._ids += 1
+            self.samples.append((self._ids, profiler, dict(info, id=self._ids, at=time())))
+            while len(self.samples) > getattr(settings, 'PROFILING_KEEP', 50):
+                self.samples.popleft()
+            return self._ids
+
+    def sample(self, sample_id):
+        with self._lock:
+            for found, profiler, _ in self.samples:
+                if found == sample_id:
+                    return profiler
+        return None
+
+    def summary(self):
+        with self._lock:
+            views = sorted(self.views.items(), key=lambda item: -item[1]['seconds'])
+            return {
+                'views': [dict(totals, view=view) for view, totals in views],
+                'samples': [info for _, _, info in reversed(self.samples)],
+            }
+
+    def clear(self):
+        with self._lock:
+            self.views.clear()
+            self.samples.clear()
+
+
+profiles = Profiles()
+
+
+def view_name(request):
+    # ViewSet.action or view class, for function views module.function
+    match = request.resolver_match
+    if match is None:
+        return 'unresolved'
+    func = match.func
+    cls = getattr(func, 'cls', None) or getattr(func, 'view_class', None)
+    if cls is None:
+        return f'{func.__module__}.{func.__name__}'
+    action = (getattr(func, 'actions', None) or {}).get(request.method.lower())
+    return f'{cls.__name__}.{action}' if action else cls.__name__
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        sampled = (
+            random.random() < getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+            and profiles.sampling.acquire(blocking=False)
+        )
+        profiler = peak = None
+        t1 = perf_counter()
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(timer))
+            if sampled:
+                tracemalloc.start()
+                profiler = cProfile.Profile()
+                profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                if sampled:
+                    profiler.disable()
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                    profiles.sampling.release()
+        total = perf_counter() - t1
+
+        render = getattr(request, '_profiling_render', None)
+        view = view_name(request)
+        profiles.record(view, total, timer.count, timer.seconds, render or 0.0)
+
+        timings = [
+            f'total;dur={total * 1000:.1f}',
+            f'db;dur={timer.seconds * 1000:.1f};desc="{timer.count} queries"',
+        ]
+        if render is not None:
+            timings.append(f'render;dur={render * 1000:.1f}')
+        if sampled:
+            sample_id = profiles.add_sample(
+                profiler, view=view, path=request.get_full_path(), seconds=total,
+                queries=timer.count, db_seconds=timer.seconds, peak_memory=peak,
+            )
+            timings.append(f'mem;desc="peak {peak / 2 ** 20:.2f} MiB"')
+            timings.append(f'profile;desc="{sample_id}"')
+        response['Server-Timing'] = ', '.join(timings)
+        return response
+
+    def process_template_response(self, request, response):
+        # the last hook before response.render(), the callback runs right
+        # after it: inner middlewares' response handling is not counted
+        started = perf_counter()
+
+        def rendered(response):
+            request._profiling_render = perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+@staff_member_required
+def profiling_summary(request):
+    if not getattr(settings, 'PROFILING_ENABLED', False):
+        raise Http404
+    return JsonResponse(profiles.summary())
+
+
+@staff_member_required
+def profiling_sample(request, sample_id):
+    profiler = profiles.sample(sample_id)
+    if not getattr(settings, 'PROFILING_ENABLED', False) or profiler is None:
+        raise Http404
+    if request.GET.get('format') == 'prof':
+        # what cProfile's dump_stats() writes
+        profiler.create_stats()
+        response = HttpResponse(marshal.dumps(profiler.stats), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="profile-{sample_id}.prof"'
+        return response
+    sort = request.GET.get('sort', 'cumulative')
+    if sort not in pstats.Stats.sort_arg_dict_default:
+        sort = 'cumulative'
+    try:
+        limit = int(request.GET.get('limit', 60))
+    except ValueError:
+        limit = 60
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats(sort).print_stats(limit)
+    return HttpResponse(out.getvalue(), content_type='text/plain; charset=utf-8')
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,6 +47,10 @@ CELERY_BEAT_SCHEDULE = {
         'schedule': 25,
         # 'options': {'queue': 'queue2'}
     },
+    'send-queued-mail': {
+        'task': 'tracker.tasks.send_queued_mail',
+        'schedule': 60,
+    },
 
 }
 
@@ -65,6 +70,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'application.profiling.ProfilingMiddleware',
+    'tracker.instrumentation.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -101,7 +108,9 @@ WSGI_APPLICATION = 'application.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('TRACKER_DB', BASE_DIR / 'db.sqlite3'),
+        # the tracker API reuses its SQLite connection for 60 s, a local file has no server to drop it
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
     }
 }
 
@@ -112,6 +121,23 @@ ELASTICSEARCH_DSL = {
     },
 }
 
+# tracker.metrics: directory for the metric files of all gunicorn and celery
+# worker processes, served together by /metrics. Unset: per process only
+METRICS_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+# tracker.mail: seconds queued mail waits for more mail to the same recipient,
+# and after which mail claimed by a worker that never finished is sent again
+TRACKER_MAIL_BATCH_WINDOW = 10
+TRACKER_MAIL_CLAIM_TIMEOUT = 600
+
+# application.profiling: Server-Timing headers and per-view totals, plus
+# cProfile of a PROFILING_SAMPLE_RATE share of requests (the last
+# PROFILING_KEEP are kept); /profiling/ for staff. PROFILING=1 in the
+# environment turns it on
+PROFILING_ENABLED = os.environ.get('PROFILING') == '1'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0.01))
+PROFILING_KEEP = 50
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -16,7 +16,13 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from application.profiling import profiling_sample, profiling_summary
+from tracker.views import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('tracker/', include('tracker.urls')),
+    path('profiling/', profiling_summary),
+    path('profiling/<int:sample_id>/', profiling_sample),
+    path('metrics', metrics, name='metrics'),
 ]
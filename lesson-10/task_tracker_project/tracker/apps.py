@@ -4,3 +4,18 @@ from django.apps import AppConfig
 class TrackerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tracker'
+
+    def ready(self):
+        from celery.signals import task_postrun, task_prerun
+        from django.conf import settings
+        from elasticsearch_dsl import connections
+
+        from tracker import instrumentation
+
+        task_prerun.connect(instrumentation.task_prerun, dispatch_uid='tracker_metrics_prerun')
+        task_postrun.connect(instrumentation.task_postrun, dispatch_uid='tracker_metrics_postrun')
+        # the connections of settings.ELASTICSEARCH_DSL, timing every request
+        connections.configure(**{
+            alias: dict(options, transport_class=instrumentation.InstrumentedTransport)
+            for alias, options in settings.ELASTICSEARCH_DSL.items()
+        })
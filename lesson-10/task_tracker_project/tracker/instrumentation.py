@@ -0,0 +1,81 @@
+from time import perf_counter
+
+from elasticsearch import Transport
+
+from .metrics import Counter, Histogram
+
+# What tracker measures, see tracker.metrics for how. Views through
+# MetricsMiddleware, celery tasks through worker signals (connected in
+# TrackerConfig.ready), elasticsearch through the transport class set in
+# settings.ELASTICSEARCH_DSL.
+
+HTTP_REQUESTS = Counter(
+    'tracker_http_requests_total', 'HTTP requests by view, method and status.', ['view', 'method', 'status'],
+)
+HTTP_SECONDS = Histogram(
+    'tracker_http_request_duration_seconds', 'Time spent in Django per request.', ['view', 'method'],
+)
+MAIL_SECONDS = Histogram(
+    'tracker_mail_send_duration_seconds', 'Time spent sending a batch of queued mail over SMTP.',
+)
+TASK_SECONDS = Histogram(
+    'tracker_celery_task_duration_seconds', 'Celery task run time by final state.', ['task', 'state'],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0),
+)
+ES_SECONDS = Histogram(
+    'tracker_elasticsearch_request_duration_seconds', 'Elasticsearch requests by method and API.',
+    ['method', 'api', 'outcome'],
+)
+
+
+def view_name(request):
+    match = request.resolver_match
+    return match.view_name if match is not None else 'unresolved'
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        t1 = perf_counter()
+        # exceptions of the view come back as 500 responses
+        response = self.get_response(request)
+        view = view_name(request)
+        HTTP_SECONDS.labels(view, request.method).observe(perf_counter() - t1)
+        HTTP_REQUESTS.labels(view, request.method, response.status_code).inc()
+        return response
+
+
+_task_started = {}
+
+
+def task_prerun(sender=None, task_id=None, **kwargs):
+    _task_started[task_id] = perf_counter()
+
+
+def task_postrun(sender=None, task_id=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        TASK_SECONDS.labels(sender.name, state or 'UNKNOWN').observe(perf_counter() - started)
+
+
+def es_api(url):
+    # /ven/_search -> _search, /ven/_doc/1 -> _doc, /ven -> index
+    parts = [part for part in url.split('?', 1)[0].split('/') if part]
+    for part in parts:
+        if part.startswith('_'):
+            return part
+    return 'index' if parts else 'root'
+
+
+class InstrumentedTransport(Transport):
+    def perform_request(self, method, url, *args, **kwargs):
+        outcome = 'error'
+        t1 = perf_counter()
+        try:
+            result = super().perform_request(method, url, *args, **kwargs)
+            outcome = 'ok'
+            return result
+        finally:
+            ES_SECONDS.labels(method, es_api(url), outcome).observe(perf_counter() - t1)
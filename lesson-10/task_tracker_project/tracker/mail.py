@@ -0,0 +1,91 @@
+import datetime
+import logging
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .instrumentation import MAIL_SECONDS
+from .models import QueuedMail
+
+# Mail out of the request path: queue_mail() stores one row per recipient
+# and schedules tracker.tasks.send_queued_mail settings.TRACKER_MAIL_BATCH_WINDOW
+# seconds later (once per window and process). That run takes every queued
+# row, merges the mails each recipient got in the meantime into one and
+# sends them all over a single SMTP connection. Rows are deleted as soon as
+# their message is sent; a failed run puts the rest back, and rows of a run
+# that died are taken again after settings.TRACKER_MAIL_CLAIM_TIMEOUT
+# seconds. The beat entry in settings sends whatever is left every minute,
+# also when scheduling the run failed: the request does not depend on the
+# broker either.
+
+logger = logging.getLogger(__name__)
+
+FLUSH_KEY = 'tracker:mail:flush-scheduled'
+
+
+def schedule_flush(window):
+    from .tasks import send_queued_mail
+
+    try:
+        # no retries, a broker that is down would hold the request
+        send_queued_mail.apply_async(countdown=window, retry=False)
+    except Exception:
+        logger.exception('could not schedule send_queued_mail, the beat entry sends the queued mail')
+
+
+def queue_mail(subject, message, from_email, recipient_list):
+    QueuedMail.objects.bulk_create([
+        QueuedMail(from_email=from_email, recipient=recipient, subject=subject, body=message)
+        for recipient in recipient_list
+    ])
+    window = settings.TRACKER_MAIL_BATCH_WINDOW
+    if cache.add(FLUSH_KEY, True, window):
+        transaction.on_commit(lambda: schedule_flush(window))
+
+
+def coalesce(mails):
+    # [(EmailMessage, ids of its rows)], one per (sender, recipient):
+    # repeated mails are sent once, different ones are joined in order
+    groups = OrderedDict()
+    ids = {}
+    for mail in mails:
+        contents = groups.setdefault((mail.from_email, mail.recipient), OrderedDict())
+        contents.setdefault((mail.subject, mail.body), None)
+        ids.setdefault((mail.from_email, mail.recipient), []).append(mail.id)
+    messages = []
+    for (from_email, recipient), contents in groups.items():
+        contents = list(contents)
+        if len(contents) == 1:
+            subject, body = contents[0]
+        else:
+            subject = f'{len(contents)} notifications'
+            body = '\n\n'.join(f'{part_subject}\n\n{part_body}' for part_subject, part_body in contents)
+        messages.append((EmailMessage(subject, body, from_email, [recipient]), ids[from_email, recipient]))
+    return messages
+
+
+def send_queued():
+    # number of messages sent
+    batch = uuid.uuid4().hex
+    now = timezone.now()
+    stale = now - datetime.timedelta(seconds=getattr(settings, 'TRACKER_MAIL_CLAIM_TIMEOUT', 600))
+    QueuedMail.objects.filter(Q(batch='') | Q(claimed_at__lt=stale)).update(batch=batch, claimed_at=now)
+    queued = QueuedMail.objects.filter(batch=batch)
+    messages = coalesce(queued.order_by('id'))
+    if not messages:
+        return 0
+    try:
+        with MAIL_SECONDS.time(), get_connection(fail_silently=False) as connection:
+            for message, ids in messages:
+                connection.send_messages([message])
+                QueuedMail.objects.filter(id__in=ids).delete()
+    except Exception:
+        queued.update(batch='', claimed_at=None)
+        raise
+    return len(messages)
@@ -0,0 +1,87 @@
+import datetime
+import random
+import statistics
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.test import Client
+
+from tracker.models import Task
+
+# Grows the tasks table to each of --sizes and times the list/detail API at
+# each size; with keyset pages and the (filter, id) indexes the times should
+# not grow with the table. Adds rows to the configured database, run it on a
+# scratch one:
+#   TRACKER_DB=/tmp/tasks.sqlite3 python manage.py migrate
+#   TRACKER_DB=/tmp/tasks.sqlite3 python manage.py bench_tasks
+
+STATUSES = [status for status, _ in Task.STATUS_CHOICES]
+
+
+def seed(target, owners, batch_size=10_000):
+    rnd = random.Random(Task.objects.count())
+    start = datetime.date(2030, 1, 1)
+    while (count := Task.objects.count()) < target:
+        size = min(batch_size, target - count)
+        batch = [
+            Task(
+                title=f'Задача {count + i}',
+                status=rnd.choice(STATUSES),
+                owner_id=rnd.choice(owners),
+                due_date=start + datetime.timedelta(days=rnd.randrange(3650)) if rnd.random() > 0.2 else None,
+            )
+            for i in range(size)
+        ]
+        with transaction.atomic():
+            Task.objects.bulk_create(batch)
+
+
+def measure(client, url, requests, **headers):
+    timings = []
+    status = None
+    for _ in range(requests):
+        t1 = perf_counter()
+        response = client.get(url, **headers)
+        timings.append(perf_counter() - t1)
+        status = response.status_code
+    timings.sort()
+    return status, statistics.median(timings), timings[int(len(timings) * 0.99)]
+
+
+class Command(BaseCommand):
+    help = 'Latency of the tasks API as the table grows to 1M rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('-n', '--requests', type=int, default=200, help='requests per url and size')
+
+    def handle(self, *args, sizes, requests, **options):
+        User = get_user_model()
+        owners = [User.objects.get_or_create(username=f'bench-owner-{i}')[0].id for i in range(50)]
+        client = Client(HTTP_HOST='localhost')
+
+        for size in sorted(sizes):
+            t1 = perf_counter()
+            seed(size, owners)
+            self.stdout.write(f'\n{Task.objects.count()} tasks (seeded in {perf_counter() - t1:.1f}s)')
+
+            last_id = Task.objects.aggregate(Max('id'))['id__max']
+            deep = client.get('/tracker/?ordering=due_date&due_after=2039-06-01&limit=1').json()['tasks'][0]
+            urls = {
+                'first page': '/tracker/',
+                'deep page': f'/tracker/?after={last_id - 500}',
+                'status, deep': f'/tracker/?status=done&after={last_id - 5000}',
+                'owner': f'/tracker/?owner={owners[7]}',
+                'due date, deep': f'/tracker/?ordering=due_date&after={deep["due_date"]}_{deep["id"]}',
+                'projection': '/tracker/?fields=id,status&limit=1000',
+                'detail': f'/tracker/{last_id // 2}/',
+            }
+            for name, url in urls.items():
+                status, p50, p99 = measure(client, url, requests)
+                self.stdout.write(f'  {name:<15} {status} p50 {p50 * 1000:7.2f} ms  p99 {p99 * 1000:7.2f} ms')
+            etag = client.get('/tracker/').headers['ETag']
+            status, p50, p99 = measure(client, '/tracker/', requests, HTTP_IF_NONE_MATCH=etag)
+            self.stdout.write(f'  {"not modified":<15} {status} p50 {p50 * 1000:7.2f} ms  p99 {p99 * 1000:7.2f} ms')
@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-19 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0002_task'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='queuedmail',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
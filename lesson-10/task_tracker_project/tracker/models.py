@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 
 
@@ -7,3 +8,52 @@ class AutoVenicle(models.Model):
 
     def __str__(self):
         return '%s' % (self.name)
+
+
+class QueuedMail(models.Model):
+    # one recipient per row; deleted by tracker.tasks.send_queued_mail once
+    # sent, `batch` and `claimed_at` mark the rows a run claimed
+    from_email = models.CharField(max_length=254)
+    recipient = models.CharField(max_length=254)
+    subject = models.CharField(max_length=998)
+    body = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    batch = models.CharField(max_length=32, blank=True, default='', db_index=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return '%s: %s' % (self.recipient, self.subject)
+
+
+class Task(models.Model):
+    STATUS_NEW = 'new'
+    STATUS_IN_PROGRESS = 'in_progress'
+    STATUS_DONE = 'done'
+    STATUS_CHOICES = [
+        (STATUS_NEW, 'New'),
+        (STATUS_IN_PROGRESS, 'In progress'),
+        (STATUS_DONE, 'Done'),
+    ]
+
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True, default='')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_NEW)
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name='tasks',
+        db_index=False,  # covered by task_owner_id_idx
+    )
+    due_date = models.DateField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # the list is paged by id (WHERE id > last ORDER BY id); with the
+        # filter column first every filtered page is one index range
+        indexes = [
+            models.Index(fields=['status', 'id'], name='task_status_id_idx'),
+            models.Index(fields=['owner', 'id'], name='task_owner_id_idx'),
+            models.Index(fields=['due_date', 'id'], name='task_due_date_id_idx'),
+        ]
+
+    def __str__(self):
+        return '%s' % (self.title)
@@ -3,6 +3,8 @@ from celery import shared_task
 
 from application import celery_app
 
+from . import mail
+
 
 @celery_app.task()
 def add(x, y):
@@ -17,3 +19,8 @@ def some_sleep(seconds):
 @shared_task
 def increment(num):
     return num + 1
+
+
+@shared_task(ignore_result=True)
+def send_queued_mail():
+    return mail.send_queued()
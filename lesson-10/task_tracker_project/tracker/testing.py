@@ -0,0 +1,83 @@
+import socketserver
+import threading
+import time
+
+# A minimal SMTP server on 127.0.0.1 for tests, keeping what it receives:
+#   with LocalSMTPServer() as server:
+#       with override_settings(EMAIL_HOST='127.0.0.1', EMAIL_PORT=server.port): ...
+#   server.messages -> [(sender, recipients, data)], server.connections
+# `delay` seconds before every reply stand in for a slow mail server,
+# recipients in `reject` are refused.
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        with self.server.lock:
+            self.server.connections += 1
+        sender, recipients = None, []
+        self.reply('220 localhost ESMTP stand-in')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii', 'replace').strip()
+            verb = command[:4].upper()
+            if verb in ('HELO', 'EHLO'):
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                sender, recipients = command.split(':', 1)[1].strip().strip('<>'), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipient = command.split(':', 1)[1].strip().strip('<>')
+                if recipient in self.server.reject:
+                    self.reply('550 No such user')
+                    continue
+                recipients.append(recipient)
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for data_line in self.rfile:
+                    if data_line in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(data_line[1:] if data_line.startswith(b'..') else data_line)
+                with self.server.lock:
+                    self.server.messages.append((sender, recipients, b''.join(data)))
+                self.reply('250 OK')
+            elif verb in ('RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, delay=0.0, reject=()):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.delay = delay
+        self.reject = set(reject)
+        self.connections = 0
+        self.messages = []
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
@@ -1,3 +1,305 @@
-from django.test import TestCase
+# pylint: disable=C0114,C0115,C0116
+import datetime
+import json
+import os
+import smtplib
+import tempfile
+import threading
+from time import perf_counter
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from tracker.mail import queue_mail, send_queued
+from tracker.metrics import Counter, Histogram, registry
+from tracker.models import QueuedMail, Task
+from tracker.testing import LocalSMTPServer
+
+
+class TestMetrics(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def lines(self, name):
+        return [line for line in registry.exposition().splitlines() if line.startswith(name)]
+
+    def test_counter_sums_threads(self):
+        counter = Counter('test_threads_total', 'Test.', ['kind'])
+
+        def work():
+            for _ in range(1000):
+                counter.labels('a').inc()
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counter.labels('b "quoted"').inc(2)
+        self.assertEqual(self.lines('test_threads_total'), [
+            'test_threads_total{kind="a"} 4000.0',
+            'test_threads_total{kind="b \\"quoted\\""} 2.0',
+        ])
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram('test_seconds', 'Test.', buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+        self.assertEqual(self.lines('test_seconds'), [
+            'test_seconds_bucket{le="0.1"} 2.0',
+            'test_seconds_bucket{le="1.0"} 3.0',
+            'test_seconds_bucket{le="+Inf"} 4.0',
+            'test_seconds_sum 3.65',
+            'test_seconds_count 4.0',
+        ])
+
+    def test_files_of_all_processes_are_summed(self):
+        counter = Counter('test_processes_total', 'Test.')
+        with override_settings(METRICS_DIR=self.directory):
+            counter.inc()
+            pids = []
+            for _ in range(3):
+                pid = os.fork()
+                if not pid:
+                    for _ in range(100):
+                        counter.inc()
+                    os._exit(0)
+                pids.append(pid)
+            for pid in pids:
+                os.waitpid(pid, 0)
+            self.assertEqual(len(os.listdir(self.directory)), 4)
+            self.assertEqual(self.lines('test_processes_total'), ['test_processes_total 301.0'])
+
+    def test_one_file_per_process_kept_when_reopened(self):
+        counter = Counter('test_reopen_total', 'Test.')
+        with override_settings(METRICS_DIR=self.directory):
+            threads = [threading.Thread(target=counter.inc) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(os.listdir(self.directory), [f'{os.getpid()}.db'])
+            # as a new process with the same pid would
+            registry._values = None
+            counter.inc()
+            self.assertEqual(self.lines('test_reopen_total'), ['test_reopen_total 5.0'])
+
+    def test_files_grow(self):
+        counter = Counter('test_many_total', 'Test.', ['n'])
+        with override_settings(METRICS_DIR=self.directory):
+            for n in range(5000):
+                counter.labels(n).inc()
+            self.assertEqual(len(self.lines('test_many_total{')), 5000)
+
+    def test_wrong_labels(self):
+        with self.assertRaises(ValueError):
+            Counter('test_labels_total', 'Test.', ['a']).labels('x', 'y')
+
+
+class TestMetricsView(TestCase):
+    def test_requests_are_counted(self):
+        self.client.get('/tracker/1/')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'tracker_http_requests_total{view="chat_detail",method="GET",status="404"} ',
+            response.content.decode(),
+        )
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend', EMAIL_HOST='127.0.0.1',
+    TRACKER_MAIL_BATCH_WINDOW=10,
+)
+class TestQueuedMail(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.smtp = LocalSMTPServer()
+        self.smtp.__enter__()
+        self.addCleanup(self.smtp.__exit__, None, None, None)
+        settings = override_settings(EMAIL_PORT=self.smtp.port)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_task_list_does_not_wait_for_smtp(self):
+        # a mail server taking 2 s per reply
+        self.smtp.delay = 2
+        with mock.patch('tracker.tasks.send_queued_mail.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                started = perf_counter()
+                self.assertEqual(self.client.get('/tracker/').status_code, 200)
+                self.client.get('/tracker/')
+                elapsed = perf_counter() - started
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(self.smtp.connections, 0)
+        self.assertEqual(QueuedMail.objects.count(), 2)
+        # scheduled once per window
+        apply_async.assert_called_once_with(countdown=10, retry=False)
+
+    def test_task_list_does_not_need_the_broker(self):
+        error = ConnectionRefusedError(111, 'Connection refused')
+        with mock.patch('tracker.tasks.send_queued_mail.apply_async', side_effect=error):
+            with self.assertLogs('tracker.mail', 'ERROR'):
+                with self.captureOnCommitCallbacks(execute=True):
+                    response = self.client.get('/tracker/')
+        self.assertEqual(response.status_code, 200)
+        # left for the beat entry
+        self.assertEqual(QueuedMail.objects.count(), 1)
+
+    def test_batch_is_coalesced_and_sent_over_one_connection(self):
+        queue_mail('A', 'one', 'from@example.com', ['x@example.com', 'y@example.com'])
+        queue_mail('A', 'one', 'from@example.com', ['x@example.com'])
+        queue_mail('B', 'two', 'from@example.com', ['x@example.com'])
+
+        self.assertEqual(send_queued(), 2)
+        self.assertEqual(self.smtp.connections, 1)
+        sent = {recipients[0]: data.decode() for _, recipients, data in self.smtp.messages}
+        self.assertEqual(set(sent), {'x@example.com', 'y@example.com'})
+        self.assertIn('Subject: 2 notifications', sent['x@example.com'])
+        self.assertIn('Subject: A', sent['y@example.com'])
+        self.assertFalse(QueuedMail.objects.exists())
+        self.assertEqual(send_queued(), 0)
+
+    def test_failed_batch_is_kept(self):
+        queue_mail('A', 'one', 'from@example.com', ['x@example.com'])
+        self.smtp.__exit__(None, None, None)
+        with self.assertRaises(OSError):
+            send_queued()
+        self.assertEqual(list(QueuedMail.objects.values_list('batch', flat=True)), [''])
+
+    def test_sent_rows_are_not_sent_again(self):
+        queue_mail('A', 'one', 'from@example.com', ['x@example.com', 'y@example.com'])
+        self.smtp.reject = {'y@example.com'}
+        with self.assertRaises(smtplib.SMTPRecipientsRefused):
+            send_queued()
+        self.assertEqual(list(QueuedMail.objects.values_list('recipient', 'batch')), [('y@example.com', '')])
+
+        self.smtp.reject = set()
+        self.assertEqual(send_queued(), 1)
+        self.assertEqual([recipients for _, recipients, _ in self.smtp.messages], [['x@example.com'], ['y@example.com']])
+
+    def test_rows_of_a_dead_run_are_taken_again(self):
+        queue_mail('A', 'one', 'from@example.com', ['x@example.com'])
+        QueuedMail.objects.update(batch='dead', claimed_at=timezone.now() - datetime.timedelta(seconds=60))
+        self.assertEqual(send_queued(), 0)
+        with override_settings(TRACKER_MAIL_CLAIM_TIMEOUT=30):
+            self.assertEqual(send_queued(), 1)
+        self.assertFalse(QueuedMail.objects.exists())
+
+
+class TestTaskAPI(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner')
+        Task.objects.bulk_create([
+            Task(
+                title=f'Задача {i}', status=Task.STATUS_DONE if i % 3 == 0 else Task.STATUS_NEW,
+                owner=cls.owner if i % 2 else None, due_date=datetime.date(2030, 1, 1 + i % 5) if i % 4 else None,
+            )
+            for i in range(25)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def pages(self, url):
+        tasks = []
+        while url:
+            data = self.client.get(url).json()
+            tasks += data['tasks']
+            url = data['next']
+        return tasks
+
+    def test_keyset_pages_cover_all_tasks(self):
+        tasks = self.pages('/tracker/?limit=10')
+        self.assertEqual([task['id'] for task in tasks], list(Task.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_filtered_pages_keep_filters(self):
+        tasks = self.pages(f'/tracker/?limit=4&status=new&owner={self.owner.id}')
+        expected = Task.objects.filter(status='new', owner=self.owner).order_by('id')
+        self.assertEqual([task['id'] for task in tasks], [task.id for task in expected])
+
+    def test_due_date_ordering(self):
+        tasks = self.pages('/tracker/?limit=3&ordering=due_date&due_after=2030-01-02')
+        expected = Task.objects.filter(due_date__gte='2030-01-02').order_by('due_date', 'id')
+        self.assertEqual([task['id'] for task in tasks], [task.id for task in expected])
+
+    def test_projection(self):
+        data = self.client.get('/tracker/?fields=id,title&limit=1').json()
+        self.assertEqual(list(data['tasks'][0]), ['id', 'title'])
+        task = Task.objects.first()
+        self.assertEqual(set(self.client.get(f'/tracker/{task.id}/').json()), {
+            'id', 'title', 'description', 'status', 'owner_id', 'due_date', 'created_at', 'updated_at',
+        })
+        self.assertEqual(self.client.get('/tracker/?fields=id,secret').status_code, 400)
+
+    def test_page_is_one_query(self):
+        # and the INSERT of the queued mail, see TestQueuedMail
+        with self.assertNumQueries(2):
+            self.client.get('/tracker/?status=done&after=3')
+
+    def test_bad_params(self):
+        for query in ('status=lost', 'owner=x', 'due_after=tomorrow', 'ordering=title', 'after=x',
+                      'ordering=due_date&after=2030-01-01'):
+            self.assertEqual(self.client.get(f'/tracker/?{query}').status_code, 400, query)
+
+    def test_conditional_get(self):
+        response = self.client.get('/tracker/?limit=5')
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/tracker/?limit=5', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Task.objects.filter(id=response.json()['tasks'][0]['id']).update(title='changed')
+        self.assertEqual(self.client.get('/tracker/?limit=5', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_bulk_create(self):
+        tasks = [
+            {'title': f'new {i}', 'status': 'in_progress', 'owner_id': self.owner.id, 'due_date': '2031-05-01'}
+            for i in range(2500)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/tracker/add/', json.dumps(tasks), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        # multi-row inserts (sqlite caps them at 999 parameters), not one per task
+        self.assertLess(len(queries), 30)
+        self.assertEqual(response.json(), {'created': 2500})
+        self.assertEqual(Task.objects.filter(status='in_progress', due_date='2031-05-01').count(), 2500)
+
+    def test_bulk_create_is_all_or_nothing(self):
+        tasks = [{'title': 'ok'}, {'title': ''}, {'title': 'x', 'status': 'lost'}, {'title': 'y', 'owner_id': 10 ** 6}]
+        response = self.client.post('/tracker/add/', json.dumps(tasks), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [1, 2, 3])
+        self.assertEqual(Task.objects.count(), 25)
+
+    def test_wrong_json_types(self):
+        tasks = [
+            {'title': 'a', 'due_date': 12345},
+            {'title': 'a', 'description': None},
+            {'title': 1},
+            {'title': 'a', 'owner_id': True},
+            {'title': 'a', 'owner_id': 1.5},
+            {'title': 'a', 'owner_id': 10 ** 30},
+        ]
+        response = self.client.post('/tracker/add/', json.dumps(tasks), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([list(error['errors']) for error in response.json()['errors']], [
+            ['due_date'], ['description'], ['title'], ['owner_id'], ['owner_id'], ['owner_id'],
+        ])
+
+    def test_huge_owner_param(self):
+        for query in (f'owner={10 ** 30}', f'after={2 ** 63}', 'owner=-1', 'after=1e3', 'limit=٣'):
+            self.assertEqual(self.client.get(f'/tracker/?{query}').status_code, 400, query)
+        # ids are 64-bit
+        response = self.client.get(f'/tracker/?after={2 ** 31}')
+        self.assertEqual((response.status_code, response.json()['tasks']), (200, []))
+
+    def test_form_post_adds_one_task(self):
+        response = self.client.post('/tracker/add/', {'title': 'from a form', 'due_date': '2030-02-03'})
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Task.objects.filter(title='from a form', due_date='2030-02-03').exists())
@@ -1,28 +1,237 @@
-from django.http import JsonResponse
-from django.core.mail import send_mail
-from django.views.decorators.http import require_GET, require_POST
+import datetime
+import json
+import re
+from urllib.parse import urlencode
 
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import conditional_page, require_GET, require_POST
 
+from .mail import queue_mail
+from .metrics import registry
+from .models import Task
+
+# GET  /tracker/?status=&owner=&due_after=&due_before=&ordering=id|due_date
+#           &fields=id,title,...&limit=&after=<cursor from next>
+# GET  /tracker/<id>/?fields=
+# POST /tracker/add/ a task or a JSON list of them
+# Pages are keyset pages (WHERE id > last ORDER BY id, or by due date and
+# id), one index range whatever the depth. GETs answer If-None-Match with
+# 304 (ETag of the body): the query still runs, the transfer does not.
+
+FIELDS = ('id', 'title', 'description', 'status', 'owner_id', 'due_date', 'created_at', 'updated_at')
+DEFAULT_FIELDS = ('id', 'title', 'status', 'owner_id', 'due_date')
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_BULK_TASKS = 10_000
+# ids, limits and cursors fit a 64-bit integer column (tracker ids are
+# BigAutoField)
+MAX_INT = 2 ** 63 - 1
+DIGITS_RE = re.compile(r'[0-9]{1,19}')
+STRING_FIELDS = ('title', 'description', 'status')
+
+
+class InvalidParam(ValueError):
+    pass
+
+
+def bad_request(detail):
+    return JsonResponse({'detail': detail}, status=400)
+
+
+def parse_int(value):
+    # a decimal string or an int (not a bool) from 0 to MAX_INT, else None
+    if isinstance(value, str) and DIGITS_RE.fullmatch(value):
+        value = int(value)
+    if type(value) is not int or not 0 <= value <= MAX_INT:
+        return None
+    return value
+
+
+def int_param(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    value = parse_int(value)
+    if value is None:
+        raise InvalidParam(f'{name} must be an integer from 0 to {MAX_INT}')
+    return value
+
+
+def date_param(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise InvalidParam(f'{name} must be a date, YYYY-MM-DD') from None
+
+
+def fields_param(params, default=DEFAULT_FIELDS):
+    value = params.get('fields')
+    if not value:
+        return default
+    fields = tuple(dict.fromkeys(value.split(',')))
+    unknown = [field for field in fields if field not in FIELDS]
+    if unknown:
+        raise InvalidParam(f'unknown fields: {", ".join(unknown)}; choose from {", ".join(FIELDS)}')
+    return fields
+
+
+def filter_tasks(queryset, params):
+    status = params.get('status')
+    if status:
+        if status not in dict(Task.STATUS_CHOICES):
+            raise InvalidParam(f'status must be one of {", ".join(dict(Task.STATUS_CHOICES))}')
+        queryset = queryset.filter(status=status)
+    owner = int_param(params, 'owner')
+    if owner is not None:
+        queryset = queryset.filter(owner_id=owner)
+    due_after = date_param(params, 'due_after')
+    if due_after is not None:
+        queryset = queryset.filter(due_date__gte=due_after)
+    due_before = date_param(params, 'due_before')
+    if due_before is not None:
+        queryset = queryset.filter(due_date__lte=due_before)
+    return queryset
+
+
+def keyset_page(queryset, ordering, after, limit):
+    # ordering 'id': cursor "<id>"; 'due_date': cursor "<date>_<id>", tasks
+    # without a due date left out
+    if ordering == 'id':
+        queryset = queryset.order_by('id')
+        if after:
+            queryset = queryset.filter(id__gt=int_param({'after': after}, 'after'))
+        return queryset[:limit], lambda row: str(row['id'])
+    queryset = queryset.filter(due_date__isnull=False).order_by('due_date', 'id')
+    if after:
+        due, _, last_id = after.partition('_')
+        due = date_param({'after': due}, 'after')
+        last_id = int_param({'after': last_id}, 'after')
+        if due is None or last_id is None:
+            raise InvalidParam('after must be a cursor from next')
+        # the >= keeps it one index range
+        queryset = queryset.filter(Q(due_date__gt=due) | Q(id__gt=last_id), due_date__gte=due)
+    return queryset[:limit], lambda row: f'{row["due_date"].isoformat()}_{row["id"]}'
+
+
+@require_GET
+@conditional_page
 def task_list(request):
-    tasks = [
-        {'id': 1, 'name': 'Локальный'},
-        {'id': 9, 'name': 'Рабочий'},
-    ]
-    send_mail(
+    params = request.GET
+    try:
+        fields = fields_param(params)
+        ordering = params.get('ordering') or 'id'
+        if ordering not in ('id', 'due_date'):
+            raise InvalidParam('ordering must be id or due_date')
+        limit = int_param(params, 'limit') or PAGE_SIZE
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        page, cursor = keyset_page(filter_tasks(Task.objects.all(), params), ordering, params.get('after'), limit)
+        # the cursor needs id (and due_date), fetched even when not projected
+        extra = [field for field in ('id', 'due_date') if field not in fields]
+        rows = list(page.values(*fields, *extra))
+    except InvalidParam as exc:
+        return bad_request(str(exc))
+
+    next_url = None
+    if len(rows) == limit:
+        query = [(key, value) for key, value in params.items() if key != 'after']
+        next_url = request.path + '?' + urlencode(query + [('after', cursor(rows[-1]))])
+    for row in rows:
+        for field in extra:
+            del row[field]
+    # sent by a celery worker, see tracker.mail
+    queue_mail(
         'Subject here',
         'Here is the message.',
         'g.kandaurov@corp.mail.ru',
         ['fantom.voronezh@gmail.com'],
-        fail_silently=False,
     )
-    return JsonResponse({'tasks': tasks})
+    return JsonResponse({'next': next_url, 'tasks': rows})
 
 
+@require_GET
+@conditional_page
 def task_detail(request, task_id):
-    return JsonResponse({'task_id': task_id})
+    try:
+        fields = fields_param(request.GET, FIELDS)
+    except InvalidParam as exc:
+        return bad_request(str(exc))
+    task = Task.objects.filter(pk=task_id).values(*fields).first()
+    if task is None:
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+    return JsonResponse(task)
+
+
+def owner_param(data):
+    # owner_id of a task being added as int, None when unset or not an id
+    return parse_int(data.get('owner_id'))
+
+
+def clean_task(data, owners):
+    # (Task, None) or (None, {field: [errors]}); owner ids are checked against
+    # `owners`, loaded for the whole request with one query
+    if not isinstance(data, dict):
+        return None, {'non_field_errors': ['expected an object']}
+    unknown = set(data) - {'title', 'description', 'status', 'owner_id', 'due_date'}
+    if unknown:
+        return None, {field: ['unknown field'] for field in sorted(unknown)}
+    # JSON types first, to_python() takes anything for some of them
+    errors = {field: ['must be a string'] for field in STRING_FIELDS if not isinstance(data.get(field, ''), str)}
+    if not isinstance(data.get('due_date'), (str, type(None))):
+        errors['due_date'] = ['must be a date string, YYYY-MM-DD']
+    owner_id = owner_param(data)
+    if owner_id is None and data.get('owner_id') not in (None, ''):
+        errors['owner_id'] = [f'must be an integer from 0 to {MAX_INT}']
+    elif owner_id is not None and owner_id not in owners:
+        errors['owner_id'] = ['no such user']
+    if errors:
+        return None, errors
+    task = Task(**dict(data, owner_id=owner_id))
+    try:
+        task.full_clean(exclude=['owner'], validate_unique=False)
+    except ValidationError as exc:
+        return None, exc.message_dict
+    return task, None
 
 
 @require_POST
 def add_task(request):
-    data = request.POST
-    return JsonResponse({'add_task': data})
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return bad_request('invalid JSON')
+    else:
+        data = request.POST.dict()
+    items = data if isinstance(data, list) else [data]
+    if not items or len(items) > MAX_BULK_TASKS:
+        return bad_request(f'send 1 to {MAX_BULK_TASKS} tasks')
+
+    owner_ids = {owner_param(item) for item in items if isinstance(item, dict)} - {None}
+    owners = set(get_user_model().objects.filter(id__in=owner_ids).values_list('id', flat=True))
+
+    tasks, errors = [], []
+    for index, item in enumerate(items):
+        task, item_errors = clean_task(item, owners)
+        if item_errors:
+            errors.append({'index': index, 'errors': item_errors})
+        else:
+            tasks.append(task)
+    if errors:
+        # all or nothing
+        return JsonResponse({'errors': errors[:100]}, status=400)
+
+    with transaction.atomic():
+        Task.objects.bulk_create(tasks, batch_size=1000)
+    return JsonResponse({'created': len(tasks)}, status=201)
+
+
+@require_GET
+def metrics(request):
+    return HttpResponse(registry.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
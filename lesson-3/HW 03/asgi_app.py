@@ -0,0 +1,40 @@
+from fast_app import render
+
+
+HEADERS = [(b"content-type", b"application/json")]
+_headers = {}
+
+
+def _headers_for(length: int) -> list:
+    headers = _headers.get(length)
+    if headers is None:
+        headers = _headers[length] = HEADERS + [(b"content-length", str(length).encode())]
+    return headers
+
+
+def request_uri(scope: dict) -> str:
+    # raw_path is what the client sent, like gunicorn's RAW_URI
+    raw_path = scope.get('raw_path')
+    uri = raw_path.decode('latin-1') if raw_path else scope.get('root_path', '') + scope['path']
+    if scope.get('query_string'):
+        uri += '?' + scope['query_string'].decode('latin-1')
+    return uri
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope: dict, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+
+    data = render(request_uri(scope))
+    await send({'type': 'http.response.start', 'status': 200, 'headers': _headers_for(len(data))})
+    await send({'type': 'http.response.body', 'body': data})
@@ -0,0 +1,261 @@
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import importlib
+import threading
+import statistics
+import subprocess
+import http.client
+from wsgiref.util import setup_testing_defaults
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler, make_server
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# app -> interface
+APPS = {
+    'test:app': 'wsgi',
+    'fast_app:app': 'wsgi',
+    'asgi_app:app': 'asgi',
+}
+
+# how to start a server for an app, {app} and {port} are substituted
+SERVERS = {
+    'wsgiref': [sys.executable, __file__, '--serve', 'wsgiref', '--app', '{app}', '--port', '{port}'],
+    'wsgiref-threaded': [sys.executable, __file__, '--serve', 'wsgiref-threaded', '--app', '{app}', '--port', '{port}'],
+    'gunicorn-sync': [sys.executable, '-m', 'gunicorn', '-k', 'sync', '-w', '4', '-b', '127.0.0.1:{port}', '{app}'],
+    'gunicorn-gthread': [
+        sys.executable, '-m', 'gunicorn', '-k', 'gthread', '-w', '2', '--threads', '8', '-b', '127.0.0.1:{port}', '{app}',
+    ],
+    'gunicorn-gevent': [
+        sys.executable, '-m', 'gunicorn', '-k', 'gevent', '-w', '2', '--worker-connections', '1000',
+        '-b', '127.0.0.1:{port}', '{app}',
+    ],
+    # a single process: with --workers every keep-alive response stalled for
+    # ~40ms (delayed ACK) in local runs, which hides the app itself
+    'uvicorn': [sys.executable, '-m', 'uvicorn', '--port', '{port}', '--log-level', 'warning', '--no-access-log', '{app}'],
+    # static_server.py, the app is ignored
+    'static': [sys.executable, 'static_server.py', '--port', '{port}'],
+    'static-sendfile': [sys.executable, 'static_server.py', '--port', '{port}', '--max-cached-kb', '0'],
+}
+SERVER_INTERFACES = {server: 'wsgi' for server in SERVERS}
+SERVER_INTERFACES['uvicorn'] = 'asgi'
+SERVER_INTERFACES['static'] = SERVER_INTERFACES['static-sendfile'] = 'static'
+
+# server -> modules it needs
+REQUIRES = {
+    'gunicorn-sync': ['gunicorn'],
+    'gunicorn-gthread': ['gunicorn'],
+    'gunicorn-gevent': ['gunicorn', 'gevent'],
+    'uvicorn': ['uvicorn'],
+}
+
+
+def load_app(spec):
+    module, name = spec.split(':')
+    return getattr(importlib.import_module(module), name)
+
+
+def available(server):
+    for module in REQUIRES.get(server, []):
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            return False
+    return True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+def serve(kind, app_spec, port):
+    server_class = ThreadingWSGIServer if kind == 'wsgiref-threaded' else WSGIServer
+    httpd = make_server('127.0.0.1', port, load_app(app_spec), server_class, QuietHandler)
+    httpd.request_queue_size = 1024
+    httpd.serve_forever()
+
+
+def bench_inprocess(app, requests_num, interface='wsgi'):
+    if interface == 'asgi':
+        return asyncio.run(bench_inprocess_asgi(app, requests_num))
+
+    environ = {'PATH_INFO': '/api.time', 'QUERY_STRING': 'a=1'}
+    setup_testing_defaults(environ)
+
+    def start_response(status, headers):
+        pass
+
+    t1 = time.perf_counter()
+    for _ in range(requests_num):
+        b''.join(app(environ, start_response))
+    t2 = time.perf_counter()
+    return {'rps': requests_num / (t2 - t1)}
+
+
+async def bench_inprocess_asgi(app, requests_num):
+    scope = {
+        'type': 'http', 'method': 'GET', 'path': '/api.time', 'raw_path': b'/api.time',
+        'query_string': b'a=1', 'headers': [],
+    }
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        pass
+
+    t1 = time.perf_counter()
+    for _ in range(requests_num):
+        await app(scope, receive, send)
+    t2 = time.perf_counter()
+    return {'rps': requests_num / (t2 - t1)}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f'server on port {port} did not start')
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def load(port, path, requests_num, threads_num):
+    # closed loop: every thread sends its next request after the previous
+    # answer, keep-alive is used whenever the server allows it
+    latencies = []
+    errors = []
+    counter = iter(range(requests_num))
+    lock = threading.Lock()
+
+    def worker():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        local = []
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    break
+            t1 = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status != 200:
+                    errors.append(resp.status)
+                if resp.will_close:
+                    conn.close()
+            except (OSError, http.client.HTTPException) as exc:
+                errors.append(type(exc).__name__)
+                conn.close()
+            local.append(time.perf_counter() - t1)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(threads_num)]
+    t1 = time.perf_counter()
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    t2 = time.perf_counter()
+
+    return {
+        'requests': requests_num,
+        'threads': threads_num,
+        'rps': requests_num / (t2 - t1),
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'mean_ms': statistics.mean(latencies) * 1000,
+        'errors': len(errors),
+        'error_rate': len(errors) / requests_num,
+    }
+
+
+def bench_server(server, app_spec, requests_num, threads_num, path='/api.time?a=1'):
+    port = free_port()
+    command = [part.format(app=app_spec, port=port) for part in SERVERS[server]]
+    process = subprocess.Popen(command, cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+        load(port, path, min(200, requests_num), threads_num)  # warmup
+        return {'command': ' '.join(command[1:]), **load(port, path, requests_num, threads_num)}
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--apps', nargs='+', default=list(APPS))
+    parser.add_argument('--servers', nargs='+', default=list(SERVERS))
+    parser.add_argument('-n', '--requests', type=int, default=5000)
+    parser.add_argument('-c', '--threads', type=int, default=4)
+    parser.add_argument('-o', '--output', help='write results as json')
+    parser.add_argument('--serve', choices=['wsgiref', 'wsgiref-threaded'], help=argparse.SUPPRESS)
+    parser.add_argument('--app', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.serve:
+        return serve(args.serve, args.app, args.port)
+
+    results = []
+    for app_spec in args.apps:
+        interface = APPS.get(app_spec, 'wsgi')
+        stats = bench_inprocess(load_app(app_spec), args.requests * 10, interface)
+        results.append({'app': app_spec, 'server': 'in-process', **stats})
+        print(f'{app_spec:<14} {"in-process":<18} {stats["rps"]:10.0f} req/s', file=sys.stderr)
+
+        for server in args.servers:
+            if SERVER_INTERFACES[server] != interface:
+                continue
+            if not available(server):
+                print(f'{app_spec:<14} {server:<18} skipped, not installed', file=sys.stderr)
+                continue
+            stats = bench_server(server, app_spec, args.requests, args.threads)
+            results.append({'app': app_spec, 'server': server, **stats})
+            print(
+                f'{app_spec:<14} {server:<18} {stats["rps"]:10.0f} req/s, p50 = {stats["p50_ms"]:.2f}ms, '
+                f'p99 = {stats["p99_ms"]:.2f}ms, errors = {stats["errors"]}',
+                file=sys.stderr,
+            )
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
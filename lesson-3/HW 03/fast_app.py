@@ -0,0 +1,43 @@
+import json
+import time
+
+
+# Same response as test.app, byte for byte, built without json.dumps and
+# without a fresh dict per request. Header lists are shared between requests,
+# one per body length (servers copy them, they must not be mutated).
+STATUS = "200 OK"
+CONTENT_TYPE = ("Content-Type", "application/json")
+_headers = {}
+
+
+def _headers_for(length: int) -> list:
+    headers = _headers.get(length)
+    if headers is None:
+        headers = _headers[length] = [CONTENT_TYPE, ("Content-Length", str(length))]
+    return headers
+
+
+def _url_json(url: str) -> bytes:
+    # plain ascii urls need no escaping, anything else goes through json
+    if url.isascii() and url.isprintable() and '"' not in url and '\\' not in url:
+        return b'"' + url.encode() + b'"'
+    return json.dumps(url).encode()
+
+
+def request_uri(environ: dict) -> str:
+    uri = environ.get('RAW_URI')
+    if uri is not None:
+        return uri
+    uri = environ.get('SCRIPT_NAME', '') + environ.get('PATH_INFO', '')
+    query = environ.get('QUERY_STRING')
+    return uri + '?' + query if query else uri
+
+
+def render(url: str) -> bytes:
+    return b'{"time": ' + repr(time.time()).encode() + b', "url": ' + _url_json(url) + b'}'
+
+
+def app(environ: dict, start_response):
+    data = render(request_uri(environ))
+    start_response(STATUS, _headers_for(len(data)))
+    return [data]
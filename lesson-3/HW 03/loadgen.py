@@ -0,0 +1,291 @@
+import sys
+import json
+import asyncio
+import argparse
+from time import perf_counter
+from urllib.parse import urlsplit
+
+
+class HdrHistogram:
+    # Log-linear buckets like HdrHistogram: values (in microseconds) below
+    # 2 * half are exact, above that each power of two is split into `half`
+    # buckets, so any recorded value is off by less than 1 / half.
+    def __init__(self, significant_bits=7):
+        self.half = 1 << (significant_bits - 1)
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def _index(self, value):
+        if value < 2 * self.half:
+            return value
+        shift = value.bit_length() - self.half.bit_length()
+        return 2 * self.half + (shift - 1) * self.half + (value >> shift) - self.half
+
+    def _value(self, index):
+        # highest value that falls into the bucket
+        if index < 2 * self.half:
+            return index
+        shift, sub = divmod(index - 2 * self.half, self.half)
+        shift += 1
+        return ((sub + self.half + 1) << shift) - 1
+
+    def record(self, seconds):
+        value = int(seconds * 1_000_000)
+        index = self._index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q):
+        # in seconds
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self._value(index), self.max) / 1_000_000
+        return self.max / 1_000_000
+
+    def summary(self):
+        ms = {f'p{q:g}_ms': round(self.percentile(q / 100) * 1000, 3) for q in (50, 90, 99, 99.9)}
+        return {
+            'count': self.count,
+            'min_ms': (self.min or 0) / 1000,
+            'mean_ms': round(self.total / self.count / 1000, 3) if self.count else 0.0,
+            'max_ms': self.max / 1000,
+            **ms,
+        }
+
+
+class ServerClosed(ConnectionError):
+    # EOF or a reset before the first byte of the answer
+    pass
+
+
+class Connection:
+    # minimal HTTP/1.x client: GET only, the body delimited by Content-Length,
+    # chunks or the end of the connection. Kept alive unless the server says
+    # otherwise (HTTP/1.0 closes by default). Connecting and every request
+    # give up after `timeout` seconds
+    def __init__(self, host, port, timeout=10.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout,
+        )
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+    async def get(self, path):
+        reused = self.writer is not None
+        if not reused:
+            await self.open()
+        try:
+            return await asyncio.wait_for(self._get(path), self.timeout)
+        except ServerClosed:
+            self.close()
+            if not reused:
+                raise
+        # the server closed the idle connection meanwhile, not an error of
+        # this request: once more on a new one
+        await self.open()
+        return await asyncio.wait_for(self._get(path), self.timeout)
+
+    async def _get(self, path):
+        self.writer.write(
+            f'GET {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nConnection: keep-alive\r\n\r\n'.encode()
+        )
+
+        try:
+            status_line = await self.reader.readline()
+        except ConnectionResetError:
+            status_line = b''
+        if not status_line:
+            raise ServerClosed('connection closed by server')
+        version, status = status_line.split()[:2]
+        status = int(status)
+
+        headers = {}
+        while (line := await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip().lower()
+
+        options = {option.strip() for option in headers.get('connection', '').split(',')}
+        keep_alive = 'keep-alive' in options if version == b'HTTP/1.0' else 'close' not in options
+        if headers.get('transfer-encoding') == 'chunked':
+            while size := int((await self.reader.readline()).split(b';')[0], 16):
+                await self.reader.readexactly(size + 2)
+            await self.reader.readline()
+        elif 'content-length' in headers:
+            await self.reader.readexactly(int(headers['content-length']))
+        elif status in (204, 304) or 100 <= status < 200:
+            pass
+        else:
+            # no length: the body ends with the connection
+            await self.reader.read()
+            keep_alive = False
+
+        if not keep_alive:
+            self.close()
+        return status
+
+
+class LoadGenerator:
+    def __init__(self, url, connections, timeout=10.0):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        self.pool = asyncio.Queue()
+        for _ in range(connections):
+            self.pool.put_nowait(Connection(self.host, self.port, timeout))
+
+    async def request(self, histogram, errors, started):
+        # latency counts from `started`: in open-loop mode that is when the
+        # request was due, so waiting for a free connection is included
+        conn = await self.pool.get()
+        try:
+            status = await conn.get(self.path)
+            if status >= 400:
+                errors[status] = errors.get(status, 0) + 1
+        except (
+            OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+            ValueError, IndexError,
+        ) as exc:
+            # a timed out connection may still get the late answer, drop it
+            conn.close()
+            errors[type(exc).__name__] = errors.get(type(exc).__name__, 0) + 1
+        finally:
+            self.pool.put_nowait(conn)
+        histogram.record(perf_counter() - started)
+
+    async def closed_loop(self, concurrency, duration):
+        # every worker sends the next request right after the previous answer
+        histogram, errors = HdrHistogram(), {}
+        deadline = perf_counter() + duration
+
+        async def worker():
+            while perf_counter() < deadline:
+                await self.request(histogram, errors, perf_counter())
+
+        t1 = perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        return self._result(histogram, errors, perf_counter() - t1, concurrency=concurrency)
+
+    async def open_loop(self, rate, duration):
+        # requests are due every 1 / rate seconds no matter how slow the
+        # server is, which avoids coordinated omission
+        histogram, errors = HdrHistogram(), {}
+        tasks = []
+        t1 = perf_counter()
+        for i in range(int(rate * duration)):
+            due = t1 + i / rate
+            # sleep(0) when late still lets already sent requests progress
+            await asyncio.sleep(max(0.0, due - perf_counter()))
+            tasks.append(asyncio.create_task(self.request(histogram, errors, due)))
+        await asyncio.gather(*tasks)
+        return self._result(histogram, errors, perf_counter() - t1, rate=rate)
+
+    def _result(self, histogram, errors, elapsed, **level):
+        error_count = sum(errors.values())
+        return {
+            **level,
+            'rps': histogram.count / elapsed,
+            'errors': errors,
+            'error_rate': error_count / histogram.count if histogram.count else 0.0,
+            **histogram.summary(),
+        }
+
+    def close(self):
+        while not self.pool.empty():
+            self.pool.get_nowait().close()
+
+
+async def ramp(url, args):
+    # double the load until error rate or p99 breaks the SLO
+    results = []
+    level = args.rate or args.concurrency
+    while level <= args.ramp_max:
+        if args.rate:
+            gen = LoadGenerator(url, args.connections, args.timeout)
+            result = await gen.open_loop(level, args.duration)
+        else:
+            gen = LoadGenerator(url, level, args.timeout)
+            result = await gen.closed_loop(level, args.duration)
+        gen.close()
+
+        result['ok'] = result['error_rate'] <= args.max_error_rate and result['p99_ms'] <= args.slo_p99_ms
+        results.append(result)
+        print(json.dumps(result), flush=True)
+        if not result['ok']:
+            break
+        level *= 2
+
+    good = [res for res in results if res['ok']]
+    return {
+        'url': url,
+        'last_ok': good[-1] if good else None,
+        'failure_point': results[-1] if results and not results[-1]['ok'] else None,
+    }
+
+
+async def main(args):
+    if args.ramp:
+        summary = await ramp(args.url, args)
+        print(json.dumps(summary), file=sys.stderr)
+        return
+
+    if args.rate:
+        gen = LoadGenerator(args.url, args.connections, args.timeout)
+        result = await gen.open_loop(args.rate, args.duration)
+    else:
+        gen = LoadGenerator(args.url, args.concurrency, args.timeout)
+        result = await gen.closed_loop(args.concurrency, args.duration)
+    gen.close()
+    print(json.dumps({'url': args.url, **result}))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='e.g. nginx static: http://localhost:12380/img.jpg, '
+                    'gunicorn: http://127.0.0.1:8000/, via nginx: http://localhost:12380/api.time',
+    )
+    parser.add_argument('url')
+    parser.add_argument('-c', '--concurrency', type=int, default=4, help='closed loop workers')
+    parser.add_argument('-r', '--rate', type=float, help='open loop: requests per second')
+    parser.add_argument('--connections', type=int, default=64, help='open loop connection pool size')
+    parser.add_argument('-d', '--duration', type=float, default=10.0, help='seconds per run')
+    parser.add_argument('-t', '--timeout', type=float, default=10.0, help='seconds per connect and request, an error after')
+    parser.add_argument('--ramp', action='store_true', help='double load until SLOs break')
+    parser.add_argument('--ramp-max', type=float, default=100_000)
+    parser.add_argument('--slo-p99-ms', type=float, default=100.0)
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,50 @@
+import sys
+import json
+import argparse
+
+from bench import available, bench_server
+
+
+# flavour -> (servers to try in order, app)
+MATRIX = {
+    'wsgi-sync': (['gunicorn-sync', 'wsgiref'], 'fast_app:app'),
+    'wsgi-threaded': (['gunicorn-gthread', 'wsgiref-threaded'], 'fast_app:app'),
+    'asgi': (['uvicorn'], 'asgi_app:app'),
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--requests', type=int, default=5000)
+    parser.add_argument('-c', '--threads', type=int, nargs='+', default=[4, 16, 64])
+    parser.add_argument('-o', '--output', help='write results as json lines')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    out = open(args.output, 'w') if args.output else sys.stdout
+
+    for flavour, (servers, app_spec) in MATRIX.items():
+        server = next((server for server in servers if available(server)), None)
+        if server is None:
+            print(f'{flavour}: none of {servers} is installed, skipped', file=sys.stderr)
+            continue
+
+        for threads_num in args.threads:
+            stats = bench_server(server, app_spec, args.requests, threads_num)
+            record = {'flavour': flavour, 'server': server, 'app': app_spec, **stats}
+            print(json.dumps(record), file=out, flush=True)
+            print(
+                f'{flavour:<14} {server:<18} {threads_num:>3} threads: {stats["rps"]:8.0f} req/s, '
+                f'p50 = {stats["p50_ms"]:.2f}ms, p99 = {stats["p99_ms"]:.2f}ms, '
+                f'errors = {stats["error_rate"]:.2%}',
+                file=sys.stderr,
+            )
+
+    if args.output:
+        out.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+import sys
+import json
+import argparse
+
+from bench import available, bench_server
+
+
+# name -> (server, app)
+CASES = {
+    'static (cache + gzip)': ('static', ''),
+    'static (sendfile only)': ('static-sendfile', ''),
+    'wsgi wsgiref-threaded': ('wsgiref-threaded', 'static_server:wsgi_app'),
+    'wsgi gunicorn-gthread': ('gunicorn-gthread', 'static_server:wsgi_app'),
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--paths', nargs='+', default=['/index.html', '/img.jpg'])
+    parser.add_argument('-n', '--requests', type=int, default=5000)
+    parser.add_argument('-c', '--threads', type=int, default=4)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    for name, (server, app_spec) in CASES.items():
+        if not available(server):
+            print(f'{name}: not installed, skipped', file=sys.stderr)
+            continue
+        for path in args.paths:
+            stats = bench_server(server, app_spec, args.requests, args.threads, path)
+            print(json.dumps({'case': name, 'path': path, **stats}), flush=True)
+            print(
+                f'{name:<24} {path:<12} {stats["rps"]:8.0f} req/s, p50 = {stats["p50_ms"]:.2f}ms, '
+                f'p99 = {stats["p99_ms"]:.2f}ms, errors = {stats["errors"]}',
+                file=sys.stderr,
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+import os
+import re
+import gzip
+import argparse
+import mimetypes
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+
+PUBLIC = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'public')
+COMPRESSIBLE = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+RANGE_RE = re.compile(r'bytes=([0-9]*)-([0-9]*)')
+
+
+class CachedFile:
+    def __init__(self, path):
+        # size and mtime of what was read, not of an earlier stat()
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.body = f.read()
+            # not written to while we read
+            self.complete = len(self.body) == stat.st_size and os.fstat(f.fileno()).st_mtime_ns == stat.st_mtime_ns
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.gzipped = None
+
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if content_type.startswith(COMPRESSIBLE):
+            gzipped = gzip.compress(self.body, compresslevel=9)
+            if len(gzipped) < self.size:
+                self.gzipped = gzipped
+
+    @property
+    def nbytes(self):
+        return len(self.body) + len(self.gzipped or b'')
+
+
+class FileCache:
+    # LRU of small files and their gzip variants; get() returns a file only
+    # when its size and mtime are those of the caller's stat()
+    def __init__(self, max_bytes=32 * 2 ** 20, max_file_size=256 * 1024):
+        self.max_bytes = max_bytes
+        self.max_file_size = max_file_size
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, stat):
+        if stat.st_size > self.max_file_size:
+            return None
+
+        with self._lock:
+            cached = self._files.get(path)
+            if cached is not None and cached.mtime_ns == stat.st_mtime_ns and cached.size == stat.st_size:
+                self._files.move_to_end(path)
+                self.hits += 1
+                return cached
+
+        cached = CachedFile(path)
+        if not cached.complete:
+            return None
+        with self._lock:
+            self.misses += 1
+            old = self._files.pop(path, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._files[path] = cached
+            self.nbytes += cached.nbytes
+            while self.nbytes > self.max_bytes and len(self._files) > 1:
+                _, evicted = self._files.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+        if cached.mtime_ns != stat.st_mtime_ns or cached.size != stat.st_size:
+            # changed since the caller's stat(), its headers would not match
+            return None
+        return cached
+
+
+def parse_range(header, size):
+    # single "bytes=a-b" range -> (start, end) inclusive, None to ignore the
+    # header (malformed, or multiple ranges: answered with the whole file),
+    # ValueError when it cannot be satisfied
+    match = RANGE_RE.fullmatch(header.strip())
+    if match is None or match.group(1) == match.group(2) == '':
+        return None
+    start, end = match.groups()
+    if not start:
+        length = int(end)
+        if length <= 0:
+            raise ValueError(header)
+        return max(0, size - length), size - 1
+    start = int(start)
+    if end and int(end) < start:
+        return None
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+class StaticHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    server_version = 'static/1.0'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def translate_path(self):
+        path = unquote(urlsplit(self.path).path)
+        if '\x00' in path:
+            # os functions raise ValueError on it
+            return None
+        full = os.path.realpath(os.path.join(self.server.root, path.lstrip('/')))
+        if full != self.server.root and not full.startswith(self.server.root + os.sep):
+            return None
+        if os.path.isdir(full):
+            full = os.path.join(full, 'index.html')
+        return full
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+    def do_GET(self, head=False):
+        path = self.translate_path()
+        try:
+            stat = os.stat(path) if path else None
+        except (OSError, ValueError):
+            stat = None
+        if stat is None or not os.path.isfile(path):
+            return self.send_error(404)
+
+        etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+        last_modified = formatdate(stat.st_mtime, usegmt=True)
+        if self.not_modified(etag, stat.st_mtime):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', last_modified)
+            return self.end_headers()
+
+        try:
+            byte_range = parse_range(self.headers.get('Range', ''), stat.st_size)
+        except ValueError:
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{stat.st_size}')
+            self.send_header('Content-Length', '0')
+            return self.end_headers()
+
+        cached = self.server.cache.get(path, stat)
+        body = None
+        encoding = None
+        if cached is not None:
+            body = cached.body
+            if byte_range is None and cached.gzipped and 'gzip' in self.headers.get('Accept-Encoding', ''):
+                body, encoding, etag = cached.gzipped, 'gzip', etag[:-1] + '-gz"'
+
+        start, end = byte_range or (0, stat.st_size - 1)
+        length = len(body) if encoding else end - start + 1
+
+        self.send_response(206 if byte_range else 200)
+        self.send_header('Content-Type', mimetypes.guess_type(path)[0] or 'application/octet-stream')
+        self.send_header('Content-Length', str(length))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Vary', 'Accept-Encoding')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        if byte_range:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{stat.st_size}')
+        self.end_headers()
+
+        if head:
+            return
+        if body is not None:
+            self.wfile.write(body if encoding else memoryview(body)[start:end + 1])
+        else:
+            self.sendfile(path, start, length)
+
+    def not_modified(self, etag, mtime):
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return '*' in tags or etag in tags or etag[:-1] + '-gz"' in tags
+
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def sendfile(self, path, offset, count):
+        # the kernel copies file pages straight into the socket
+        with open(path, 'rb') as f:
+            while count > 0:
+                sent = os.sendfile(self.connection.fileno(), f.fileno(), offset, count)
+                if sent == 0:
+                    # truncated since stat(): the client would wait for the
+                    # rest of Content-Length
+                    self.close_connection = True
+                    break
+                offset += sent
+                count -= sent
+
+
+class StaticServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, root=PUBLIC, cache=None, verbose=False):
+        super().__init__(address, StaticHandler)
+        self.root = os.path.realpath(root)
+        self.cache = cache or FileCache()
+        self.verbose = verbose
+
+
+def wsgi_app(environ, start_response):
+    # the naive way, for comparison: read the whole file on every request
+    path = os.path.realpath(os.path.join(PUBLIC, environ.get('PATH_INFO', '/').lstrip('/')))
+    if os.path.isdir(path):
+        path = os.path.join(path, 'index.html')
+    if not path.startswith(PUBLIC + os.sep) or not os.path.isfile(path):
+        start_response('404 Not Found', [('Content-Length', '0')])
+        return [b'']
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    start_response('200 OK', [
+        ('Content-Type', mimetypes.guess_type(path)[0] or 'application/octet-stream'),
+        ('Content-Length', str(len(data))),
+    ])
+    return [data]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--root', default=PUBLIC)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=12380)
+    parser.add_argument('--cache-mb', type=int, default=32)
+    parser.add_argument('--max-cached-kb', type=int, default=256, help='larger files go through sendfile')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    cache = FileCache(args.cache_mb * 2 ** 20, args.max_cached_kb * 1024)
+    server = StaticServer((args.host, args.port), args.root, cache, args.verbose)
+    print(f'serving {server.root} on http://{args.host}:{args.port}/')
+    server.serve_forever()
@@ -2,10 +2,20 @@ import json
 import time
 
 
+def request_uri(environ: dict) -> str:
+    # RAW_URI is set by gunicorn only, other servers have PATH_INFO/QUERY_STRING
+    if 'RAW_URI' in environ:
+        return environ['RAW_URI']
+    uri = environ.get('SCRIPT_NAME', '') + environ.get('PATH_INFO', '')
+    if environ.get('QUERY_STRING'):
+        uri += '?' + environ['QUERY_STRING']
+    return uri
+
+
 def app(environ: dict, start_response):
     data = json.dumps({
         'time': time.time(),
-        'url': environ['RAW_URI']
+        'url': request_uri(environ)
     }).encode()
 
     start_response(
@@ -0,0 +1,128 @@
+import os
+import gzip
+import shutil
+import tempfile
+import threading
+import unittest
+import http.client
+from email.utils import formatdate
+
+from static_server import StaticServer
+
+# python -m unittest test_static_server
+
+
+class StaticServerTests(unittest.TestCase):
+    def setUp(self):
+        parent = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, parent)
+        # a file next to the root, for the traversal tests
+        with open(os.path.join(parent, 'secret.txt'), 'w') as f:
+            f.write('secret')
+        self.root = os.path.join(parent, 'public')
+        os.mkdir(self.root)
+        self.body = bytes(range(256)) * 4
+        self.write('data.bin', self.body)
+        self.write('index.html', b'<p>' + b'hello ' * 100 + b'</p>')
+
+        self.server = StaticServer(('127.0.0.1', 0), self.root)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def write(self, name, data):
+        with open(os.path.join(self.root, name), 'wb') as f:
+            f.write(data)
+
+    def get(self, path, method='GET', **headers):
+        conn = http.client.HTTPConnection('127.0.0.1', self.server.server_address[1], timeout=5)
+        try:
+            conn.request(method, path, headers={name.replace('_', '-'): value for name, value in headers.items()})
+            response = conn.getresponse()
+            return response.status, response.headers, response.read()
+        finally:
+            conn.close()
+
+    def test_whole_file(self):
+        status, headers, body = self.get('/data.bin')
+        self.assertEqual((status, body), (200, self.body))
+        self.assertEqual(headers['Content-Length'], str(len(self.body)))
+        self.assertEqual(headers['Accept-Ranges'], 'bytes')
+
+    def test_range(self):
+        status, headers, body = self.get('/data.bin', Range='bytes=10-19')
+        self.assertEqual((status, body), (206, self.body[10:20]))
+        self.assertEqual(headers['Content-Range'], f'bytes 10-19/{len(self.body)}')
+
+        self.assertEqual(self.get('/data.bin', Range='bytes=-5')[2], self.body[-5:])
+        self.assertEqual(self.get('/data.bin', Range='bytes=1000-')[2], self.body[1000:])
+        # the end is clamped to the file
+        self.assertEqual(self.get('/data.bin', Range='bytes=1020-5000')[2], self.body[1020:])
+
+    def test_malformed_or_multiple_ranges_get_the_whole_file(self):
+        for header in ('bytes=abc-', 'bytes=5-3', 'bytes=-', 'items=0-1', 'bytes=0-1,3-4'):
+            status, _, body = self.get('/data.bin', Range=header)
+            self.assertEqual((status, body), (200, self.body), header)
+
+    def test_unsatisfiable_range(self):
+        for header in ('bytes=1024-', 'bytes=-0'):
+            status, headers, body = self.get('/data.bin', Range=header)
+            self.assertEqual((status, body), (416, b''), header)
+            self.assertEqual(headers['Content-Range'], f'bytes */{len(self.body)}')
+
+    def test_large_file_range_goes_through_sendfile(self):
+        self.server.cache.max_file_size = 0
+        self.assertEqual(self.get('/data.bin', Range='bytes=100-199')[2], self.body[100:200])
+        self.assertEqual(self.server.cache.misses, 0)
+
+    def test_if_none_match(self):
+        _, headers, _ = self.get('/data.bin')
+        status, headers, body = self.get('/data.bin', If_None_Match=headers['ETag'])
+        self.assertEqual((status, body), (304, b''))
+        self.assertEqual(self.get('/data.bin', If_None_Match='"other"')[0], 200)
+        self.assertEqual(self.get('/data.bin', If_None_Match='*')[0], 304)
+
+    def test_if_modified_since(self):
+        mtime = os.stat(os.path.join(self.root, 'data.bin')).st_mtime
+        self.assertEqual(self.get('/data.bin', If_Modified_Since=formatdate(mtime + 60, usegmt=True))[0], 304)
+        self.assertEqual(self.get('/data.bin', If_Modified_Since=formatdate(mtime - 60, usegmt=True))[0], 200)
+        self.assertEqual(self.get('/data.bin', If_Modified_Since='yesterday')[0], 200)
+
+    def test_gzip(self):
+        status, headers, body = self.get('/', Accept_Encoding='gzip')
+        self.assertEqual((status, headers['Content-Encoding']), (200, 'gzip'))
+        self.assertTrue(headers['ETag'].endswith('-gz"'))
+        self.assertEqual(gzip.decompress(body), b'<p>' + b'hello ' * 100 + b'</p>')
+        # either variant's ETag validates
+        self.assertEqual(self.get('/', If_None_Match=headers['ETag'])[0], 304)
+
+    def test_changed_file_is_not_served_from_cache(self):
+        self.get('/data.bin')
+        self.write('data.bin', b'new')
+        status, headers, body = self.get('/data.bin')
+        self.assertEqual((body, headers['Content-Length']), (b'new', '3'))
+
+    def test_head(self):
+        status, headers, body = self.get('/data.bin', method='HEAD')
+        self.assertEqual((status, headers['Content-Length'], body), (200, str(len(self.body)), b''))
+
+    def test_path_traversal(self):
+        for path in ('/../secret.txt', '/%2e%2e/secret.txt', '/..%2fsecret.txt', '/a/../../secret.txt'):
+            status, _, body = self.get(path)
+            self.assertEqual(status, 404, path)
+            self.assertNotIn(b'secret', body)
+
+    def test_symlink_out_of_root(self):
+        os.symlink(os.path.join(os.path.dirname(self.root), 'secret.txt'), os.path.join(self.root, 'link.txt'))
+        self.assertEqual(self.get('/link.txt')[0], 404)
+
+    def test_null_byte_and_missing_file(self):
+        self.assertEqual(self.get('/%00')[0], 404)
+        self.assertEqual(self.get('/data.bin%00.txt')[0], 404)
+        self.assertEqual(self.get('/missing')[0], 404)
+        # the server still answers
+        self.assertEqual(self.get('/data.bin')[0], 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,17 @@
 from django.apps import AppConfig
+from django.core import checks
+from django.db.models.signals import post_delete, post_save
 
 
 class GenresConfig(AppConfig):
     name = 'genres'
+
+    def ready(self):
+        from genres.catalog import genre_changed
+        from genres.checks import check_genres_cache
+        from genres.models import Genre
+
+        checks.register(check_genres_cache)
+
+        for signal in (post_save, post_delete):
+            signal.connect(genre_changed, sender=Genre, dispatch_uid='genres_catalog')
@@ -0,0 +1,95 @@
+import threading
+import uuid
+from time import monotonic
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from genres.models import Genre
+
+# All genres (id -> name) held in every process, so serializers and filters
+# never query the genres table. A version token in a shared cache
+# (settings.GENRES_CACHE, see genres.checks) is replaced on every change;
+# a process compares it with the version of its copy at most once per
+# settings.GENRES_CATALOG_CHECK_INTERVAL seconds and reloads when it differs.
+# The process that made the change drops its copy once the change commits.
+
+VERSION_KEY = 'genres:catalog:version'
+
+
+class GenreCatalog:
+    def __init__(self):
+        self._names = None
+        self._labels = None
+        self._version = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def get_cache(self):
+        return caches[getattr(settings, 'GENRES_CACHE', 'default')]
+
+    def shared_version(self):
+        cache = self.get_cache()
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+            version = cache.get(VERSION_KEY)
+        return version
+
+    def _load(self, version):
+        # the version is read before the table: a change in between makes the
+        # copy look stale at the next check rather than current
+        names = dict(Genre.objects.values_list('id', 'name'))
+        labels = {pk: Genre.display_name(name) for pk, name in names.items()}
+        labels[None] = None
+        self._names, self._labels, self._version = names, labels, version
+
+    def names(self, check=False):
+        # check: compare with the shared version now, whatever the interval
+        names = self._names
+        interval = getattr(settings, 'GENRES_CATALOG_CHECK_INTERVAL', 1.0)
+        if names is not None and not check and monotonic() - self._checked < interval:
+            return names
+        with self._lock:
+            version = self.shared_version()
+            if self._names is None or version != self._version:
+                self._load(version)
+            self._checked = monotonic()
+            return self._names
+
+    def name(self, genre_id):
+        names = self.names()
+        if genre_id is not None and genre_id not in names:
+            # added by another process after our last check
+            with self._lock:
+                self._load(self.shared_version())
+                names = self._names
+        return names.get(genre_id)
+
+    def label(self, genre_id):
+        # str(genre) without the genre
+        name = self.name(genre_id)
+        return None if name is None else Genre.display_name(name)
+
+    def labels(self):
+        # id -> str(genre), and None -> None, for loops over many rows
+        self.names()
+        return self._labels
+
+    def ids(self, name):
+        return [pk for pk, genre_name in self.names().items() if genre_name == name]
+
+    def invalidate(self):
+        self.get_cache().set(VERSION_KEY, uuid.uuid4().hex, None)
+        with self._lock:
+            self._names = None
+
+
+genre_catalog = GenreCatalog()
+
+
+def genre_changed(sender, instance=None, **kwargs):
+    # after the commit: a reload before it would read the old rows under
+    # the new version
+    transaction.on_commit(genre_catalog.invalidate)
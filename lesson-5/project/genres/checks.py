@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core import checks
+
+# caches that only the current process sees: a catalog version kept in one
+# would never reach the other workers, they would serve old names for good
+PER_PROCESS_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def check_genres_cache(app_configs, **kwargs):
+    alias = getattr(settings, 'GENRES_CACHE', 'default')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend is None:
+        return [checks.Error(f'GENRES_CACHE names an unknown cache: {alias!r}', id='genres.E002')]
+    if backend in PER_PROCESS_BACKENDS:
+        return [checks.Error(
+            f'GENRES_CACHE ({alias!r}) is a per-process cache, {backend}',
+            hint='Point it at a cache every worker shares: redis, memcached or the database cache.',
+            id='genres.E001',
+        )]
+    return []
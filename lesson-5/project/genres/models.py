@@ -4,5 +4,9 @@ class Genre(models.Model):
     # Первичный ключ не создаём!!!
     name = models.CharField(max_length=32)
 
+    @staticmethod
+    def display_name(name):
+        return f"Жанр: {name}"
+
     def __str__(self):
-        return f"Жанр: {self.name}"
+        return self.display_name(self.name)
@@ -1,3 +1,130 @@
-from django.test import TestCase
+# pylint: disable=C0114,C0115,C0116
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
 
-# Create your tests here.
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from genres.catalog import genre_catalog
+from genres.checks import check_genres_cache
+from genres.models import Genre
+
+# a worker process: reads commands from stdin, answers [result, queries]
+WORKER = '''
+import json, sys
+import django
+django.setup()
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from genres.catalog import genre_catalog
+from genres.checks import check_genres_cache
+from genres.models import Genre
+
+for line in sys.stdin:
+    command, *args = line.split()
+    with CaptureQueriesContext(connection) as queries:
+        if command == 'create':
+            result = Genre.objects.create(name=args[0]).pk
+        elif command == 'rename':
+            genre = Genre.objects.get(pk=int(args[0]))
+            genre.name = args[1]
+            genre.save()
+            result = None
+        else:
+            result = genre_catalog.name(int(args[0]))
+    print(json.dumps([result, len(queries)], ensure_ascii=False), flush=True)
+'''
+
+
+@override_settings(GENRES_CATALOG_CHECK_INTERVAL=0)
+class TestGenreCatalog(TestCase):
+    def setUp(self):
+        genre_catalog.invalidate()
+
+    def test_names_without_queries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            drama = Genre.objects.create(name='драма')
+        genre_catalog.names()
+        with self.assertNumQueries(0):
+            self.assertEqual(genre_catalog.name(drama.pk), 'драма')
+            self.assertEqual(genre_catalog.label(drama.pk), str(drama))
+            self.assertEqual(genre_catalog.ids('драма'), [drama.pk])
+            self.assertIsNone(genre_catalog.label(None))
+
+    def test_change_reloads(self):
+        drama = Genre.objects.create(name='драма')
+        genre_catalog.names()
+        drama.name = 'мелодрама'
+        with self.captureOnCommitCallbacks(execute=True):
+            drama.save()
+        self.assertEqual(genre_catalog.name(drama.pk), 'мелодрама')
+        with self.captureOnCommitCallbacks(execute=True):
+            drama.delete()
+        self.assertEqual(genre_catalog.ids('мелодрама'), [])
+
+
+class TestGenresCacheCheck(SimpleTestCase):
+    def test_per_process_cache_is_an_error(self):
+        self.assertEqual(check_genres_cache(None), [])
+        with override_settings(GENRES_CACHE='default'):
+            self.assertEqual([error.id for error in check_genres_cache(None)], ['genres.E001'])
+        with override_settings(GENRES_CACHE='missing'):
+            self.assertEqual([error.id for error in check_genres_cache(None)], ['genres.E002'])
+
+
+class TestGenreCatalogProcesses(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE='project.bench_settings',
+            BENCH_DB=os.path.join(self.tmp, 'db.sqlite3'),
+            BENCH_CACHE_DIR=os.path.join(self.tmp, 'cache'),
+            GENRES_CATALOG_CHECK_INTERVAL='0',
+        )
+        subprocess.run(
+            [sys.executable, 'manage.py', 'migrate', '-v0'], cwd=settings.BASE_DIR, env=self.env,
+            check=True, stderr=subprocess.DEVNULL,
+        )
+        self.workers = [
+            subprocess.Popen(
+                [sys.executable, '-c', WORKER], cwd=settings.BASE_DIR, env=self.env, text=True,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            )
+            for _ in range(2)
+        ]
+
+    def tearDown(self):
+        for worker in self.workers:
+            worker.stdin.close()
+            worker.wait()
+            worker.stdout.close()
+        shutil.rmtree(self.tmp)
+
+    def call(self, worker, *command):
+        worker.stdin.write(' '.join(map(str, command)) + '\n')
+        worker.stdin.flush()
+        return json.loads(worker.stdout.readline())
+
+    def test_change_in_one_process_reaches_the_other(self):
+        first, second = self.workers
+        pk, _ = self.call(first, 'create', 'драма')
+
+        self.assertEqual(self.call(second, 'name', pk), ['драма', 1])
+        self.assertEqual(self.call(second, 'name', pk), ['драма', 0])
+
+        self.call(first, 'rename', pk, 'комедия')
+        self.assertEqual(self.call(second, 'name', pk), ['комедия', 1])
+        self.assertEqual(self.call(second, 'name', pk), ['комедия', 0])
+        self.assertEqual(self.call(first, 'name', pk), ['комедия', 1])
+
+    def test_new_genre_is_found(self):
+        first, second = self.workers
+        pk, _ = self.call(first, 'create', 'драма')
+        self.call(second, 'name', pk)
+        new_pk, _ = self.call(first, 'create', 'комедия')
+        self.assertEqual(self.call(second, 'name', new_pk)[0], 'комедия')
@@ -1,5 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class MoviesConfig(AppConfig):
     name = 'movies'
+
+    def ready(self):
+        from genres.models import Genre
+        from movies.cache import genre_changed, movie_changed
+        from movies.models import Movie
+        from movies.search import movie_deleted, movie_saved
+
+        for signal in (post_save, post_delete):
+            signal.connect(movie_changed, sender=Movie, dispatch_uid='movies_cache_movie')
+            signal.connect(genre_changed, sender=Genre, dispatch_uid='movies_cache_genre')
+        post_save.connect(movie_saved, sender=Movie, dispatch_uid='movies_search_saved')
+        post_delete.connect(movie_deleted, sender=Movie, dispatch_uid='movies_search_deleted')
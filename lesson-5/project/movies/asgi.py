@@ -0,0 +1,150 @@
+import json
+import logging
+import re
+from urllib.parse import parse_qsl, urlencode
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import QueryDict
+from rest_framework.exceptions import ValidationError
+
+from genres.models import Genre
+from movies.filters import filter_movies, int_param
+from movies.models import Movie
+from movies.pagination import MovieCursorPagination
+from movies.serializers import dumps_movies, movie_rows
+
+# Read-only movies and genres API as a plain ASGI app in front of Django:
+#   GET /api/async/movies/?after=<id>&page_size=&<filters>
+#   GET /api/async/movies/<id>/
+#   GET /api/async/movies/export/?<filters>
+#   GET /api/async/genres/
+# Django 3.0 has neither async views nor an async ORM, so queries run in
+# Django's thread through sync_to_async and only the socket side is async:
+# a slow client holds a coroutine, not a worker. Rows are fetched page by
+# page (WHERE id > last) so the export never keeps a cursor open between
+# sends. The response cache of MovieViewSet is not used here.
+
+PREFIX = '/api/async/'
+DETAIL_RE = re.compile(r'^movies/(\d+)/$')
+NOT_FOUND = b'{"detail":"Not found."}'
+
+logger = logging.getLogger('django.request')
+
+
+@sync_to_async
+def check_filters(params):
+    # genre_name reads the genre catalog, which may query
+    filter_movies(Movie.objects.none(), params)
+
+
+@sync_to_async
+def fetch_page(params, after, limit):
+    queryset = filter_movies(Movie.objects.order_by('id'), params)
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+    rows = list(movie_rows(queryset[:limit]))
+    return len(rows), rows[-1][0] if rows else None, dumps_movies(rows)
+
+
+@sync_to_async
+def fetch_movie(pk):
+    rows = list(movie_rows(Movie.objects.filter(pk=pk)))
+    return dumps_movies(rows)[1:-1] if rows else None
+
+
+@sync_to_async
+def fetch_genres():
+    return json.dumps(
+        list(Genre.objects.order_by('id').values('id', 'name')), ensure_ascii=False, separators=(',', ':'),
+    ).encode()
+
+
+def page_size(params):
+    size = int_param(params, MovieCursorPagination.page_size_query_param)
+    if size is None or size <= 0:
+        return MovieCursorPagination.page_size
+    return min(size, MovieCursorPagination.max_page_size)
+
+
+class MoviesASGI:
+    def __init__(self, django_app, export_chunk_size=2000):
+        self.django_app = django_app
+        self.export_chunk_size = export_chunk_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not scope['path'].startswith(PREFIX):
+            return await self.django_app(scope, receive, send)
+        if scope['method'] != 'GET':
+            return await self.respond(send, 405, b'{"detail":"Method not allowed."}')
+
+        path = scope['path'][len(PREFIX):]
+        params = QueryDict(scope.get('query_string', b'').decode('latin-1'))
+        started = False
+
+        async def send_tracked(message):
+            nonlocal started
+            started = started or message['type'] == 'http.response.start'
+            await send(message)
+
+        try:
+            if path == 'movies/':
+                await self.list(scope, send_tracked, params)
+            elif path == 'movies/export/':
+                await self.export(send_tracked, params)
+            elif path == 'genres/':
+                await self.respond(send_tracked, 200, await fetch_genres())
+            elif DETAIL_RE.match(path):
+                body = await fetch_movie(int(DETAIL_RE.match(path).group(1)))
+                await self.respond(send_tracked, 200 if body else 404, body or NOT_FOUND)
+            else:
+                await self.respond(send_tracked, 404, NOT_FOUND)
+        except ValidationError as exc:
+            await self.respond(send, 400, json.dumps(exc.detail).encode())
+        except Exception:
+            logger.exception('Internal Server Error: %s', scope['path'])
+            if started:
+                # a streamed export broke off, the server drops the connection
+                raise
+            await self.respond(send, 500, b'{"detail":"A server error occurred."}')
+        finally:
+            await sync_to_async(close_old_connections)()
+
+    async def respond(self, send, status, body):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def list(self, scope, send, params):
+        limit = page_size(params)
+        count, last_id, results = await fetch_page(params, int_param(params, 'after'), limit)
+
+        next_url = None
+        if count == limit:
+            query = [(key, value) for key, value in parse_qsl(scope.get('query_string', b'').decode()) if key != 'after']
+            next_url = scope['path'] + '?' + urlencode(query + [('after', last_id)])
+        body = b'{"next":' + json.dumps(next_url).encode() + b',"results":' + results + b'}'
+        await self.respond(send, 200, body)
+
+    async def export(self, send, params):
+        # validate the filters before the 200 goes out
+        await check_filters(params)
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', b'application/json')],
+        })
+        await send({'type': 'http.response.body', 'body': b'[', 'more_body': True})
+        after, first = None, True
+        while True:
+            count, last_id, chunk = await fetch_page(params, after, self.export_chunk_size)
+            if not count:
+                break
+            # await send() returns once the server buffer drains, a slow
+            # reader slows down the queries instead of growing memory
+            await send({'type': 'http.response.body', 'body': (b'' if first else b',') + chunk[1:-1], 'more_body': True})
+            after, first = last_id, False
+        await send({'type': 'http.response.body', 'body': b']'})
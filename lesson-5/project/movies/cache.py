@@ -0,0 +1,158 @@
+import hashlib
+import threading
+import uuid
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from genres.catalog import genre_catalog
+
+# Cached responses of MovieViewSet. Every entry remembers the versions of the
+# data it was built from ("movies:version:list", "movies:version:genre:<id>");
+# a signal on Movie/Genre replaces exactly the versions it affects once the
+# change commits, so stale entries stop matching without scanning the cache.
+# Details of a movie are deleted by key when it changes.
+#
+# settings.MOVIES_CACHE picks the cache alias (locmem 'default' unless CACHES
+# says otherwise), settings.MOVIES_CACHE_TIMEOUT the lifetime in seconds.
+
+LIST_VERSION = 'movies:version:list'
+
+
+def get_cache():
+    return caches[getattr(settings, 'MOVIES_CACHE', 'default')]
+
+
+def genre_version_key(genre_id):
+    return f'movies:version:genre:{genre_id}'
+
+
+def detail_key(pk):
+    # by the number: /api/movies/01/ is movie 1 and goes with its entry
+    return f'movies:detail:{int(pk)}'
+
+
+def list_key(request):
+    # every query param takes part: cursor, page_size and filters; the host
+    # too, next/previous links are absolute
+    query = request.get_host() + '?' + urlencode(sorted(request.query_params.lists()), doseq=True)
+    return 'movies:list:' + hashlib.md5(query.encode()).hexdigest()
+
+
+def get_versions(cache, keys):
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, None)
+            versions[key] = cache.get(key)
+    return versions
+
+
+def bump(*keys):
+    # a fresh random token rather than incr(): an evicted counter restarted
+    # from 1 could match an old entry again
+    get_cache().set_many({key: uuid.uuid4().hex for key in keys}, None)
+
+
+def make_etag(data):
+    return '"%s"' % hashlib.md5(JSONRenderer().render(data)).hexdigest()
+
+
+def etag_matches(request, etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or etag in tags or 'W/' + etag in tags
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._lock = threading.Lock()
+
+    def incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    @property
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'not_modified': self.not_modified,
+            'hit_ratio': round(self.hit_ratio, 4),
+        }
+
+
+stats = CacheStats()
+
+
+def cached_response(key_func, depends=()):
+    # key_func(request, **kwargs) -> cache key. `depends` are version keys of
+    # every entry, a view adds its own through response.cache_depends.
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            cache = get_cache()
+            key = key_func(request, **kwargs)
+            # versions are read before the database, so a change made while
+            # the response is built leaves the entry already stale
+            versions = get_versions(cache, list(depends))
+
+            entry = cache.get(key)
+            if entry is not None and get_versions(cache, list(entry['versions'])) == entry['versions']:
+                stats.incr('hits')
+                state = 'HIT'
+            else:
+                # genre labels at least as new as the versions: the catalog
+                # is replaced before them on a change
+                genre_catalog.names(check=True)
+                response = method(view, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                extra = getattr(response, 'cache_depends', ())
+                versions.update(get_versions(cache, list(extra)))
+                entry = {'data': response.data, 'etag': make_etag(response.data), 'versions': versions}
+                cache.set(key, entry, getattr(settings, 'MOVIES_CACHE_TIMEOUT', 300))
+                stats.incr('misses')
+                state = 'MISS'
+
+            if etag_matches(request, entry['etag']):
+                stats.incr('not_modified')
+                return Response(status=304, headers={'ETag': entry['etag'], 'X-Cache': state})
+            return Response(entry['data'], headers={'ETag': entry['etag'], 'X-Cache': state})
+        return wrapper
+    return decorator
+
+
+def movie_changed(sender, instance, **kwargs):
+    # after the commit: a response built in between would read the old row
+    # and be stored under the new version
+    pk = instance.pk
+
+    def invalidate():
+        get_cache().delete(detail_key(pk))
+        bump(LIST_VERSION)
+    transaction.on_commit(invalidate)
+
+
+def genre_changed(sender, instance, **kwargs):
+    pk = instance.pk
+
+    def invalidate():
+        # the catalog first, see cached_response
+        genre_catalog.invalidate()
+        bump(LIST_VERSION, genre_version_key(pk))
+    transaction.on_commit(invalidate)
@@ -0,0 +1,52 @@
+from django.db import connections
+from rest_framework.exceptions import ValidationError
+
+from genres.catalog import genre_catalog
+
+# the largest code point: under a bytewise collation (sqlite's BINARY) every
+# string that starts with `prefix` sorts between prefix and prefix + MAX_CHAR
+MAX_CHAR = '\U0010ffff'
+# integer columns are 32-bit, larger values overflow in the database driver
+MAX_INT = 2 ** 31 - 1
+
+
+def int_param(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValidationError({name: 'A valid integer is required.'})
+    if value > MAX_INT:
+        raise ValidationError({name: f'Ensure this value is less than or equal to {MAX_INT}.'})
+    if value < -MAX_INT - 1:
+        raise ValidationError({name: f'Ensure this value is greater than or equal to {-MAX_INT - 1}.'})
+    return value
+
+
+def filter_movies(queryset, params):
+    # ?year_from=&year_to= (inclusive), ?genre=<id>, ?genre_name=, ?title=<prefix>
+    year_from = int_param(params, 'year_from')
+    year_to = int_param(params, 'year_to')
+    genre = int_param(params, 'genre')
+    genre_name = params.get('genre_name')
+    title = params.get('title')
+
+    if year_from is not None:
+        queryset = queryset.filter(year__gte=year_from)
+    if year_to is not None:
+        queryset = queryset.filter(year__lte=year_to)
+    if genre is not None:
+        queryset = queryset.filter(genre_id=genre)
+    if genre_name:
+        queryset = queryset.filter(genre_id__in=genre_catalog.ids(genre_name))
+    if title:
+        # LIKE 'x%' is exact; sqlite cannot use an index for it (its LIKE is
+        # case-insensitive), a range on the plain btree index can. On postgres
+        # the range would depend on the collation, LIKE uses the
+        # varchar_pattern_ops index of movies.0005 instead
+        queryset = queryset.filter(title__startswith=title)
+        if connections[queryset.db].vendor == 'sqlite':
+            queryset = queryset.filter(title__gte=title, title__lt=title + MAX_CHAR)
+    return queryset
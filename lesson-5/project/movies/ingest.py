@@ -0,0 +1,235 @@
+import csv
+import json
+from itertools import islice
+from time import perf_counter
+
+from django.core.management.color import no_style
+from django.db import DatabaseError, connection, transaction
+
+from genres.catalog import genre_catalog
+from genres.models import Genre
+from movies.cache import LIST_VERSION, bump, detail_key, get_cache
+from movies.models import Movie
+from movies.search import memory_index
+
+# Bulk loading of movies from JSON lines or CSV. A row is
+# {"id": optional, "title": ..., "year": optional, "genre": name or null};
+# a row with an id of an existing movie updates it, any other row creates one.
+
+TITLE_MAX_LENGTH = Movie._meta.get_field('title').max_length
+GENRE_MAX_LENGTH = Genre._meta.get_field('name').max_length
+YEAR_DEFAULT = Movie._meta.get_field('year').default
+YEAR_RANGE = (1, 9999)
+ID_RANGE = (1, 2 ** 31 - 1)
+MAX_ERRORS = 100
+
+
+class IngestError(Exception):
+    # the rest of the body cannot be read or written; batches before it
+    # are kept
+    pass
+
+
+def parse_jsonl(lines):
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield number, None, {'row': f'invalid json: {exc}'}
+            continue
+        if not isinstance(row, dict):
+            yield number, None, {'row': 'an object is required'}
+            continue
+        yield number, row, None
+
+
+def parse_csv(lines):
+    # header line: title,year,genre and optionally id
+    for number, row in enumerate(csv.DictReader(lines), 2):
+        yield number, row, None
+
+
+def decode_lines(stream):
+    for number, line in enumerate(stream, 1):
+        if isinstance(line, bytes):
+            try:
+                line = line.decode('utf-8')
+            except UnicodeDecodeError:
+                raise IngestError(f'line {number} is not valid UTF-8') from None
+        yield line
+
+
+def clean_int(value, bounds):
+    # ints and strings of digits (csv), not bools or 1.7
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError
+        value = int(value)
+    elif isinstance(value, str):
+        value = int(value.strip())
+    if not bounds[0] <= value <= bounds[1]:
+        raise ValueError
+    return value
+
+
+def clean_row(row):
+    errors = {}
+    values = {}
+
+    title = row.get('title')
+    if not isinstance(title, str) or not title.strip():
+        errors['title'] = 'required'
+    elif len(title) > TITLE_MAX_LENGTH:
+        errors['title'] = f'at most {TITLE_MAX_LENGTH} characters'
+    else:
+        values['title'] = title
+
+    year = row.get('year')
+    try:
+        values['year'] = YEAR_DEFAULT if year in (None, '') else clean_int(year, YEAR_RANGE)
+    except ValueError:
+        errors['year'] = f'an integer from {YEAR_RANGE[0]} to {YEAR_RANGE[1]} is required'
+
+    genre = row.get('genre')
+    if genre in (None, ''):
+        values['genre'] = None
+    elif not isinstance(genre, str) or len(genre) > GENRE_MAX_LENGTH:
+        errors['genre'] = f'a name of at most {GENRE_MAX_LENGTH} characters'
+    else:
+        values['genre'] = genre
+
+    pk = row.get('id')
+    try:
+        values['id'] = None if pk in (None, '') else clean_int(pk, ID_RANGE)
+    except ValueError:
+        errors['id'] = f'an integer from {ID_RANGE[0]} to {ID_RANGE[1]} is required'
+
+    return values, errors
+
+
+class GenreCache:
+    # name -> id, loaded once; missing genres of a batch are created together
+    def __init__(self):
+        self.ids = dict(Genre.objects.values_list('name', 'id'))
+
+    def resolve(self, names):
+        missing = {name for name in names if name is not None and name not in self.ids}
+        if missing:
+            Genre.objects.bulk_create([Genre(name=name) for name in missing])
+            # ids are not returned by bulk_create on every backend
+            self.ids.update(Genre.objects.filter(name__in=missing).values_list('name', 'id'))
+            # bulk_create sends no post_save for genres.catalog either
+            genre_catalog.invalidate()
+        return self.ids
+
+
+class IngestResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+        self.detail = None
+        self.elapsed = 0.0
+
+    def add_error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({'line': line, 'errors': errors})
+
+    @property
+    def rows_per_sec(self):
+        return (self.created + self.updated) / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        data = {
+            'created': self.created,
+            'updated': self.updated,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'elapsed': round(self.elapsed, 3),
+            'rows_per_sec': round(self.rows_per_sec),
+        }
+        if self.detail is not None:
+            data['detail'] = self.detail
+        return data
+
+
+def write_batch(rows, genres, result):
+    ids = genres.resolve(values['genre'] for values in rows)
+    pks = [values['id'] for values in rows if values['id'] is not None]
+    existing = set(Movie.objects.filter(id__in=pks).values_list('id', flat=True)) if pks else set()
+
+    new, changed = [], []
+    for values in rows:
+        movie = Movie(
+            id=values['id'], title=values['title'], year=values['year'],
+            genre_id=ids[values['genre']] if values['genre'] is not None else None,
+        )
+        (changed if movie.id in existing else new).append(movie)
+
+    with transaction.atomic():
+        Movie.objects.bulk_create(new)
+        if changed:
+            Movie.objects.bulk_update(changed, ['title', 'year', 'genre'], batch_size=1000)
+
+    # bulk_create/bulk_update send no signals, invalidate by hand
+    if changed:
+        get_cache().delete_many([detail_key(movie.id) for movie in changed])
+    bump(LIST_VERSION)
+    memory_index.invalidate()
+    result.created += len(new)
+    result.updated += len(changed)
+    return any(movie.id is not None for movie in new)
+
+
+def reset_sequence():
+    # rows inserted with explicit ids do not move the postgres sequence
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [Movie]):
+            cursor.execute(sql)
+
+
+def ingest(parsed_rows, batch_size=5000):
+    # parsed_rows: (line number, row dict, parse error) from parse_jsonl/parse_csv
+    result = IngestResult()
+    genres = GenreCache()
+    explicit_ids = False
+    t1 = perf_counter()
+
+    parsed_rows = iter(parsed_rows)
+    try:
+        while True:
+            chunk = list(islice(parsed_rows, batch_size))
+            if not chunk:
+                break
+            rows = []
+            seen = set()
+            for line, row, error in chunk:
+                if error is None:
+                    values, error = clean_row(row)
+                if not error and values['id'] is not None:
+                    if values['id'] in seen:
+                        error = {'id': 'repeated in this batch'}
+                    seen.add(values['id'])
+                if error:
+                    result.add_error(line, error)
+                else:
+                    rows.append(values)
+            if rows:
+                try:
+                    explicit_ids |= write_batch(rows, genres, result)
+                except DatabaseError as exc:
+                    raise IngestError(f'the batch ending at line {chunk[-1][0]} was not written: {exc}') from exc
+    except IngestError as exc:
+        result.detail = str(exc)
+
+    if explicit_ids:
+        reset_sequence()
+    result.elapsed = perf_counter() - t1
+    return result
@@ -0,0 +1,142 @@
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# server -> (command, path to load), {port} is substituted
+SERVERS = {
+    'wsgi-sync': (
+        [sys.executable, '-m', 'gunicorn', '-k', 'sync', '-w', '4', '-b', '127.0.0.1:{port}', 'project.wsgi:application'],
+        '/api/movies/?page_size=100',
+    ),
+    'asgi-sync-view': (
+        [sys.executable, '-m', 'uvicorn', '--port', '{port}', '--log-level', 'warning', '--no-access-log',
+         'project.asgi:application'],
+        '/api/movies/?page_size=100',
+    ),
+    'asgi-async': (
+        [sys.executable, '-m', 'uvicorn', '--port', '{port}', '--log-level', 'warning', '--no-access-log',
+         'project.asgi:application'],
+        '/api/async/movies/?page_size=100',
+    ),
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f'server on port {port} did not start')
+
+
+async def request(port, path, send_seconds=0.0, pieces=10):
+    # one request on a new connection; a slow client sends it in `pieces`
+    # spread over `send_seconds`, like a phone on a bad network
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        data = f'GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n'.encode()
+        step = len(data) // pieces + 1 if send_seconds else len(data)
+        for i in range(0, len(data), step):
+            writer.write(data[i:i + step])
+            await writer.drain()
+            if send_seconds:
+                await asyncio.sleep(send_seconds / pieces)
+        response = await reader.read()
+        return int(response.split(b' ', 2)[1])
+    finally:
+        writer.close()
+
+
+async def load(port, path, clients, send_seconds, duration):
+    # `clients` slow clients, started over the first second, plus one fast
+    # client probing latency in a loop; everything stops after `duration`
+    done = []
+    errors = []
+    latencies = []
+
+    async def slow(delay):
+        await asyncio.sleep(delay)
+        try:
+            status = await request(port, path, send_seconds)
+            (done if status == 200 else errors).append(status)
+        except (OSError, ValueError, IndexError) as exc:
+            errors.append(type(exc).__name__)
+
+    async def probe():
+        while True:
+            t1 = perf_counter()
+            try:
+                await request(port, path)
+            except (OSError, ValueError, IndexError):
+                pass
+            latencies.append(perf_counter() - t1)
+            await asyncio.sleep(0.05)
+
+    tasks = [asyncio.create_task(slow(i / clients)) for i in range(clients)]
+    tasks.append(asyncio.create_task(probe()))
+    t1 = perf_counter()
+    await asyncio.wait(tasks[:-1], timeout=duration)
+    elapsed = perf_counter() - t1
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    latencies.sort()
+    return {
+        'completed': len(done),
+        'errors': len(errors),
+        'elapsed': elapsed,
+        'probes': len(latencies),
+        'probe_p50_ms': statistics.median(latencies) * 1000 if latencies else None,
+        'probe_max_ms': latencies[-1] * 1000 if latencies else None,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Slow clients against sync WSGI workers, Django under uvicorn and the async /api/async/ path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', nargs='+', default=list(SERVERS), choices=list(SERVERS))
+        parser.add_argument('-c', '--clients', type=int, default=500)
+        parser.add_argument('--send-seconds', type=float, default=2.0, help='time each slow client takes to send')
+        parser.add_argument('-d', '--duration', type=float, default=30.0, help='stop after this many seconds')
+
+    def handle(self, *args, servers, clients, send_seconds, duration, **options):
+        for server in servers:
+            command, path = SERVERS[server]
+            port = free_port()
+            process = subprocess.Popen(
+                [part.format(port=port) for part in command], cwd=settings.BASE_DIR,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                wait_for_port(port)
+                asyncio.run(load(port, path, 5, 0, 5))  # warmup
+                result = asyncio.run(load(port, path, clients, send_seconds, duration))
+            finally:
+                process.terminate()
+                process.wait()
+
+            p50 = result['probe_p50_ms']
+            self.stdout.write(
+                f'{server:<15} {result["completed"]:>5}/{clients} slow clients served in {result["elapsed"]:5.1f}s, '
+                f'errors {result["errors"]}, probe p50 {p50 or 0:8.1f} ms, max {result["probe_max_ms"] or 0:8.1f} ms '
+                f'({result["probes"]} probes)'
+            )
@@ -0,0 +1,78 @@
+import statistics
+import time
+from time import perf_counter
+from wsgiref.util import setup_testing_defaults
+
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+from movies.cache import get_cache
+from movies.models import Movie
+
+# mode -> (CONN_MAX_AGE, CONN_HEALTH_CHECKS)
+MODES = {
+    'per-request': (0, False),
+    'persistent': (60, False),
+    'persistent+check': (60, True),
+}
+
+
+def get(application, path):
+    # through the WSGI handler: django.test.Client does not close
+    # connections between requests, a real server does
+    environ = {'PATH_INFO': path, 'HTTP_HOST': 'localhost'}
+    setup_testing_defaults(environ)
+    response = application(environ, lambda status, headers: None)
+    for _ in response:
+        pass
+    response.close()
+
+
+class Command(BaseCommand):
+    help = 'Detail requests with a new database connection per request vs persistent connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--requests', type=int, default=2000)
+        parser.add_argument(
+            '--connect-delay-ms', type=float, default=0.0,
+            help='sleep on every new connection, a stand-in for the TCP/TLS/auth handshake of a remote postgres',
+        )
+
+    def handle(self, *args, requests, connect_delay_ms, **options):
+        ids = list(Movie.objects.order_by('id').values_list('id', flat=True)[:requests])
+        application = get_wsgi_application()
+        opened = []
+
+        def created(sender, connection, **kwargs):
+            opened.append(1)
+            if connect_delay_ms:
+                time.sleep(connect_delay_ms / 1000)
+
+        connection_created.connect(created)
+        try:
+            for mode, (max_age, health_checks) in MODES.items():
+                connection.close()
+                connection.settings_dict['CONN_MAX_AGE'] = max_age
+                connection.settings_dict['CONN_HEALTH_CHECKS'] = health_checks
+                # every request misses the response cache and queries
+                get_cache().clear()
+                opened.clear()
+
+                timings = []
+                for pk in ids:
+                    t1 = perf_counter()
+                    get(application, f'/api/movies/{pk}/')
+                    timings.append(perf_counter() - t1)
+
+                timings.sort()
+                self.stdout.write(
+                    f'{mode:<17} {len(ids)} requests, {len(opened):>5} connections opened, '
+                    f'p50 {statistics.median(timings) * 1000:6.3f} ms, '
+                    f'p99 {timings[int(len(timings) * 0.99)] * 1000:6.3f} ms, '
+                    f'total {sum(timings):6.2f} s'
+                )
+        finally:
+            connection_created.disconnect(created)
+            connection.close()
@@ -0,0 +1,58 @@
+import tracemalloc
+from base64 import b64encode
+from time import perf_counter
+from urllib.parse import urlencode
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from movies.models import Movie
+
+
+def cursor_for(position):
+    # same format as rest_framework.pagination.CursorPagination.encode_cursor
+    return b64encode(urlencode({'p': position}).encode()).decode()
+
+
+def measure(client, url):
+    # time and peak python memory of one request, the body is read but not kept
+    tracemalloc.start()
+    t1 = perf_counter()
+    response = client.get(url)
+    size = 0
+    if response.streaming:
+        for part in response.streaming_content:
+            size += len(part)
+    else:
+        size = len(response.content)
+    elapsed = perf_counter() - t1
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return response.status_code, elapsed, peak, size
+
+
+class Command(BaseCommand):
+    help = 'Time and peak memory of movie list pages and of the streaming export'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--no-export', action='store_true')
+
+    def handle(self, *args, page_size, no_export, **options):
+        client = Client(HTTP_HOST='localhost')
+        last_id = Movie.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        self.stdout.write(f'{Movie.objects.count()} movies')
+
+        urls = {
+            'first page': f'/api/movies/?page_size={page_size}',
+            'deep page': f'/api/movies/?page_size={page_size}&cursor={cursor_for(last_id - page_size)}',
+        }
+        if not no_export:
+            urls['export'] = '/api/movies/export/'
+
+        for name, url in urls.items():
+            status, elapsed, peak, size = measure(client, url)
+            self.stdout.write(
+                f'{name:<12} {status} {elapsed * 1000:10.1f} ms  peak {peak / 2 ** 20:8.2f} MiB  '
+                f'body {size / 2 ** 20:8.2f} MiB'
+            )
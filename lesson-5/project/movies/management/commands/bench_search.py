@@ -0,0 +1,39 @@
+import statistics
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from movies.search import fts5_available, memory_index, search_movies
+
+QUERIES = ['Фильм 123456', 'фильм 99', '123456', 'Филм 123456', 'Фльм 77777', 'фил']
+
+
+class Command(BaseCommand):
+    help = 'Latency of movie title search with the FTS5 table and the in-process index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--repeat', type=int, default=5)
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('-q', '--query', action='append', help='instead of the built-in queries')
+
+    def handle(self, *args, repeat, limit, query, **options):
+        backends = ['memory']
+        if fts5_available():
+            backends.insert(0, 'fts5')
+
+        for backend in backends:
+            with override_settings(MOVIES_SEARCH=backend):
+                if backend == 'memory':
+                    t1 = perf_counter()
+                    memory_index.build()
+                    self.stdout.write(f'memory index built in {perf_counter() - t1:.1f}s, {len(memory_index.terms)} terms')
+                for q in query or QUERIES:
+                    timings = []
+                    for _ in range(repeat):
+                        t1 = perf_counter()
+                        found = search_movies(q, limit)
+                        timings.append(perf_counter() - t1)
+                    self.stdout.write(
+                        f'{backend:<7} {q!r:<18} {len(found):>3} found, median {statistics.median(timings) * 1000:9.2f} ms'
+                    )
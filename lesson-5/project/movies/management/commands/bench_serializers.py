@@ -0,0 +1,51 @@
+from time import perf_counter
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from movies import serializers
+from movies.models import Movie
+from movies.serializers import MovieSerializer, dumps_movies, movie_rows, movie_values
+
+
+def drf(queryset):
+    return JSONRenderer().render(MovieSerializer(queryset, many=True).data)
+
+
+def drf_values(queryset):
+    return JSONRenderer().render(list(movie_values(queryset)))
+
+
+def fast(queryset):
+    return dumps_movies(movie_rows(queryset))
+
+
+def fast_json(queryset):
+    with mock.patch.object(serializers, 'orjson', None):
+        return dumps_movies(movie_rows(queryset))
+
+
+class Command(BaseCommand):
+    help = 'Objects/sec of the movie serialization paths, database read included'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--count', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, count, repeat, **options):
+        queryset = Movie.objects.order_by('id')[:count]
+        expected = drf(queryset)
+        cases = [('drf ModelSerializer', drf), ('drf values()', drf_values), ('fast, json', fast_json)]
+        if serializers.orjson is not None:
+            cases.append(('fast, orjson', fast))
+
+        for name, func in cases:
+            assert func(queryset) == expected, name
+            best = min(self.timed(func, queryset) for _ in range(repeat))
+            self.stdout.write(f'{name:<20} {len(queryset) / best:12.0f} objects/s  {best * 1000:8.1f} ms')
+
+    def timed(self, func, queryset):
+        t1 = perf_counter()
+        func(queryset.all())
+        return perf_counter() - t1
@@ -0,0 +1,57 @@
+import statistics
+from time import perf_counter
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.http import QueryDict
+
+from movies.filters import filter_movies
+from movies.models import Movie
+
+
+QUERIES = [
+    'year_from=1990&year_to=1995',
+    'year_from=1990&year_to=1990',
+    'genre={genre}',
+    'genre={genre}&year_from=1990&year_to=1995',
+    'genre={genre}&year_from=1990&year_to=1990',
+    'title=Фильм 12345',
+    'title=Фильм 9&year_from=2000',
+]
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN and latency of the first list page for typical filters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--repeat', type=int, default=20)
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument(
+            '--before-after', action='store_true',
+            help='run without the indexes of movies.0003 first, then with them (migrates the database!)',
+        )
+
+    def handle(self, *args, repeat, page_size, before_after, **options):
+        if before_after:
+            call_command('migrate', 'movies', '0002', verbosity=0)
+            self.stdout.write('=== before (movies.0002)')
+            self.run(repeat, page_size)
+            call_command('migrate', 'movies', verbosity=0)
+            self.stdout.write('=== after (movies.0003)')
+        self.run(repeat, page_size)
+
+    def run(self, repeat, page_size):
+        genre = Movie.objects.exclude(genre=None).values_list('genre_id', flat=True).first()
+        for query in QUERIES:
+            params = QueryDict(query.format(genre=genre))
+            queryset = filter_movies(Movie.objects.select_related('genre'), params).order_by('id')[:page_size]
+
+            timings = []
+            for _ in range(repeat):
+                t1 = perf_counter()
+                rows = len(list(queryset.all()))
+                timings.append(perf_counter() - t1)
+
+            self.stdout.write(f'{query}: {rows} rows, median {statistics.median(timings) * 1000:.2f} ms')
+            for line in queryset.explain().splitlines():
+                self.stdout.write(f'    {line}')
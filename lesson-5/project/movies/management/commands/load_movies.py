@@ -0,0 +1,55 @@
+import random
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.ingest import ingest, parse_csv, parse_jsonl
+from movies.management.commands.seed_movies import GENRES
+
+
+def write_sample(path, count, file_format):
+    # synthetic rows, for benchmarks
+    rnd = random.Random(0)
+    with open(path, 'w', newline='') as f:
+        if file_format == 'csv':
+            f.write('title,year,genre\n')
+        for i in range(count):
+            title, year, genre = f'Фильм {i}', rnd.randint(1920, 2021), rnd.choice(GENRES)
+            if file_format == 'csv':
+                f.write(f'{title},{year},{genre}\n')
+            else:
+                f.write(f'{{"title": "{title}", "year": {year}, "genre": "{genre}"}}\n')
+
+
+class Command(BaseCommand):
+    help = 'Create or update movies from a JSON lines or CSV file ("-" for stdin)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['jsonl', 'csv'], help='by default from the file extension')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--generate', type=int, metavar='N', help='write N synthetic rows to path first')
+
+    def handle(self, *args, path, format, batch_size, generate, **options):
+        file_format = format or ('csv' if path.endswith('.csv') else 'jsonl')
+        if generate:
+            if path == '-':
+                raise CommandError('--generate needs a file path')
+            write_sample(path, generate, file_format)
+
+        parse = parse_csv if file_format == 'csv' else parse_jsonl
+        f = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            result = ingest(parse(f), batch_size)
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+        for error in result.errors:
+            self.stderr.write(f'line {error["line"]}: {error["errors"]}')
+        self.stdout.write(
+            f'{result.created} created, {result.updated} updated, {result.error_count} errors '
+            f'in {result.elapsed:.1f}s ({result.rows_per_sec:.0f} rows/s)'
+        )
+        if result.detail:
+            raise CommandError(f'stopped: {result.detail}')
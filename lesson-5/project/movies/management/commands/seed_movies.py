@@ -0,0 +1,48 @@
+import random
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from genres.models import Genre
+from movies.cache import LIST_VERSION, bump
+from movies.models import Movie
+
+
+GENRES = ['драма', 'комедия', 'боевик', 'триллер', 'ужасы', 'фантастика', 'мультфильм', 'документальный']
+
+
+class Command(BaseCommand):
+    help = 'Bulk-load N generated movies (for benchmarks)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int, nargs='?', default=1_000_000)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--clear', action='store_true', help='delete existing movies first')
+
+    def handle(self, *args, count, batch_size, clear, **options):
+        rnd = random.Random(0)
+        genres = [Genre.objects.get_or_create(name=name)[0] for name in GENRES]
+        if clear:
+            Movie.objects.all().delete()
+
+        t1 = perf_counter()
+        created = 0
+        while created < count:
+            size = min(batch_size, count - created)
+            batch = [
+                Movie(
+                    title=f'Фильм {created + i}',
+                    year=rnd.randint(1920, 2021),
+                    genre=rnd.choice(genres) if rnd.random() > 0.05 else None,
+                )
+                for i in range(size)
+            ]
+            with transaction.atomic():
+                Movie.objects.bulk_create(batch, batch_size=size)
+            created += size
+            self.stdout.write(f'\r{created}/{count}', ending='')
+        elapsed = perf_counter() - t1
+        # bulk_create sends no post_save
+        bump(LIST_VERSION)
+        self.stdout.write(f'\n{count} movies in {elapsed:.1f}s ({count / elapsed:.0f} rows/s)')
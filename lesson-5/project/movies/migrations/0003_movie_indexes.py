@@ -0,0 +1,21 @@
+# Generated by Django 3.2 on 2026-10-19 15:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0002_auto_20211102_1652'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['genre', 'year'], name='movie_genre_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['title'], name='movie_title_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+from django.db import migrations, OperationalError
+
+# FTS5 index of movie titles for movies.search, SQLite only. The triggers
+# keep it in sync with every insert, update and delete, bulk ones included.
+# Titles are stored with ё replaced by е (search folds it the same way),
+# which is why the table keeps its own copy instead of content='movies_movie'.
+TITLE = "replace(replace({row}.title, 'ё', 'е'), 'Ё', 'Е')"
+CREATE = [
+    "CREATE VIRTUAL TABLE movies_movie_fts USING fts5(title, tokenize='unicode61 remove_diacritics 0')",
+    "CREATE VIRTUAL TABLE movies_movie_fts_vocab USING fts5vocab(movies_movie_fts, 'row')",
+    "INSERT INTO movies_movie_fts(rowid, title) SELECT id, " + TITLE.format(row='movies_movie') + " FROM movies_movie",
+    "CREATE TRIGGER movies_movie_fts_insert AFTER INSERT ON movies_movie BEGIN "
+    "INSERT INTO movies_movie_fts(rowid, title) VALUES (new.id, " + TITLE.format(row='new') + "); END",
+    "CREATE TRIGGER movies_movie_fts_delete AFTER DELETE ON movies_movie BEGIN "
+    "DELETE FROM movies_movie_fts WHERE rowid = old.id; END",
+    "CREATE TRIGGER movies_movie_fts_update AFTER UPDATE OF title ON movies_movie BEGIN "
+    "UPDATE movies_movie_fts SET title = " + TITLE.format(row='new') + " WHERE rowid = new.id; END",
+]
+DROP = [
+    'DROP TRIGGER IF EXISTS movies_movie_fts_update',
+    'DROP TRIGGER IF EXISTS movies_movie_fts_delete',
+    'DROP TRIGGER IF EXISTS movies_movie_fts_insert',
+    'DROP TABLE IF EXISTS movies_movie_fts_vocab',
+    'DROP TABLE IF EXISTS movies_movie_fts',
+]
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("CREATE VIRTUAL TABLE temp.movies_fts_probe USING fts5(title)")
+            cursor.execute("DROP TABLE temp.movies_fts_probe")
+    except OperationalError:
+        # sqlite built without fts5, movies.search uses its in-process index
+        return
+    for sql in CREATE:
+        schema_editor.execute(sql)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in DROP:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0003_movie_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
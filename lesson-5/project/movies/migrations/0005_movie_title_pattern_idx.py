@@ -0,0 +1,25 @@
+from django.db import migrations
+
+# Postgres only: an index for title LIKE 'prefix%' (movies.filters) whatever
+# the database collation; a plain btree on title only serves LIKE under "C".
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE INDEX movie_title_pattern_idx ON movies_movie (title varchar_pattern_ops)')
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS movie_title_pattern_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0004_movie_fts'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -6,3 +6,12 @@ class Movie(models.Model):
     title = models.CharField(max_length=64, verbose_name='Название фильма')
     genre = models.ForeignKey(Genre, null=True, on_delete=models.SET_NULL, verbose_name='Жанр')
     year = models.IntegerField(null=False, default=2021)
+
+    class Meta:
+        # filters of MovieViewSet, pages are ordered by id. No index on year
+        # alone: a year range matches a large share of the table, and walking
+        # the primary key finds a page sooner than sorting the whole range
+        indexes = [
+            models.Index(fields=['genre', 'year'], name='movie_genre_year_idx'),
+            models.Index(fields=['title'], name='movie_title_idx'),
+        ]
@@ -0,0 +1,10 @@
+from rest_framework.pagination import CursorPagination
+
+
+class MovieCursorPagination(CursorPagination):
+    # keyset pagination: WHERE id > <cursor> ORDER BY id LIMIT n, so a page
+    # costs the same however deep it is and no COUNT(*) is needed
+    ordering = 'id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
@@ -0,0 +1,260 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from movies.models import Movie
+
+# Title search without an external engine. On SQLite the FTS5 table of
+# migration 0004 is used (kept in sync by triggers, bulk inserts included);
+# on other databases, or with settings.MOVIES_SEARCH = 'memory', an inverted
+# index built in the process on first use and updated by Movie signals. The
+# in-process index only sees changes made by its own process.
+#
+# Every query word matches as a prefix; when that gives fewer than `limit`
+# movies, words of 4+ letters also match terms one typo away (two for 8+
+# letters) and those movies are ranked after the exact ones.
+
+FTS_TABLE = 'movies_movie_fts'
+VOCAB_TABLE = 'movies_movie_fts_vocab'
+WORD_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    # lower case and ё -> е, like the FTS5 table (which gets the title through
+    # the same replace in its triggers)
+    return text.lower().replace('ё', 'е')
+
+
+def tokenize(text):
+    return WORD_RE.findall(normalize(text))
+
+
+def max_typos(word):
+    if len(word) < 4 or word.isdigit():
+        return 0
+    return 1 if len(word) < 8 else 2
+
+
+def edit_distance(a, b, limit):
+    # Damerau-Levenshtein (adjacent transpositions), gives up above `limit`
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, 1):
+            current[j] = min(
+                previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b),
+            )
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def typo_terms(word, candidates):
+    # candidates share the first letter with `word`, typos there are not fixed
+    limit = max_typos(word)
+    return [term for term in candidates if term != word and edit_distance(word, term, limit) <= limit]
+
+
+class FTS5Search:
+    def match(self, words, fuzzy):
+        groups = []
+        for word in words:
+            # the word itself matches both phrases, so bm25 puts it before
+            # longer terms that only share the prefix
+            terms = [f'"{word}"', f'"{word}"*']
+            if fuzzy and max_typos(word):
+                terms += [f'"{term}"' for term in typo_terms(word, self.vocabulary(word))]
+            groups.append('(' + ' OR '.join(terms) + ')')
+        return ' AND '.join(groups)
+
+    def vocabulary(self, word):
+        limit = max_typos(word)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT term FROM {VOCAB_TABLE} WHERE term >= %s AND term < %s '
+                f'AND length(term) BETWEEN %s AND %s',
+                [word[0], chr(ord(word[0]) + 1), len(word) - limit, len(word) + limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def ids(self, expression, limit):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY rank, length(title), rowid LIMIT %s',
+                [expression, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def search(self, words, limit):
+        found = self.ids(self.match(words, fuzzy=False), limit)
+        if len(found) < limit and any(max_typos(word) for word in words):
+            seen = set(found)
+            more = self.ids(self.match(words, fuzzy=True), limit + len(found))
+            found += [pk for pk in more if pk not in seen][:limit - len(found)]
+        return found
+
+
+class InvertedIndex:
+    # term -> ids, plus the sorted vocabulary for prefix and typo lookups
+    def __init__(self):
+        self.postings = defaultdict(set)
+        self.terms = []
+        self.titles = {}
+        self.built = False
+        self._lock = threading.RLock()
+
+    def build(self, rows=None):
+        with self._lock:
+            self.postings.clear()
+            self.titles.clear()
+            if rows is None:
+                rows = Movie.objects.values_list('id', 'title').iterator(chunk_size=10_000)
+            for pk, title in rows:
+                tokens = tokenize(title)
+                self.titles[pk] = tokens
+                for token in tokens:
+                    self.postings[token].add(pk)
+            self.terms = sorted(self.postings)
+            self.built = True
+
+    def ensure_built(self):
+        if not self.built:
+            with self._lock:
+                if not self.built:
+                    self.build()
+
+    def invalidate(self):
+        # rebuilt on the next search, after bulk writes that send no signals
+        with self._lock:
+            self.built = False
+            self.postings.clear()
+            self.titles.clear()
+            self.terms = []
+
+    def add(self, pk, title):
+        with self._lock:
+            if not self.built:
+                return
+            self.remove(pk)
+            tokens = tokenize(title)
+            self.titles[pk] = tokens
+            for token in tokens:
+                if token not in self.postings:
+                    bisect.insort(self.terms, token)
+                self.postings[token].add(pk)
+
+    def remove(self, pk):
+        with self._lock:
+            for token in self.titles.pop(pk, ()):
+                ids = self.postings[token]
+                ids.discard(pk)
+                if not ids:
+                    del self.postings[token]
+                    del self.terms[bisect.bisect_left(self.terms, token)]
+
+    def starting_with(self, prefix, max_length=None):
+        start = bisect.bisect_left(self.terms, prefix)
+        end = bisect.bisect_left(self.terms, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+        if max_length is None:
+            return self.terms[start:end]
+        return [term for term in self.terms[start:end] if len(term) <= max_length]
+
+    def matches(self, word, fuzzy):
+        # term -> weight: the word itself 1.0, longer terms less the longer
+        # they are, typos 0.5
+        weights = {term: 0.8 * len(word) / len(term) for term in self.starting_with(word)}
+        if word in self.postings:
+            weights[word] = 1.0
+        if fuzzy and max_typos(word):
+            candidates = self.starting_with(word[0], len(word) + max_typos(word))
+            for term in typo_terms(word, candidates):
+                weights.setdefault(term, 0.5)
+        return weights
+
+    def scores(self, words, fuzzy):
+        # every word must match; score = sum of weight * idf of the word
+        total = len(self.titles) or 1
+        matches = [self.matches(word, fuzzy) for word in words]
+        # the rarest word first, the others only look at the movies left
+        matches.sort(key=lambda weights: sum(len(self.postings[term]) for term in weights))
+        scores = None
+        for weights in matches:
+            word_scores = {}
+            idf = math.log(1 + total / max(1, sum(len(self.postings[term]) for term in weights)))
+            for term, weight in weights.items():
+                ids = self.postings[term]
+                score = weight * idf
+                for pk in ids if scores is None else ids & scores.keys():
+                    if score > word_scores.get(pk, 0):
+                        word_scores[pk] = score
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {pk: scores[pk] + score for pk, score in word_scores.items()}
+            if not scores:
+                break
+        return scores or {}
+
+    def search(self, words, limit):
+        self.ensure_built()
+        with self._lock:
+            found = self.ranked(self.scores(words, fuzzy=False), limit)
+            if len(found) < limit and any(max_typos(word) for word in words):
+                seen = set(found)
+                more = self.ranked(self.scores(words, fuzzy=True), limit + len(found))
+                found += [pk for pk in more if pk not in seen][:limit - len(found)]
+        return found
+
+    def ranked(self, scores, limit):
+        titles = self.titles
+        return heapq.nsmallest(limit, scores, key=lambda pk: (-scores[pk], len(titles[pk]), pk))
+
+
+memory_index = InvertedIndex()
+_fts5 = {}
+
+
+def fts5_available():
+    alias = connection.alias
+    if alias not in _fts5:
+        _fts5[alias] = connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+    return _fts5[alias]
+
+
+def get_backend():
+    # settings.MOVIES_SEARCH: 'auto' (default), 'fts5' or 'memory'
+    kind = getattr(settings, 'MOVIES_SEARCH', 'auto')
+    if kind == 'fts5' or (kind == 'auto' and fts5_available()):
+        return FTS5Search()
+    return memory_index
+
+
+def search_movies(query, limit=20):
+    # ids of the best matching movies, best first
+    words = tokenize(query)
+    if not words:
+        return []
+    return get_backend().search(words, limit)
+
+
+def movie_saved(sender, instance, **kwargs):
+    # after the commit: a rolled back save leaves the index as it was
+    pk, title = instance.pk, instance.title
+    transaction.on_commit(lambda: memory_index.add(pk, title))
+
+
+def movie_deleted(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: memory_index.remove(pk))
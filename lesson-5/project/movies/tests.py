@@ -1,3 +1,614 @@
-from django.test import TestCase
+# pylint: disable=C0114,C0115,C0116
+import json
+import time
 
-# Create your tests here.
+from unittest import mock
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.middleware.clickjacking import XFrameOptionsMiddleware
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+
+from movies import serializers
+from movies.asgi import MoviesASGI
+
+from genres.catalog import VERSION_KEY, genre_catalog
+from genres.models import Genre
+from movies.cache import LIST_VERSION, bump, genre_version_key, get_cache, stats
+from movies.models import Movie
+from movies.search import memory_index
+from movies.serializers import MovieSerializer, dumps_movies, movie_rows, movie_values
+from project.db import check_connections
+from project.profiling import profiles
+
+
+def clear_caches():
+    # the response cache, and the genres catalog: its shared version outlives
+    # the rolled back rows of the previous test
+    get_cache().clear()
+    genre_catalog.invalidate()
+
+
+class TestMovieList(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        genre = Genre.objects.create(name='драма')
+        Movie.objects.bulk_create([
+            Movie(title=f'Фильм {i}', year=2000 + i % 20, genre=genre if i % 2 else None)
+            for i in range(25)
+        ])
+
+    def setUp(self):
+        clear_caches()
+
+    def test_cursor_pages_cover_all_movies(self):
+        ids = []
+        url = '/api/movies/?page_size=10'
+        pages = 0
+        while url:
+            data = self.client.get(url).json()
+            self.assertLessEqual(len(data['results']), 10)
+            ids.extend(movie['id'] for movie in data['results'])
+            url = data['next']
+            pages += 1
+        self.assertEqual(pages, 3)
+        self.assertEqual(ids, list(Movie.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_page_size_is_capped(self):
+        data = self.client.get('/api/movies/?page_size=100000').json()
+        self.assertEqual(len(data['results']), 25)
+        self.assertIsNone(data['next'])
+
+    def test_export_streams_all_movies(self):
+        response = self.client.get('/api/movies/export/')
+        self.assertTrue(response.streaming)
+        movies = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(movies), 25)
+        self.assertEqual(movies[1], {'id': movies[1]['id'], 'title': 'Фильм 1', 'year': 2001, 'genre': 'Жанр: драма'})
+        self.assertIsNone(movies[0]['genre'])
+
+    def test_export_empty_table(self):
+        Movie.objects.all().delete()
+        response = self.client.get('/api/movies/export/')
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), [])
+
+
+class TestMovieQueries(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        genres = [Genre.objects.create(name=f'жанр {i}') for i in range(5)]
+        Movie.objects.bulk_create([
+            Movie(title=f'Фильм {i}', year=2000, genre=genres[i % 5] if i % 7 else None)
+            for i in range(50)
+        ])
+
+    def setUp(self):
+        clear_caches()
+        # loaded once per process, not per request
+        genre_catalog.names(check=True)
+
+    def test_list_is_one_query(self):
+        with self.assertNumQueries(1):
+            data = self.client.get('/api/movies/?page_size=50').json()
+        self.assertEqual(len(data['results']), 50)
+
+    def test_retrieve_is_one_query(self):
+        movie = Movie.objects.exclude(genre=None).first()
+        with self.assertNumQueries(1):
+            data = self.client.get(f'/api/movies/{movie.pk}/').json()
+        self.assertEqual(data['genre'], str(movie.genre))
+
+    def test_export_is_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/movies/export/')
+            self.assertEqual(len(json.loads(b''.join(response.streaming_content))), 50)
+
+    def test_values_match_serializer(self):
+        queryset = Movie.objects.order_by('id')
+        expected = MovieSerializer(queryset, many=True).data
+        self.assertEqual(list(movie_values(queryset)), expected)
+        self.assertEqual(list(movie_values(queryset, chunk_size=7)), expected)
+
+
+class TestMovieCache(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.drama = Genre.objects.create(name='драма')
+        cls.comedy = Genre.objects.create(name='комедия')
+        cls.movie = Movie.objects.create(title='Фильм', year=2000, genre=cls.drama)
+        cls.other = Movie.objects.create(title='Другой', year=2001, genre=cls.comedy)
+
+    def setUp(self):
+        clear_caches()
+
+    def test_second_request_is_served_from_cache(self):
+        hits = stats.hits
+        first = self.client.get('/api/movies/')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/movies/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertEqual(stats.hits, hits + 1)
+
+    def test_pagination_params_are_part_of_the_key(self):
+        self.client.get('/api/movies/?page_size=1')
+        response = self.client.get('/api/movies/?page_size=2')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_if_none_match(self):
+        etag = self.client.get(f'/api/movies/{self.movie.pk}/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(f'/api/movies/{self.movie.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        response = self.client.get(f'/api/movies/{self.movie.pk}/', HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_movie_change_invalidates_its_detail_and_lists(self):
+        self.client.get('/api/movies/')
+        self.client.get(f'/api/movies/{self.movie.pk}/')
+        self.client.get(f'/api/movies/{self.other.pk}/')
+        self.movie.title = 'Новое название'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movie.save()
+
+        self.assertEqual(self.client.get('/api/movies/')['X-Cache'], 'MISS')
+        response = self.client.get(f'/api/movies/{self.movie.pk}/')
+        self.assertEqual((response['X-Cache'], response.json()['title']), ('MISS', 'Новое название'))
+        self.assertEqual(self.client.get(f'/api/movies/{self.other.pk}/')['X-Cache'], 'HIT')
+
+    def test_genre_change_invalidates_only_its_movies(self):
+        self.client.get(f'/api/movies/{self.movie.pk}/')
+        self.client.get(f'/api/movies/{self.other.pk}/')
+        self.drama.name = 'мелодрама'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.drama.save()
+
+        response = self.client.get(f'/api/movies/{self.movie.pk}/')
+        self.assertEqual((response['X-Cache'], response.json()['genre']), ('MISS', 'Жанр: мелодрама'))
+        self.assertEqual(self.client.get(f'/api/movies/{self.other.pk}/')['X-Cache'], 'HIT')
+
+    @override_settings(GENRES_CATALOG_CHECK_INTERVAL=60)
+    def test_labels_match_the_versions(self):
+        genre_catalog.names(check=True)
+        self.client.get(f'/api/movies/{self.movie.pk}/')
+        # renamed by another process: its commit replaces the shared
+        # versions, our catalog copy is within its check interval
+        Genre.objects.filter(pk=self.drama.pk).update(name='мелодрама')
+        genre_catalog.get_cache().set(VERSION_KEY, 'other')
+        bump(LIST_VERSION, genre_version_key(self.drama.pk))
+
+        response = self.client.get(f'/api/movies/{self.movie.pk}/')
+        self.assertEqual((response['X-Cache'], response.json()['genre']), ('MISS', 'Жанр: мелодрама'))
+
+    def test_deleted_movie_is_gone(self):
+        pk = self.movie.pk
+        self.client.get(f'/api/movies/{pk}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movie.delete()
+        self.assertEqual(self.client.get(f'/api/movies/{pk}/').status_code, 404)
+
+    def test_leading_zeros_share_the_entry(self):
+        pk = self.movie.pk
+        self.client.get(f'/api/movies/{pk}/')
+        self.assertEqual(self.client.get(f'/api/movies/0{pk}/')['X-Cache'], 'HIT')
+        self.movie.title = 'Новое название'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movie.save()
+        self.assertEqual(self.client.get(f'/api/movies/00{pk}/').json()['title'], 'Новое название')
+
+    def test_not_an_id(self):
+        for pk in ('abc', '99999999999999999999'):
+            self.assertEqual(self.client.get(f'/api/movies/{pk}/').status_code, 404, pk)
+
+
+class TestMovieFilters(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.drama = Genre.objects.create(name='драма')
+        comedy = Genre.objects.create(name='комедия')
+        for title, year, genre in [
+            ('Брат', 1997, cls.drama), ('Брат 2', 2000, cls.drama), ('Бумер', 2003, comedy),
+            ('Жмурки', 2005, comedy), ('брат', 2010, None),
+        ]:
+            Movie.objects.create(title=title, year=year, genre=genre)
+
+    def setUp(self):
+        clear_caches()
+
+    def titles(self, query):
+        return [movie['title'] for movie in self.client.get(f'/api/movies/?{query}').json()['results']]
+
+    def test_year_range(self):
+        self.assertEqual(self.titles('year_from=2000&year_to=2005'), ['Брат 2', 'Бумер', 'Жмурки'])
+        self.assertEqual(self.titles('year_to=1999'), ['Брат'])
+
+    def test_genre(self):
+        self.assertEqual(self.titles(f'genre={self.drama.pk}&year_from=1998'), ['Брат 2'])
+
+    def test_title_prefix_is_case_sensitive(self):
+        self.assertEqual(self.titles('title=Брат'), ['Брат', 'Брат 2'])
+        self.assertEqual(self.titles('title=Б'), ['Брат', 'Брат 2', 'Бумер'])
+
+    def test_export_is_filtered(self):
+        response = self.client.get('/api/movies/export/?year_from=2003')
+        self.assertEqual([m['title'] for m in json.loads(b''.join(response.streaming_content))], ['Бумер', 'Жмурки', 'брат'])
+
+    def test_invalid_param(self):
+        response = self.client.get('/api/movies/?year_from=abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('year_from', response.json())
+
+    def test_huge_int_param(self):
+        for query in ('year_from=99999999999999999999', 'year_to=-99999999999999999999', 'genre=2147483648'):
+            response = self.client.get(f'/api/movies/?{query}')
+            self.assertEqual(response.status_code, 400, query)
+            self.assertIn(query.split('=')[0], response.json())
+        self.assertEqual(self.client.get('/api/movies/export/?genre=99999999999999999999').status_code, 400)
+
+
+class TestMovieBulk(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', password='x', is_staff=True)
+
+    def setUp(self):
+        clear_caches()
+        self.client.force_login(self.staff)
+
+    def post(self, body, content_type='application/jsonlines', status=200):
+        if isinstance(body, str):
+            body = body.encode()
+        response = self.client.post('/api/movies/bulk/', body, content_type=content_type)
+        self.assertEqual(response.status_code, status)
+        return response.json()
+
+    def test_jsonl_creates_and_updates(self):
+        movie = Movie.objects.create(title='Старое', year=1990)
+        body = '\n'.join([
+            '{"title": "Брат", "year": 1997, "genre": "драма"}',
+            '{"title": "Бумер", "genre": "драма"}',
+            json.dumps({'id': movie.pk, 'title': 'Новое', 'year': 1991, 'genre': 'комедия'}),
+            '',
+        ])
+        # session and user, then the ingest
+        with self.assertNumQueries(10):
+            result = self.post(body)
+        self.assertEqual((result['created'], result['updated'], result['error_count']), (2, 1, 0))
+        self.assertEqual(Genre.objects.count(), 2)
+        movie.refresh_from_db()
+        self.assertEqual((movie.title, movie.year, movie.genre.name), ('Новое', 1991, 'комедия'))
+        self.assertEqual(Movie.objects.get(title='Бумер').year, 2021)
+
+    def test_csv(self):
+        Genre.objects.create(name='драма')
+        result = self.post('title,year,genre\nБрат,1997,драма\nЖмурки,2005,\n', 'text/csv')
+        self.assertEqual(result['created'], 2)
+        self.assertEqual(Genre.objects.count(), 1)
+        self.assertIsNone(Movie.objects.get(title='Жмурки').genre)
+
+    def test_invalid_rows_are_reported(self):
+        body = '{"title": "Брат"}\nnot json\n{"title": ""}\n{"title": "Бумер", "year": "x"}\n'
+        result = self.post(body)
+        self.assertEqual((result['created'], result['error_count']), (1, 3))
+        self.assertEqual([error['line'] for error in result['errors']], [2, 3, 4])
+        self.assertEqual(result['errors'][2]['errors'], {'year': 'an integer from 1 to 9999 is required'})
+
+    def test_staff_only(self):
+        self.client.logout()
+        self.post('{"title": "Брат"}\n', status=403)
+        self.client.force_login(User.objects.create_user('user', password='x'))
+        self.post('{"title": "Брат"}\n', status=403)
+        self.assertFalse(Movie.objects.exists())
+
+    def test_numbers_are_strict(self):
+        rows = [
+            {'title': 'a', 'year': True},
+            {'title': 'b', 'year': 1.7},
+            {'title': 'c', 'year': 99999999999999999999},
+            {'title': 'd', 'id': -1},
+            {'title': 'e', 'year': 1997.0, 'id': 10},
+            {'title': 'f', 'year': '1998'},
+        ]
+        result = self.post(''.join(json.dumps(row) + '\n' for row in rows))
+        self.assertEqual(result['created'], 2)
+        self.assertEqual([(error['line'], list(error['errors'])) for error in result['errors']], [
+            (1, ['year']), (2, ['year']), (3, ['year']), (4, ['id']),
+        ])
+        self.assertEqual(Movie.objects.get(pk=10).year, 1997)
+        self.assertEqual(Movie.objects.get(title='f').year, 1998)
+
+    def test_repeated_id_in_a_batch(self):
+        result = self.post('{"id": 5, "title": "a"}\n{"id": 5, "title": "b"}\n')
+        self.assertEqual((result['created'], result['error_count']), (1, 1))
+        self.assertEqual(result['errors'][0], {'line': 2, 'errors': {'id': 'repeated in this batch'}})
+        self.assertEqual(Movie.objects.get(pk=5).title, 'a')
+
+    def test_invalid_utf8(self):
+        result = self.post(b'{"title": "a"}\n{"title": "\xff"}\n', status=400)
+        self.assertEqual(result['detail'], 'line 2 is not valid UTF-8')
+        self.assertEqual(result['created'], 0)
+        self.assertFalse(Movie.objects.exists())
+
+    def test_new_genres_reach_the_catalog(self):
+        self.assertEqual(self.client.get('/api/movies/', {'genre_name': 'новый'}).json()['results'], [])
+        self.post('{"title": "a", "genre": "новый"}\n')
+        get_cache().clear()
+        self.assertEqual(len(self.client.get('/api/movies/', {'genre_name': 'новый'}).json()['results']), 1)
+
+    def test_list_cache_is_invalidated(self):
+        self.assertEqual(self.client.get('/api/movies/').json()['results'], [])
+        self.post('{"title": "Брат"}\n')
+        self.assertEqual(len(self.client.get('/api/movies/').json()['results']), 1)
+
+
+class TestFastSerializer(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        genre = Genre.objects.create(name='"жанр"\\ \u2028')
+        titles = ['Брат', 'кавычки " и \\', 'управляющие \x00\x1f\n\t', 'разделители \u2028\u2029', '😀 </script>']
+        for i, title in enumerate(titles):
+            Movie.objects.create(title=title, year=1990 + i, genre=genre if i % 2 else None)
+
+    def test_same_bytes_as_drf(self):
+        queryset = Movie.objects.select_related('genre').order_by('id')
+        expected = JSONRenderer().render(MovieSerializer(queryset, many=True).data)
+        self.assertEqual(dumps_movies(movie_rows(queryset)), expected)
+        with mock.patch.object(serializers, 'orjson', None):
+            self.assertEqual(dumps_movies(movie_rows(queryset)), expected)
+
+    def test_empty(self):
+        self.assertEqual(dumps_movies([]), JSONRenderer().render([]))
+
+    def test_export_matches_drf(self):
+        clear_caches()
+        views = 'movies.views.MovieViewSet.export_chunk_size'
+        queryset = Movie.objects.select_related('genre').order_by('id')
+        expected = JSONRenderer().render(MovieSerializer(queryset, many=True).data)
+        for chunk_size in (1, 2, 100):
+            with mock.patch(views, chunk_size):
+                response = self.client.get('/api/movies/export/')
+                self.assertEqual(b''.join(response.streaming_content), expected)
+
+
+class TestMoviesASGI(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        genre = Genre.objects.create(name='драма')
+        for i in range(5):
+            Movie.objects.create(title=f'Фильм {i}', year=2000 + i, genre=genre if i % 2 else None)
+
+    def setUp(self):
+        clear_caches()
+
+    async def get(self, path, query=b''):
+        scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query, 'headers': []}
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        await MoviesASGI(None, export_chunk_size=2)(scope, receive, send)
+        return messages[0]['status'], b''.join(message.get('body', b'') for message in messages[1:])
+
+    def drf(self, queryset):
+        return JSONRenderer().render(MovieSerializer(queryset.select_related('genre').order_by('id'), many=True).data)
+
+    async def test_list_pages(self):
+        status, body = await self.get('/api/async/movies/', b'page_size=3&year_from=2001')
+        page = json.loads(body)
+        self.assertEqual(status, 200)
+        self.assertEqual([movie['year'] for movie in page['results']], [2001, 2002, 2003])
+        after = page['results'][-1]['id']
+        self.assertEqual(page['next'], f'/api/async/movies/?page_size=3&year_from=2001&after={after}')
+
+        status, body = await self.get('/api/async/movies/', page['next'].partition('?')[2].encode())
+        page = json.loads(body)
+        self.assertEqual(([movie['year'] for movie in page['results']], page['next']), ([2004], None))
+
+    async def test_retrieve(self):
+        movie = await sync_to_async(Movie.objects.filter(year=2001).first)()
+        status, body = await self.get(f'/api/async/movies/{movie.pk}/')
+        self.assertEqual(status, 200)
+        expected = await sync_to_async(self.drf)(Movie.objects.filter(pk=movie.pk))
+        self.assertEqual(body, expected[1:-1])
+        self.assertEqual(await self.get('/api/async/movies/0/'), (404, b'{"detail":"Not found."}'))
+
+    async def test_export_matches_drf(self):
+        status, body = await self.get('/api/async/movies/export/')
+        self.assertEqual(status, 200)
+        self.assertEqual(body, await sync_to_async(self.drf)(Movie.objects.all()))
+
+    async def test_bad_filter(self):
+        for query in (b'year_from=x', b'year_from=99999999999999999999'):
+            status, body = await self.get('/api/async/movies/export/', query)
+            self.assertEqual(status, 400)
+            self.assertIn(b'year_from', body)
+
+    async def test_genres(self):
+        status, body = await self.get('/api/async/genres/')
+        self.assertEqual([genre['name'] for genre in json.loads(body)], ['драма'])
+
+    async def test_export_by_genre_name(self):
+        # the catalog loads from the database inside the request
+        await sync_to_async(genre_catalog.invalidate)()
+        status, body = await self.get('/api/async/movies/export/', urlencode({'genre_name': 'драма'}).encode())
+        self.assertEqual(status, 200)
+        self.assertEqual([movie['year'] for movie in json.loads(body)], [2001, 2003])
+
+    async def test_error_is_a_500(self):
+        with mock.patch('movies.asgi.fetch_movie', side_effect=RuntimeError), self.assertLogs('django.request'):
+            status, body = await self.get('/api/async/movies/1/')
+        self.assertEqual((status, body), (500, b'{"detail":"A server error occurred."}'))
+
+
+class SearchTests:
+    @classmethod
+    def setUpTestData(cls):
+        genre = Genre.objects.create(name='драма')
+        for title in ['Брат', 'Брат 2', 'Братва', 'Бумер', 'Жмурки', 'Ёлки', 'Старший брат', 'Мой старший брат']:
+            Movie.objects.create(title=title, year=2000, genre=genre)
+
+    def setUp(self):
+        clear_caches()
+        memory_index.invalidate()
+
+    def search(self, q, limit=20):
+        return [movie['title'] for movie in self.client.get('/api/movies/search/', {'q': q, 'limit': limit}).json()['results']]
+
+    def test_prefix(self):
+        self.assertEqual(self.search('бра')[0], 'Брат')
+        self.assertEqual(set(self.search('бра')), {'Брат', 'Брат 2', 'Братва', 'Старший брат', 'Мой старший брат'})
+
+    def test_all_words_must_match(self):
+        self.assertEqual(self.search('старший брат'), ['Старший брат', 'Мой старший брат'])
+
+    def test_typo(self):
+        self.assertEqual(self.search('Жмруки'), ['Жмурки'])
+        self.assertEqual(self.search('бумр'), ['Бумер'])
+        self.assertEqual(self.search('страший брат')[:2], ['Старший брат', 'Мой старший брат'])
+
+    def test_exact_before_typo(self):
+        self.assertEqual(self.search('брат', limit=10)[:2], ['Брат', 'Брат 2'])
+        self.assertEqual(self.search('брат', limit=10)[-1], 'Братва')
+
+    def test_diacritics_and_limit(self):
+        self.assertEqual(self.search('елки'), ['Ёлки'])
+        self.assertEqual(len(self.search('брат', limit=1)), 1)
+        self.assertEqual(len(self.search('брат', limit=-1)), 1)
+        self.assertEqual(self.search(''), [])
+
+    def test_follows_changes(self):
+        self.search('бумер')
+        movie = Movie.objects.get(title='Бумер')
+        movie.title = 'Бумер 2'
+        with self.captureOnCommitCallbacks(execute=True):
+            movie.save()
+        self.assertEqual(self.search('бумер'), ['Бумер 2'])
+        with self.captureOnCommitCallbacks(execute=True):
+            movie.delete()
+        self.assertEqual(self.search('бумер'), [])
+        self.client.force_login(User.objects.create_user('staff', password='x', is_staff=True))
+        self.client.post('/api/movies/bulk/', '{"title": "Бумер: Фильм второй"}\n', content_type='application/jsonlines')
+        self.assertEqual(self.search('бумер'), ['Бумер: Фильм второй'])
+
+    def test_rolled_back_changes_are_not_indexed(self):
+        self.search('бумер')
+        movie = Movie.objects.get(title='Бумер')
+        with self.assertRaises(DatabaseError), transaction.atomic():
+            movie.title = 'Бумер 2'
+            movie.save()
+            Movie.objects.get(title='Жмурки').delete()
+            raise DatabaseError('rolled back')
+        self.assertEqual(self.search('бумер'), ['Бумер'])
+        self.assertEqual(self.search('жмурки'), ['Жмурки'])
+
+
+@override_settings(MOVIES_SEARCH='fts5')
+class TestSearchFTS5(SearchTests, TestCase):
+    pass
+
+
+@override_settings(MOVIES_SEARCH='memory')
+class TestSearchMemory(SearchTests, TestCase):
+    pass
+
+
+class TestConnectionHealth(TransactionTestCase):
+    # outside TestCase's transaction, a connection in one is never closed
+    def setUp(self):
+        connection.ensure_connection()
+
+    def check(self, usable, **settings_dict):
+        with mock.patch.dict(connection.settings_dict, settings_dict), \
+                mock.patch.object(connection, 'is_usable', return_value=usable) as is_usable, \
+                mock.patch.object(connection, 'close') as close:
+            check_connections()
+        return is_usable.called, close.called
+
+    def test_dead_persistent_connection_is_closed(self):
+        self.assertEqual(self.check(False, CONN_MAX_AGE=60, CONN_HEALTH_CHECKS=True), (True, True))
+
+    def test_live_connection_is_kept(self):
+        self.assertEqual(self.check(True, CONN_MAX_AGE=60, CONN_HEALTH_CHECKS=True), (True, False))
+
+    def test_no_ping_without_persistent_connections_or_checks(self):
+        self.assertEqual(self.check(False, CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=True), (False, False))
+        self.assertEqual(self.check(False, CONN_MAX_AGE=60, CONN_HEALTH_CHECKS=False), (False, False))
+
+    def test_middleware_checks_before_the_view(self):
+        with mock.patch('project.db.check_connections') as check:
+            self.client.get('/api/movies/')
+        check.assert_called_once_with()
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=0.0)
+class TestProfiling(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Movie.objects.create(title='Брат', year=1997)
+        cls.staff = User.objects.create_user('staff', password='x', is_staff=True)
+
+    def setUp(self):
+        clear_caches()
+        genre_catalog.names(check=True)
+        profiles.clear()
+
+    def timings(self, response):
+        return dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+
+    def test_server_timing_header(self):
+        timings = self.timings(self.client.get('/api/movies/'))
+        self.assertEqual(set(timings), {'total', 'db', 'render'})
+        self.assertIn('desc="1 queries"', timings['db'])
+
+    def test_render_leaves_out_inner_middlewares(self):
+        process_response = XFrameOptionsMiddleware.process_response
+
+        def slow(middleware, request, response):
+            time.sleep(0.05)
+            return process_response(middleware, request, response)
+
+        with mock.patch.object(XFrameOptionsMiddleware, 'process_response', slow):
+            timings = self.timings(self.client.get('/api/movies/'))
+        duration = {name: float(value.split('dur=')[1].split(';')[0]) for name, value in timings.items()}
+        self.assertGreaterEqual(duration['total'], 50)
+        self.assertLess(duration['render'], 50)
+
+    def test_totals_per_view(self):
+        self.client.get('/api/movies/')
+        self.client.get('/api/movies/')
+        self.client.force_login(self.staff)
+        views = {row['view']: row for row in self.client.get('/profiling/').json()['views']}
+        self.assertEqual(views['MovieViewSet.list']['requests'], 2)
+        # the second one came from the response cache
+        self.assertEqual(views['MovieViewSet.list']['queries'], 1)
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0)
+    def test_sampled_profile(self):
+        timings = self.timings(self.client.get('/api/movies/'))
+        self.assertIn('mem', timings)
+        sample_id = timings['profile'].split('"')[1]
+
+        self.assertEqual(self.client.get(f'/profiling/{sample_id}/').status_code, 302)
+        self.client.force_login(self.staff)
+        with override_settings(PROFILING_SAMPLE_RATE=0.0):
+            response = self.client.get(f'/profiling/{sample_id}/')
+            self.assertIn(b'function calls', response.content)
+            self.assertIn(b'views.py', response.content)
+            self.assertEqual(self.client.get('/profiling/999/').status_code, 404)
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/movies/'))
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get('/profiling/').status_code, 404)
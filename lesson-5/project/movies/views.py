@@ -1,19 +1,95 @@
+from itertools import islice
+
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404
 
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 
+from movies.cache import LIST_VERSION, cached_response, detail_key, genre_version_key, list_key, stats
+from movies.filters import MAX_INT, filter_movies, int_param
+from movies.ingest import decode_lines, ingest, parse_csv, parse_jsonl
 from movies.models import Movie
-from movies.serializers import MovieSerializer
+from movies.pagination import MovieCursorPagination
+from movies.search import search_movies
+from movies.serializers import MovieSerializer, dumps_movies, movie_rows, movie_values
+
+
+def stream_movies(queryset, chunk_size):
+    # one json array sent in pieces of `chunk_size` movies
+    rows = movie_rows(queryset, chunk_size)
+    yield b'['
+    first = True
+    while chunk := list(islice(rows, chunk_size)):
+        yield (b'' if first else b',') + dumps_movies(chunk)[1:-1]
+        first = False
+    yield b']'
+
 
 class MovieViewSet(viewsets.ViewSet):
+    lookup_value_regex = '[0-9]+'
+    pagination_class = MovieCursorPagination
+    export_chunk_size = 2000
+    ingest_batch_size = 5000
+    search_limit = 20
+    search_max_limit = 100
+
+    def get_queryset(self):
+        # genre labels come from genres.catalog, no join needed
+        return Movie.objects.all()
+
+    @cached_response(list_key, depends=[LIST_VERSION])
     def list(self, request):
-        queryset = Movie.objects.all()
-        serializer = MovieSerializer(queryset, many=True)
-        return Response(serializer.data)
+        queryset = filter_movies(self.get_queryset(), request.query_params)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = MovieSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
+    @cached_response(lambda request, pk=None: detail_key(pk))
     def retrieve(self, request, pk=None):
-        queryset = Movie.objects.all()
+        if int(pk) > MAX_INT:
+            raise Http404
+        queryset = self.get_queryset()
         movie = get_object_or_404(queryset, pk=pk)
         serializer = MovieSerializer(movie)
-        return Response(serializer.data)
+        response = Response(serializer.data)
+        if movie.genre_id is not None:
+            response.cache_depends = [genre_version_key(movie.genre_id)]
+        return response
+
+    @action(detail=False)
+    def export(self, request):
+        # the whole table as one json array, rows are read from a server-side
+        # cursor and sent as they are serialized, memory does not grow with it
+        queryset = filter_movies(Movie.objects.order_by('id'), request.query_params)
+        return StreamingHttpResponse(
+            stream_movies(queryset, self.export_chunk_size), content_type='application/json',
+        )
+
+    @action(detail=False)
+    def search(self, request):
+        # ?q=<words>&limit=, best matches first; every word is a prefix and
+        # may have a typo
+        limit = int_param(request.query_params, 'limit') or self.search_limit
+        # a negative LIMIT is no limit on sqlite
+        limit = max(1, min(limit, self.search_max_limit))
+        ids = search_movies(request.query_params.get('q', ''), limit)
+        movies = {movie['id']: movie for movie in movie_values(Movie.objects.filter(id__in=ids))}
+        return Response({'results': [movies[pk] for pk in ids if pk in movies]})
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def bulk(self, request):
+        # staff only: POST a JSON lines (default) or CSV (Content-Type:
+        # text/csv) body, it is read line by line and written in batches
+        parse = parse_csv if request.content_type.startswith('text/csv') else parse_jsonl
+        lines = decode_lines(request.stream or [])
+        result = ingest(parse(lines), batch_size=self.ingest_batch_size)
+        # 400 when the body stopped being readable or writable part way
+        return Response(result.as_dict(), status=400 if result.detail else 200)
+
+    @action(detail=False, url_path='cache-stats')
+    def cache_stats(self, request):
+        return Response(stats.as_dict())
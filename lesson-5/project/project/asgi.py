@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# /api/async/ is answered without going through Django's request handling,
+# everything else is passed to Django
+from movies.asgi import MoviesASGI  # noqa: E402  (needs django.setup())
+
+application = MoviesASGI(django_application)
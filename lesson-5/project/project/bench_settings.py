@@ -0,0 +1,37 @@
+# SQLite settings for local benchmarks, no postgres needed:
+#   python manage.py migrate --settings=project.bench_settings
+#   python manage.py seed_movies 1000000 --settings=project.bench_settings
+#   python manage.py bench_movies --settings=project.bench_settings
+import tempfile
+
+from project.settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('BENCH_DB', os.path.join(BASE_DIR, 'bench.sqlite3')),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# the genres catalog version in files, shared by the processes of this
+# machine; with BENCH_CACHE_DIR=/tmp/cache the response cache too, e.g. to
+# try several workers
+CACHE_DIR = os.environ.get('BENCH_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'movies-bench-cache')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'shared'),
+    },
+}
+if os.environ.get('BENCH_CACHE_DIR'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR,
+    }
+
+GENRES_CATALOG_CHECK_INTERVAL = float(os.environ.get('GENRES_CATALOG_CHECK_INTERVAL', 1.0))
@@ -0,0 +1,31 @@
+from django.db import connections
+
+# Persistent connections (DATABASES[...]['CONN_MAX_AGE'] > 0) are reused by
+# the next request of the same worker thread. Django 3.x only drops them
+# after an error or when they are too old, so a connection cut by a database
+# restart or by pgbouncer fails the first query of the next request.
+# With 'CONN_HEALTH_CHECKS': True (the name Django 4.1 gives the same check)
+# a reused connection is pinged before the view runs and reopened if dead.
+
+
+def check_connections():
+    for conn in connections.all():
+        if (
+            conn.connection is None
+            or conn.in_atomic_block
+            or not conn.settings_dict.get('CONN_MAX_AGE')
+            or not conn.settings_dict.get('CONN_HEALTH_CHECKS')
+        ):
+            continue
+        if not conn.is_usable():
+            # reconnects lazily on the next query
+            conn.close()
+
+
+class ConnectionHealthMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        check_connections()
+        return self.get_response(request)
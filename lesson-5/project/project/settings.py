@@ -38,11 +38,13 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
-    'movies',
-    'genres',
+    'movies.apps.MoviesConfig',
+    'genres.apps.GenresConfig',
 ]
 
 MIDDLEWARE = [
+    'project.profiling.ProfilingMiddleware',
+    'project.db.ConnectionHealthMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -82,12 +84,53 @@ DATABASES = {
          'NAME': 'quack_db',
          'USER': 'quack',
          'PASSWORD': 's3cr3t',
-         'HOST': '127.0.0.1',
-         'PORT': '5432',
+         'HOST': os.environ.get('DB_HOST', '127.0.0.1'),
+         'PORT': os.environ.get('DB_PORT', '5432'),
+         # seconds a connection is kept for the next request of the worker,
+         # 0 closes it after every request; a reused connection is pinged
+         # first (project.db.ConnectionHealthMiddleware)
+         'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+         'CONN_HEALTH_CHECKS': True,
+         # with DB_PGBOUNCER=1, DB_HOST/DB_PORT point at pgbouncer in
+         # transaction mode (the connection pool), where a server-side cursor
+         # cannot outlive its transaction: .iterator() fetches client-side
+         'DISABLE_SERVER_SIDE_CURSORS': bool(os.environ.get('DB_PGBOUNCER')),
      }
 }
 
 
+# Cache
+# locmem is per process; point MOVIES_CACHE at a shared backend (redis,
+# memcached) when several workers serve the API
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # seen by every worker; the table is made by `manage.py createcachetable`
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'shared_cache',
+    },
+}
+
+MOVIES_CACHE = 'default'
+MOVIES_CACHE_TIMEOUT = 300
+
+# genres.catalog: cache holding the catalog version, and how often (seconds)
+# a process checks it. It must be shared by all workers, a per-process one
+# fails the genres.E001 check
+GENRES_CACHE = 'shared'
+GENRES_CATALOG_CHECK_INTERVAL = 1.0
+
+# project.profiling: Server-Timing headers and per-view totals, plus cProfile
+# of a PROFILING_SAMPLE_RATE share of requests (the last PROFILING_KEEP are
+# kept); /profiling/ for staff. PROFILING=1 in the environment turns it on
+PROFILING_ENABLED = os.environ.get('PROFILING') == '1'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0.01))
+PROFILING_KEEP = 50
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -19,12 +19,15 @@ from django.urls import path
 from rest_framework.routers import DefaultRouter
 
 from movies.views import MovieViewSet
+from project.profiling import profiling_sample, profiling_summary
 
 router = DefaultRouter()
 router.register(r'api/movies', MovieViewSet, basename='movies')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('profiling/', profiling_summary),
+    path('profiling/<int:sample_id>/', profiling_sample),
 ]
 
 urlpatterns += router.urls
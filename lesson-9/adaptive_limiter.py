@@ -0,0 +1,176 @@
+import sys
+import asyncio
+import contextlib
+from collections import deque
+from time import perf_counter
+from urllib.parse import urlsplit
+
+import aiohttp
+from aiohttp import web
+
+from stub_server import make_aio_stub_app
+
+
+class AIMDLimiter:
+    # Additive increase (+1 per window of successful requests) while requests
+    # are fast and successful, multiplicative decrease on errors or slow
+    # responses. Only requests started after the last decrease may trigger the
+    # next one, so one burst of failures halves the limit once.
+    def __init__(self, initial=4, min_limit=1, max_limit=256, backoff=0.5, latency_target=1.0):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def cancel(self):
+        # give back a slot that was never used, the limit stays as it is
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    async def release(self, started, latency, ok):
+        if ok and latency <= self.latency_target:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        elif started >= self._last_decrease:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+            self._last_decrease = perf_counter()
+
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+
+class LimiterStats:
+    def __init__(self, window=1000):
+        self.latencies = deque(maxlen=window)
+        self.completed = 0
+        self.errors = 0
+        self.started = perf_counter()
+
+    def record(self, latency, ok):
+        self.latencies.append(latency)
+        self.completed += 1
+        self.errors += not ok
+
+    def percentile(self, q):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def throughput(self):
+        return self.completed / (perf_counter() - self.started)
+
+
+class Outcome:
+    def __init__(self):
+        self.ok = True
+
+    def check_status(self, status):
+        # overload signals, the caller still decides whether to raise
+        if status == 429 or status >= 500:
+            self.ok = False
+
+
+class AdaptiveLimiter:
+    def __init__(self, initial=4, max_limit=256, per_host_initial=4, per_host_max=64, latency_target=1.0):
+        self.latency_target = latency_target
+        self.per_host_initial = per_host_initial
+        self.per_host_max = per_host_max
+        self.global_limiter = AIMDLimiter(initial, max_limit=max_limit, latency_target=latency_target)
+        self.hosts = {}
+        self.stats = LimiterStats()
+
+    def host_limiter(self, url):
+        host = urlsplit(url).netloc
+        if host not in self.hosts:
+            self.hosts[host] = AIMDLimiter(
+                self.per_host_initial, max_limit=self.per_host_max, latency_target=self.latency_target,
+            )
+        return self.hosts[host]
+
+    @contextlib.asynccontextmanager
+    async def slot(self, url):
+        host_limiter = self.host_limiter(url)
+        # host first, so a request waiting for its host does not hold a global slot
+        await host_limiter.acquire()
+        try:
+            await self.global_limiter.acquire()
+        except BaseException:
+            # cancelled while waiting
+            await host_limiter.cancel()
+            raise
+
+        outcome = Outcome()
+        started = perf_counter()
+        try:
+            yield outcome
+        except aiohttp.ClientResponseError:
+            # raise_for_status(): a 404 is not overload, check_status decided
+            raise
+        except (asyncio.TimeoutError, aiohttp.ClientError):
+            outcome.ok = False
+            raise
+        finally:
+            latency = perf_counter() - started
+            await host_limiter.release(started, latency, outcome.ok)
+            await self.global_limiter.release(started, latency, outcome.ok)
+            self.stats.record(latency, outcome.ok)
+
+    def report(self):
+        stats = self.stats
+        hosts = ', '.join(
+            f'{host}: {lim.in_flight}/{int(lim.limit)}' for host, lim in self.hosts.items()
+        )
+        return (
+            f'{stats.throughput():7.1f} req/s, done = {stats.completed}, errors = {stats.errors}, '
+            f'in flight = {self.global_limiter.in_flight}/{int(self.global_limiter.limit)}, '
+            f'p50 = {stats.percentile(0.5) * 1000:.0f}ms, p90 = {stats.percentile(0.9) * 1000:.0f}ms, '
+            f'p99 = {stats.percentile(0.99) * 1000:.0f}ms [{hosts}]'
+        )
+
+    async def report_forever(self, interval=1.0, file=sys.stderr):
+        while True:
+            await asyncio.sleep(interval)
+            print(self.report(), file=file)
+
+
+async def fetch(url, session, limiter):
+    async with limiter.slot(url) as outcome:
+        async with session.get(url) as resp:
+            outcome.check_status(resp.status)
+            resp.raise_for_status()
+            return await resp.read()
+
+
+async def run(N=2000, capacity=40, latency=0.02):
+    # the server starts failing with 503 when more than `capacity` requests
+    # are in flight, the limiter should settle around it
+    runner = web.AppRunner(make_aio_stub_app(latency=latency, capacity=capacity))
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    url = f'http://127.0.0.1:{port}/'
+
+    limiter = AdaptiveLimiter(initial=4, per_host_max=256)
+    reporter = asyncio.create_task(limiter.report_forever(0.5, sys.stdout))
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+        await asyncio.gather(*[fetch(url, session, limiter) for _ in range(N)], return_exceptions=True)
+    reporter.cancel()
+    print(limiter.report())
+
+    await runner.cleanup()
+
+
+if __name__ == '__main__':
+    asyncio.run(run())
@@ -1,37 +1,130 @@
 import asyncio
-from time import time
+import argparse
+from time import time, perf_counter
 
 import aiohttp
 
+from adaptive_limiter import AdaptiveLimiter
+from content_store import ContentStore
+from stub_server import start_server_process
 
-async def fetch_url(url, session, lock):
-    async with lock:
+
+CHUNK_SIZE = 64 * 1024
+
+
+async def fetch_url(url, session, limiter, store):
+    async with limiter.slot(url) as outcome:
+        async with session.get(url) as resp:
+            outcome.check_status(resp.status)
+            resp.raise_for_status()
+            await store.save(resp.content.iter_chunked(CHUNK_SIZE), url, resp.content_type)
+
+
+async def fetch_url_blocking(url, session, limiter):
+    # the old way: whole body in memory, blocking write inside the event loop
+    async with limiter.slot(url):
         async with session.get(url) as resp:
             data = await resp.read()
             with open(f'data/image_{time()}.jpeg', 'wb') as f:
                 f.write(data)
 
 
-async def main():
-    N = 200
-    # URL = 'https://loremflickr.com/320/240'
-    URL = 'http://go.mail.ru/spch?q=%D0%BC%D0%B0%D1%82%D1%80%D0%B5%D1%86%D0%B0'
-    urls = [URL] * N
+async def monitor_loop_lag(stats, interval=0.005):
+    # how late the loop wakes us up is how long it was stalled by someone else
+    while True:
+        t1 = perf_counter()
+        await asyncio.sleep(interval)
+        lag = perf_counter() - t1 - interval
+        stats['max'] = max(stats['max'], lag)
+        stats['total'] += max(lag, 0)
 
-    lock = asyncio.Semaphore(10)
 
-    t1 = time()
-    async with aiohttp.ClientSession() as session:
-        tasks = [
-            asyncio.create_task(fetch_url(url, session, lock))
-            for url in urls
-        ]
-        await asyncio.gather(*tasks)
+async def download(urls, limiter=None, blocking=False, report=False):
+    limiter = limiter or AdaptiveLimiter(initial=10)
+    store = ContentStore('data')
+    lag = {'max': 0.0, 'total': 0.0}
+    monitor = asyncio.create_task(monitor_loop_lag(lag))
+    if report:
+        reporter = asyncio.create_task(limiter.report_forever())
+
+    # concurrency is up to the limiter, not the connector
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+        if blocking:
+            coros = [fetch_url_blocking(url, session, limiter) for url in urls]
+        else:
+            coros = [fetch_url(url, session, limiter, store) for url in urls]
+        results = await asyncio.gather(*coros, return_exceptions=True)
+
+    monitor.cancel()
+    if report:
+        reporter.cancel()
+    store.close()
+    errors = [res for res in results if isinstance(res, Exception)]
+    return lag, store, errors
+
+
+async def fetch_in_memory(urls, concurrency=10):
+    lock = asyncio.Semaphore(concurrency)
 
+    async def fetch(url, session):
+        async with lock:
+            async with session.get(url) as resp:
+                return await resp.read()
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+        return await asyncio.gather(*[fetch(url, session) for url in urls])
+
+
+async def main(urls, concurrency, max_concurrency):
+    limiter = AdaptiveLimiter(initial=concurrency, max_limit=max_concurrency, per_host_max=max_concurrency)
+
+    t1 = time()
+    _, store, errors = await download(urls, limiter, report=True)
     t2 = time()
-    print(f'main time = {t2 - t1}')
+    print(limiter.report())
+    print(
+        f'main time = {t2 - t1}, stored = {len(store.index)}, '
+        f'duplicates = {store.duplicates}, errors = {len(errors)}'
+    )
+
+
+async def measure_stalls(N=200, body_size=4 * 2 ** 20):
+    server, url = start_server_process(latency=0.01, body=b'x' * body_size)
+    urls = [url] * N
+
+    for blocking in (True, False):
+        t1 = perf_counter()
+        lag, _, _ = await download(urls, blocking=blocking)
+        t2 = perf_counter()
+        name = 'blocking' if blocking else 'executor'
+        print(
+            f'{name:>8}: time = {t2 - t1:.2f}s, '
+            f'max loop stall = {lag["max"] * 1000:.1f}ms, total stall = {lag["total"] * 1000:.0f}ms'
+        )
+
+    server.terminate()
+
 
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('urls', nargs='?', help='file with one url per line')
+    parser.add_argument('-n', type=int, default=200, help='times to fetch the default url')
+    parser.add_argument('-c', '--concurrency', type=int, default=10, help='initial concurrency')
+    parser.add_argument('--max-concurrency', type=int, default=100)
+    parser.add_argument('--stalls', action='store_true', help='measure event loop stalls')
+    return parser.parse_args()
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    args = parse_args()
+    if args.stalls:
+        asyncio.run(measure_stalls())
+    else:
+        if args.urls:
+            with open(args.urls) as f:
+                urls = [line.strip() for line in f if line.strip()]
+        else:
+            # URL = 'https://loremflickr.com/320/240'
+            URL = 'http://go.mail.ru/spch?q=%D0%BC%D0%B0%D1%82%D1%80%D0%B5%D1%86%D0%B0'
+            urls = [URL] * args.n
+        asyncio.run(main(urls, args.concurrency, args.max_concurrency))
@@ -0,0 +1,140 @@
+import os
+import sys
+import json
+import asyncio
+import argparse
+import platform
+import statistics
+import contextlib
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+
+import cpu_bound
+import io_bound
+import async_bound
+from pooled_fetcher import PooledFetcher
+from stub_server import start_server_process
+
+
+def cpu_cases(n, workers, stack):
+    cases = {'cpu/main': lambda: cpu_bound.countdawn(n)}
+    for num in workers:
+        cases[f'cpu/threads-{num}'] = lambda num=num: cpu_bound.run_threads(n, num)
+
+    # pools are started once, so the timing does not include worker start up
+    for num in workers:
+        executor = stack.enter_context(ProcessPoolExecutor(num))
+        cases[f'cpu/processes-{num}'] = lambda num=num, ex=executor: cpu_bound.run_processes(n, num, ex)
+
+    if cpu_bound.InterpreterPoolExecutor is not None:
+        for num in workers:
+            executor = stack.enter_context(cpu_bound.InterpreterPoolExecutor(num))
+            cases[f'cpu/interpreters-{num}'] = lambda num=num, ex=executor: cpu_bound.run_interpreters(n, num, ex)
+    return cases
+
+
+def io_cases(url, requests_num, workers, stack):
+    urls = [url] * requests_num
+    cases = {}
+    for num in workers:
+        fetcher = stack.enter_context(PooledFetcher(per_host=num))
+        cases[f'io/threads-{num}'] = lambda num=num, fetcher=fetcher: io_bound.run_threads(
+            urls, num, fetcher, target=io_bound.fetch_urls_in_memory,
+        )
+        cases[f'io/asyncio-{num}'] = lambda num=num: asyncio.run(async_bound.fetch_in_memory(urls, num))
+    return cases
+
+
+def measure(func, warmup, repeat):
+    for _ in range(warmup):
+        func()
+
+    times = []
+    for _ in range(repeat):
+        t1 = perf_counter()
+        func()
+        t2 = perf_counter()
+        times.append(t2 - t1)
+
+    return {
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.mean(times),
+        'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+        'times': times,
+    }
+
+
+def environment():
+    return {
+        'python': sys.version,
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'gil_enabled': cpu_bound.gil_enabled(),
+        'interpreters': cpu_bound.InterpreterPoolExecutor is not None,
+    }
+
+
+def compare(results, baseline, threshold):
+    # a case regresses when its median is slower than baseline by more than threshold
+    regressions = []
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        ratio = stats['median'] / baseline[name]['median']
+        mark = 'REGRESSION' if ratio > 1 + threshold else ''
+        print(f'{name:<24} {baseline[name]["median"]:9.4f}s -> {stats["median"]:9.4f}s  x{ratio:.2f} {mark}')
+        if mark:
+            regressions.append(name)
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--suite', choices=['cpu', 'io', 'all'], default='all')
+    parser.add_argument('--filter', default='', help='run only cases containing this substring')
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--cpu-n', type=int, default=10_000_000, help='countdown size per run')
+    parser.add_argument('--requests', type=int, default=200, help='requests per io run')
+    parser.add_argument('--latency', type=float, default=0.01, help='stub server latency, seconds')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('-o', '--output', help='write results as json')
+    parser.add_argument('--compare', help='baseline json to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1, help='allowed slowdown, 0.1 = 10%%')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    cases = {}
+    results = {}
+    with contextlib.ExitStack() as stack:
+        if args.suite in ('cpu', 'all'):
+            cases.update(cpu_cases(args.cpu_n, args.workers, stack))
+        if args.suite in ('io', 'all'):
+            server, url = start_server_process(latency=args.latency, body=b'x' * 16 * 1024)
+            stack.callback(server.terminate)
+            cases.update(io_cases(url, args.requests, args.workers, stack))
+
+        for name, func in cases.items():
+            if args.filter not in name:
+                continue
+            results[name] = measure(func, args.warmup, args.repeat)
+            print(f'{name:<24} median = {results[name]["median"]:.4f}s, stdev = {results[name]["stdev"]:.4f}s')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment(), 'args': vars(args), 'results': results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,9 @@
 import socket
 
+from buffer_pool import BufferPool, recv_upper
+
+pool = BufferPool(count=1)
+
 server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 server_sock.bind(('localhost', 15000))
@@ -10,12 +14,13 @@ while True:
     client_sock, addr = server_sock.accept()
     print('connect from', addr)
 
-    while True:
-        data = client_sock.recv(4096)
+    with pool.buffer() as buf:
+        while True:
+            data = recv_upper(client_sock, buf)
 
-        if not data:
-            break
-        else:
-            client_sock.send(data.decode().upper().encode())
+            if not data:
+                break
+            else:
+                client_sock.sendall(data)
 
     client_sock.close()
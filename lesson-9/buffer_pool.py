@@ -0,0 +1,116 @@
+import socket
+import string
+import tracemalloc
+from time import perf_counter
+from functools import partial
+from contextlib import contextmanager
+
+
+UPPER_TABLE = bytes.maketrans(string.ascii_lowercase.encode(), string.ascii_uppercase.encode())
+
+
+class BufferPool:
+    # Preallocated receive buffers shared by all connections of a server.
+    # A buffer is taken for one recv/send round and then returned, the pool
+    # grows only when every buffer is busy (e.g. while a generator waits for
+    # the socket to become writable).
+    def __init__(self, count=16, size=64 * 1024):
+        self.size = size
+        self._free = [memoryview(bytearray(size)) for _ in range(count)]
+
+    def acquire(self):
+        if self._free:
+            return self._free.pop()
+        return memoryview(bytearray(self.size))
+
+    def release(self, buf):
+        self._free.append(buf)
+
+    @contextmanager
+    def buffer(self):
+        buf = self.acquire()
+        try:
+            yield buf
+        finally:
+            self.release(buf)
+
+
+def recv_upper(sock, buf):
+    # Returns a view of `buf` with the received data upper-cased (ASCII only,
+    # multi-byte utf-8 sequences pass through unchanged). Python has no
+    # in-place translate, so the only allocations are two short-lived
+    # copies of the data instead of bytes + str + str + bytes.
+    n = sock.recv_into(buf)
+    view = buf[:n]
+    view[:] = bytes(view).translate(UPPER_TABLE)
+    return view
+
+
+def respond_copy(sock):
+    data = sock.recv(4096)
+    if data:
+        sock.send(data.decode().upper().encode())
+    return len(data)
+
+
+def respond_pool(sock, pool):
+    buf = pool.acquire()
+    try:
+        data = recv_upper(sock, buf)
+        if data:
+            sock.sendall(data)
+        return len(data)
+    finally:
+        pool.release(buf)
+
+
+def run_request(server, client, message, reply, respond):
+    # client and server share a thread: send a piece, let the server answer,
+    # read the answer back, so socket buffers never fill up
+    sent = served = received = 0
+    while received < len(message):
+        sent += client.send(message[sent:sent + 64 * 1024])
+        while served < sent:
+            served += respond(server)
+        while received < served:
+            received += client.recv_into(reply[received:])
+
+
+def run(requests_per_size=200):
+    pool = BufferPool()
+    handlers = {
+        'recv/decode': respond_copy,
+        'recv_into pool': partial(respond_pool, pool=pool),
+    }
+
+    for size in (64, 4 * 1024, 2 ** 20):
+        message = memoryview(b'a' * size)
+        reply = memoryview(bytearray(size))
+        for name, respond in handlers.items():
+            server, client = socket.socketpair()
+            requests_num = max(10, requests_per_size * 64 // max(size // 1024, 64))
+
+            t1 = perf_counter()
+            for _ in range(requests_num):
+                run_request(server, client, message, reply, respond)
+            t2 = perf_counter()
+            assert reply == b'A' * size
+
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            run_request(server, client, message, reply, respond)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            server.close()
+            client.close()
+            print(
+                f'{size:>8} B {name:>15}: {requests_num / (t2 - t1):9.0f} req/s, '
+                f'{size * requests_num / (t2 - t1) / 2 ** 20:7.1f} MiB/s, '
+                f'peak allocated per request = {peak - current} B'
+            )
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,129 @@
+import sys
+import json
+import socket
+import argparse
+import threading
+from time import perf_counter
+
+from framing import encode_frame, read_frame
+
+
+class LatencyHistogram:
+    # power-of-two millisecond buckets: [0, 1), [1, 2), [2, 4), ...
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        bucket = int(seconds * 1000).bit_length()
+        with self._lock:
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+            self.count += 1
+
+    def percentile(self, q):
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= q * self.count:
+                return 2 ** bucket
+        return 0
+
+    def report(self, file=sys.stderr):
+        print(f'requests: {self.count}', file=file)
+        for bucket in sorted(self.buckets):
+            low = 2 ** (bucket - 1) if bucket else 0
+            bar = '#' * max(1, 50 * self.buckets[bucket] // self.count)
+            print(f'{low:>7}-{2 ** bucket:<7} ms {self.buckets[bucket]:>7} {bar}', file=file)
+        for q in (0.5, 0.9, 0.99):
+            print(f'p{int(q * 100)} < {self.percentile(q)} ms', file=file)
+
+
+def read_urls(path):
+    # lazily, the file may be larger than memory
+    with open(path) as f:
+        for line in f:
+            url = line.strip()
+            if url:
+                yield url
+
+
+class UrlSource:
+    # one generator shared by all worker threads
+    def __init__(self, urls):
+        self._urls = iter(urls)
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            return next(self._urls, None)
+
+
+def print_result(response, lock):
+    value = response['top'] if 'error' not in response else {'error': response['error']}
+    with lock:
+        print(f'{response["url"]}: {json.dumps(value, ensure_ascii=False)}', flush=True)
+
+
+def worker(address, source, window, histogram, print_lock):
+    # one persistent connection, up to `window` requests are sent ahead of
+    # their responses, each response is printed as soon as it arrives
+    sock = socket.create_connection(address)
+    reader = sock.makefile('rb')
+    in_flight = {}
+    request_id = 0
+    exhausted = False
+
+    while True:
+        while not exhausted and len(in_flight) < window:
+            url = source.next()
+            if url is None:
+                exhausted = True
+                break
+            request_id += 1
+            in_flight[request_id] = perf_counter()
+            sock.sendall(encode_frame({'id': request_id, 'url': url}))
+
+        if not in_flight:
+            break
+
+        response = read_frame(reader)
+        if response is None:
+            raise ConnectionError('server closed the connection')
+        histogram.record(perf_counter() - in_flight.pop(response['id']))
+        print_result(response, print_lock)
+
+    reader.close()
+    sock.close()
+
+
+def run(urls, threads_num, address=('localhost', 15000), window=4):
+    source = UrlSource(urls)
+    histogram = LatencyHistogram()
+    print_lock = threading.Lock()
+
+    threads = [
+        threading.Thread(target=worker, args=(address, source, window, histogram, print_lock))
+        for _ in range(threads_num)
+    ]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+
+    return histogram
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('threads', type=int, help='number of threads (connections)')
+    parser.add_argument('urls', help='file with one url per line')
+    parser.add_argument('--window', type=int, default=4, help='pipelined requests per connection')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=15000)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    run(read_urls(args.urls), args.threads, (args.host, args.port), args.window).report()
@@ -0,0 +1,104 @@
+import os
+import json
+import asyncio
+import hashlib
+import tempfile
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ContentStore:
+    # Files are named by sha256 of their content, so equal payloads are stored
+    # once. All disk I/O (and hashing) runs in a thread pool, the event loop
+    # only schedules it. manifest.jsonl keeps one line per stored file.
+    def __init__(self, root='data', workers=4, write_size=256 * 1024):
+        self.root = root
+        self.manifest_path = os.path.join(root, 'manifest.jsonl')
+        self.index = {}
+        self.duplicates = 0
+        self.write_size = write_size
+        self._executor = ThreadPoolExecutor(workers)
+        self._manifest_lock = asyncio.Lock()
+
+        os.makedirs(root, exist_ok=True)
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self.index[entry['sha256']] = entry
+
+    def _submit(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def _run(self, func, *args):
+        return await self._submit(func, *args)
+
+    async def save(self, chunks, url, content_type=None):
+        fd, tmp_path = await self._run(tempfile.mkstemp, '.part', '', self.root)
+        f = os.fdopen(fd, 'wb')
+        hasher = hashlib.sha256()
+        size = 0
+        buf = bytearray()
+        writing = None
+        try:
+            # chunks are batched into write_size blocks, the next block is
+            # read from the network while the previous one is being written
+            async for chunk in chunks:
+                size += len(chunk)
+                buf += chunk
+                if len(buf) >= self.write_size:
+                    if writing is not None:
+                        await writing
+                    writing = self._submit(_write, f, hasher, buf)
+                    buf = bytearray()
+            if writing is not None:
+                await writing
+            if buf:
+                await self._run(_write, f, hasher, buf)
+        except BaseException:
+            if writing is not None:
+                await asyncio.wait([writing])
+            await self._run(_discard, f, tmp_path)
+            raise
+        await self._run(f.close)
+
+        digest = hasher.hexdigest()
+        # check and insert without awaiting in between, so concurrent saves
+        # of the same payload cannot both win
+        if digest in self.index:
+            self.duplicates += 1
+            await self._run(os.remove, tmp_path)
+            return self.index[digest]
+
+        extension = mimetypes.guess_extension(content_type or '') or '.bin'
+        entry = {
+            'sha256': digest,
+            'path': os.path.join(self.root, digest + extension),
+            'size': size,
+            'url': url,
+            'content_type': content_type,
+        }
+        self.index[digest] = entry
+        await self._run(os.replace, tmp_path, entry['path'])
+
+        async with self._manifest_lock:
+            await self._run(_append_line, self.manifest_path, json.dumps(entry))
+        return entry
+
+    def close(self):
+        self._executor.shutdown()
+
+
+def _write(f, hasher, chunk):
+    hasher.update(chunk)
+    f.write(chunk)
+
+
+def _discard(f, path):
+    f.close()
+    os.remove(path)
+
+
+def _append_line(path, line):
+    with open(path, 'a') as f:
+        f.write(line + '\n')
@@ -1,5 +1,13 @@
-from time import time
+import sys
 import threading
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    # python 3.14+
+    from concurrent.futures import InterpreterPoolExecutor
+except ImportError:
+    InterpreterPoolExecutor = None
 
 
 def countdawn(n):
@@ -7,27 +15,53 @@ def countdawn(n):
         n -= 1
 
 
+def gil_enabled():
+    # free-threaded builds (3.13t+) may run without the GIL
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return is_gil_enabled() if is_gil_enabled else True
+
+
+def run_threads(n, threads_num):
+    threads = [
+        threading.Thread(target=countdawn, args=(n // threads_num,))
+        for _ in range(threads_num)
+    ]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+
+
+def run_pool(executor, n, workers_num):
+    list(executor.map(countdawn, [n // workers_num] * workers_num))
+
+
+def run_processes(n, workers_num, executor=None):
+    if executor is not None:
+        return run_pool(executor, n, workers_num)
+    with ProcessPoolExecutor(workers_num) as executor:
+        run_pool(executor, n, workers_num)
+
+
+def run_interpreters(n, workers_num, executor=None):
+    if executor is not None:
+        return run_pool(executor, n, workers_num)
+    with InterpreterPoolExecutor(workers_num) as executor:
+        run_pool(executor, n, workers_num)
+
+
 def run():
     N = 200_000_000
 
-    t1 = time()
+    t1 = perf_counter()
     countdawn(N)
-    t2 = time()
+    t2 = perf_counter()
     print(f'main thread time = {t2 - t1}')
 
     for threads_num in (1, 2, 4, 8, 100):
-        threads = [
-            threading.Thread(target=countdawn, args=(N // threads_num,))
-            for _ in range(threads_num)
-        ]
-        t1 = time()
-
-        for th in threads:
-            th.start()
-        for th in threads:
-            th.join()
-
-        t2 = time()
+        t1 = perf_counter()
+        run_threads(N, threads_num)
+        t2 = perf_counter()
         print(f'{threads_num} threads time = {t2 - t1}')
 
 
@@ -0,0 +1,63 @@
+import json
+import struct
+
+
+# every message is a 4-byte big-endian length followed by a json document
+HEADER = struct.Struct('>I')
+MAX_FRAME = 16 * 2 ** 20
+
+
+class FrameError(Exception):
+    pass
+
+
+def decode_payload(payload):
+    # a frame holds one json object, anything else is a broken peer
+    try:
+        obj = json.loads(payload)
+    except ValueError as exc:  # JSONDecodeError and UnicodeDecodeError
+        raise FrameError(f'frame is not json: {exc}') from None
+    if not isinstance(obj, dict):
+        raise FrameError(f'frame is not a json object: {type(obj).__name__}')
+    return obj
+
+
+def encode_frame(obj):
+    payload = json.dumps(obj, ensure_ascii=False).encode()
+    return HEADER.pack(len(payload)) + payload
+
+
+class FrameDecoder:
+    # for non-blocking sockets: feed whatever recv returned, get whole frames
+    def __init__(self):
+        self._buf = bytearray()
+
+    def feed(self, data):
+        self._buf += data
+        frames = []
+        while len(self._buf) >= HEADER.size:
+            (size,) = HEADER.unpack_from(self._buf)
+            if size > MAX_FRAME:
+                raise FrameError(f'frame too large: {size}')
+            if len(self._buf) < HEADER.size + size:
+                break
+            payload = bytes(self._buf[HEADER.size:HEADER.size + size])
+            del self._buf[:HEADER.size + size]
+            frames.append(decode_payload(payload))
+        return frames
+
+
+def read_frame(f):
+    # for blocking sockets wrapped with sock.makefile('rb'), None on EOF
+    header = f.read(HEADER.size)
+    if not header:
+        return None
+    if len(header) < HEADER.size:
+        raise FrameError('connection closed inside a frame header')
+    (size,) = HEADER.unpack(header)
+    if size > MAX_FRAME:
+        raise FrameError(f'frame too large: {size}')
+    payload = f.read(size)
+    if len(payload) < size:
+        raise FrameError('connection closed inside a frame')
+    return decode_payload(payload)
@@ -2,11 +2,15 @@
 import socket
 from select import select
 
+from buffer_pool import BufferPool, recv_upper
+
 
 tasks = []
 # sock: gen
 to_read = {}
 to_write = {}
+# buffers are held across the write wait, the pool grows if needed
+pool = BufferPool()
 
 
 def server():
@@ -26,13 +30,14 @@ def server():
 def client(client_sock):
     while True:
         yield 'read', client_sock
-        data = client_sock.recv(4096)  # read
-
-        if not data:
-            break
-        else:
-            yield 'write', client_sock
-            client_sock.send(data.decode().upper().encode())  # write
+        with pool.buffer() as buf:
+            data = recv_upper(client_sock, buf)  # read
+
+            if not data:
+                break
+            else:
+                yield 'write', client_sock
+                client_sock.sendall(data)  # write
 
     client_sock.close()
 
@@ -1,16 +1,30 @@
-from time import time
+from time import time, perf_counter
 import threading
 
-import requests
+from pooled_fetcher import PooledFetcher
 
 
-def fetch_urls(urls, lock):
-    with lock:
-        for url in urls:
-            resp = requests.get(url)
-            with open(f'data/image_{time()}.jpeg', 'wb') as f:
-                for chunk in resp:
-                    f.write(chunk)
+def fetch_urls(urls, fetcher):
+    for url in urls:
+        fetcher.fetch_to_file(url, f'data/image_{time()}.jpeg')
+
+
+def fetch_urls_in_memory(urls, fetcher):
+    for url in urls:
+        fetcher.fetch(url)
+
+
+def run_threads(urls, threads_num, fetcher, target=fetch_urls):
+    # every thread gets its own slice of urls
+    threads = [
+        threading.Thread(target=target, args=(urls[i::threads_num], fetcher))
+        for i in range(threads_num)
+    ]
+
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
 
 
 def run():
@@ -23,25 +37,17 @@ def run():
     # t2 = time()
     # print(f'main thread time = {t2 - t1}')
 
-    lock = threading.Semaphore(2)
+    # at most 2 requests to the host at once, taken per request
+    fetcher = PooledFetcher(per_host=2)
 
     for threads_num in (2, 8):
-        urls = [URL] * (N // threads_num)
-
-        t1 = time()
-        threads = [
-            threading.Thread(target=fetch_urls, args=(urls, lock))
-            for _ in range(threads_num)
-        ]
-
-        for th in threads:
-            th.start()
-        for th in threads:
-            th.join()
-
-        t2 = time()
+        t1 = perf_counter()
+        run_threads(urls, threads_num, fetcher)
+        t2 = perf_counter()
         print(f'{threads_num} threads time = {t2 - t1}')
 
+    fetcher.close()
+
 
 if __name__ == '__main__':
     run()
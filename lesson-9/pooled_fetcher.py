@@ -0,0 +1,148 @@
+import threading
+from time import perf_counter
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from stub_server import start_server
+
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class PooledFetcher:
+    # One keep-alive Session per host, at most `per_host` requests to a host
+    # in flight at once (the limit is taken per request, not per batch).
+    def __init__(self, per_host=4, retries=3, backoff=0.1, timeout=10):
+        self.per_host = per_host
+        self.timeout = timeout
+        self.retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            raise_on_status=False,
+        )
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._limits = {}
+
+    def _host(self, url):
+        parts = urlsplit(url)
+        return f'{parts.scheme}://{parts.netloc}'
+
+    def _get_session(self, host):
+        with self._lock:
+            if host not in self._sessions:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.per_host, max_retries=self.retry)
+                session.mount(host, adapter)
+                self._sessions[host] = session
+                self._limits[host] = threading.BoundedSemaphore(self.per_host)
+            return self._sessions[host], self._limits[host]
+
+    def get(self, url, **kwargs):
+        # with stream=True the slot is held until the response is closed,
+        # use it as a context manager
+        session, limit = self._get_session(self._host(url))
+        kwargs.setdefault('timeout', self.timeout)
+        limit.acquire()
+        try:
+            resp = session.get(url, **kwargs)
+            if not kwargs.get('stream'):
+                resp.content  # read the body while holding the slot
+        except BaseException:
+            limit.release()
+            raise
+        if not kwargs.get('stream'):
+            limit.release()
+            return resp
+
+        close = resp.close
+        released = threading.Lock()
+
+        def close_and_release():
+            try:
+                close()
+            finally:
+                if released.acquire(blocking=False):
+                    limit.release()
+
+        resp.close = close_and_release
+        return resp
+
+    def fetch(self, url):
+        resp = self.get(url)
+        resp.raise_for_status()
+        return resp.content
+
+    def fetch_to_file(self, url, path, chunk_size=64 * 1024):
+        session, limit = self._get_session(self._host(url))
+        with limit, session.get(url, timeout=self.timeout, stream=True) as resp:
+            resp.raise_for_status()
+            with open(path, 'wb') as f:
+                for chunk in resp.iter_content(chunk_size):
+                    f.write(chunk)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._limits.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def fetch_naive(urls, lock):
+    # the old io_bound approach: new connection per url, lock held per batch
+    with lock:
+        for url in urls:
+            requests.get(url).content
+
+
+def run_naive(urls, threads_num):
+    lock = threading.Semaphore(2)
+    batch = len(urls) // threads_num
+    threads = [
+        threading.Thread(target=fetch_naive, args=(urls[i * batch:(i + 1) * batch], lock))
+        for i in range(threads_num)
+    ]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+
+
+def run_pooled(urls, threads_num):
+    with PooledFetcher(per_host=threads_num) as fetcher, ThreadPoolExecutor(threads_num) as pool:
+        list(pool.map(fetcher.fetch, urls))
+
+
+def run(N=64, latency=0.02, connect_latency=0.02):
+    server = start_server(latency=latency, connect_latency=connect_latency, body=b'x' * 16 * 1024)
+    urls = [server.url] * N
+
+    for threads_num in (2, 8):
+        for name, func in (('naive', run_naive), ('pooled', run_pooled)):
+            connections = server.connections
+            t1 = perf_counter()
+            func(urls, threads_num)
+            t2 = perf_counter()
+            print(
+                f'{name:>6} {threads_num} threads: {N / (t2 - t1):.1f} req/s, '
+                f'{server.connections - connections} connections'
+            )
+
+    server.stop()
+
+
+if __name__ == '__main__':
+    run()
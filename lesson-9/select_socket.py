@@ -1,7 +1,10 @@
 import socket
 from select import select
 
+from buffer_pool import BufferPool, recv_upper
+
 to_monitor = []
+pool = BufferPool()
 
 server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
@@ -16,13 +19,14 @@ def accept_conn(server_sock):
 
 
 def respond(client_sock):
-    data = client_sock.recv(4096)
-
-    if data:
-        client_sock.send(data.decode().upper().encode())
-    else:
-        client_sock.close()
-        to_monitor.remove(client_sock)
+    with pool.buffer() as buf:
+        data = recv_upper(client_sock, buf)
+
+        if data:
+            client_sock.sendall(data)
+        else:
+            client_sock.close()
+            to_monitor.remove(client_sock)
 
 
 def event_loop():
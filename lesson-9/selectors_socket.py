@@ -1,6 +1,9 @@
 import socket
 import selectors
 
+from buffer_pool import BufferPool, recv_upper
+
+pool = BufferPool()
 selector = selectors.DefaultSelector()
 print('selector', selector)
 
@@ -21,13 +24,14 @@ def accept_conn(server_sock):
 
 
 def respond(client_sock):
-    data = client_sock.recv(4096)
-
-    if data:
-        client_sock.send(data.decode().upper().encode())
-    else:
-        selector.unregister(client_sock)
-        client_sock.close()
+    with pool.buffer() as buf:
+        data = recv_upper(client_sock, buf)
+
+        if data:
+            client_sock.sendall(data)
+        else:
+            selector.unregister(client_sock)
+            client_sock.close()
 
 
 def event_loop():
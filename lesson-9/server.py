@@ -0,0 +1,195 @@
+import queue
+import socket
+import argparse
+import selectors
+import threading
+
+from framing import FrameDecoder, FrameError, encode_frame
+from pooled_fetcher import PooledFetcher
+from word_counter import fetch_top_words
+
+
+class Connection:
+    def __init__(self, sock):
+        self.sock = sock
+        self.decoder = FrameDecoder()
+        # encoded responses not yet written; workers append, only the
+        # selector thread writes to the socket
+        self.outbox = bytearray()
+        self.lock = threading.Lock()
+        self.closed = False
+
+
+class Server:
+    # master thread reads framed requests {"id", "url"} from every client with
+    # selectors and puts them into a queue, worker threads fetch the url and
+    # answer {"id", "url", "top"} (or "error") on the same connection.
+    # Sockets are non-blocking and only the master writes to them, from each
+    # connection's outbox: a client that does not read is disconnected once
+    # max_outbox bytes wait for it, and requests that find the queue full are
+    # answered with an error instead of waiting for room.
+    def __init__(self, host, port, workers_num, k, max_outbox=1024 * 1024):
+        self.k = k
+        self.max_outbox = max_outbox
+        self.tasks = queue.Queue(maxsize=workers_num * 16)
+        self.fetcher = PooledFetcher(per_host=workers_num)
+        self.selector = selectors.DefaultSelector()
+        self.processed = 0
+        self._stats_lock = threading.Lock()
+        self._stopped = False
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.listen()
+        self.address = self.sock.getsockname()
+
+        # workers wake the selector up through this pair when they queue a
+        # response, `_ready` says for which connections
+        self._wakeup, self._waker = socket.socketpair()
+        self._wakeup.setblocking(False)
+        self._waker.setblocking(False)
+        self._ready = set()
+        self._ready_lock = threading.Lock()
+
+        self.workers = [
+            threading.Thread(target=self.worker, daemon=True)
+            for _ in range(workers_num)
+        ]
+
+    def accept_conn(self, server_sock):
+        client_sock, addr = server_sock.accept()
+        print('connect from', addr)
+        client_sock.setblocking(False)
+        self.selector.register(client_sock, selectors.EVENT_READ, Connection(client_sock))
+
+    def close_conn(self, conn):
+        with conn.lock:
+            if conn.closed:
+                return
+            conn.closed = True
+            conn.outbox.clear()
+        self.selector.unregister(conn.sock)
+        conn.sock.close()
+
+    def read_requests(self, conn):
+        try:
+            data = conn.sock.recv(64 * 1024)
+            frames = conn.decoder.feed(data) if data else None
+        except BlockingIOError:
+            return
+        except (OSError, FrameError):
+            frames = None
+
+        if frames is None:
+            self.close_conn(conn)
+            return
+
+        for request in frames:
+            try:
+                self.tasks.put_nowait((conn, request))
+            except queue.Full:
+                self.reply(conn, {'id': request.get('id'), 'url': request.get('url'), 'error': 'server busy'})
+
+    def reply(self, conn, response):
+        # from any thread; the master sends it
+        data = encode_frame(response)
+        with conn.lock:
+            if conn.closed:
+                return
+            conn.outbox += data
+        with self._ready_lock:
+            self._ready.add(conn)
+        try:
+            self._waker.send(b'\0')
+        except BlockingIOError:
+            pass  # a wakeup is pending already
+
+    def flush(self, conn):
+        with conn.lock:
+            if conn.closed:
+                return
+            try:
+                sent = conn.sock.send(conn.outbox) if conn.outbox else 0
+            except BlockingIOError:
+                sent = 0
+            except OSError:
+                sent = None
+            if sent is not None:
+                del conn.outbox[:sent]
+                pending = len(conn.outbox)
+        if sent is None or pending > self.max_outbox:
+            self.close_conn(conn)
+        else:
+            events = selectors.EVENT_READ | (selectors.EVENT_WRITE if pending else 0)
+            self.selector.modify(conn.sock, events, conn)
+
+    def flush_ready(self):
+        try:
+            while self._wakeup.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self._ready_lock:
+            ready, self._ready = self._ready, set()
+        for conn in ready:
+            self.flush(conn)
+
+    def worker(self):
+        while True:
+            conn, request = self.tasks.get()
+            response = {}
+            try:
+                response.update(id=request.get('id'), url=request.get('url'))
+                if not isinstance(request.get('url'), str):
+                    raise ValueError('url must be a string')
+                response['top'] = dict(fetch_top_words(request['url'], self.k, self.fetcher))
+            except Exception as exc:
+                response['error'] = f'{type(exc).__name__}: {exc}'
+            self.reply(conn, response)
+
+            with self._stats_lock:
+                self.processed += 1
+                print(f'processed urls: {self.processed}')
+
+    def serve_forever(self):
+        for worker in self.workers:
+            worker.start()
+
+        self.selector.register(self.sock, selectors.EVENT_READ, None)
+        self.selector.register(self._wakeup, selectors.EVENT_READ, self._wakeup)
+        while not self._stopped:
+            for key, events in self.selector.select():
+                if key.data is None:
+                    self.accept_conn(key.fileobj)
+                elif key.data is self._wakeup:
+                    self.flush_ready()
+                else:
+                    if events & selectors.EVENT_WRITE:
+                        self.flush(key.data)
+                    if events & selectors.EVENT_READ and not key.data.closed:
+                        self.read_requests(key.data)
+        for key in list(self.selector.get_map().values()):
+            if isinstance(key.data, Connection):
+                self.close_conn(key.data)
+        self.selector.close()
+        self.sock.close()
+
+    def shutdown(self):
+        # from another thread, serve_forever returns soon after
+        self._stopped = True
+        self._waker.send(b'\0')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-w', '--workers', type=int, default=10)
+    parser.add_argument('-k', type=int, default=7, help='number of top words')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=15000)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    Server(args.host, args.port, args.workers, args.k).serve_forever()
@@ -0,0 +1,116 @@
+import sys
+import random
+import asyncio
+import threading
+import multiprocessing
+from time import sleep
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from aiohttp import web
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # keep-alive, so clients may reuse connections
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately, avoid delayed ACK stalls
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        # emulates TCP + TLS handshake cost paid once per connection
+        sleep(self.server.connect_latency)
+        with self.server.lock:
+            self.server.connections += 1
+        super().setup()
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+        sleep(self.server.latency)
+
+        if random.random() < self.server.failure_rate:
+            status, body = 503, b'unavailable'
+        else:
+            status, body = 200, self.server.body
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, latency=0.0, connect_latency=0.0, failure_rate=0.0, body=b''):
+        super().__init__(address, StubHandler)
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.failure_rate = failure_rate
+        self.body = body
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def start_server(port=0, **kwargs):
+    server = StubServer(('127.0.0.1', port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _serve(conn, kwargs):
+    server = StubServer(('127.0.0.1', 0), **kwargs)
+    conn.send(server.url)
+    server.serve_forever()
+
+
+def start_server_process(**kwargs):
+    # in its own process the server does not compete with the client for the GIL
+    parent_conn, child_conn = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve, args=(child_conn, kwargs), daemon=True)
+    process.start()
+    return process, parent_conn.recv()
+
+
+def make_aio_stub_app(latency=0.0, failure_rate=0.0, capacity=None, body=b'ok'):
+    # aiohttp flavour for async clients: answers 503 at random and whenever
+    # more than `capacity` requests are in flight
+    app = web.Application()
+    state = {'in_flight': 0, 'requests': 0}
+
+    async def handle(request):
+        state['requests'] += 1
+        state['in_flight'] += 1
+        try:
+            overloaded = capacity is not None and state['in_flight'] > capacity
+            await asyncio.sleep(latency)
+            if overloaded or random.random() < failure_rate:
+                return web.Response(status=503, body=b'unavailable')
+            return web.Response(body=body, content_type='text/html')
+        finally:
+            state['in_flight'] -= 1
+
+    app.router.add_get('/{tail:.*}', handle)
+    return app
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    server = StubServer(('127.0.0.1', port), latency=latency, body=b'<html><body>hello world</body></html>')
+    print('serving on', server.url)
+    server.serve_forever()
@@ -0,0 +1,365 @@
+# pylint: disable=C0114,C0115,C0116
+
+import io
+import os
+import socket
+import asyncio
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import aiohttp
+import requests
+from aiohttp import web
+
+import client
+from buffer_pool import BufferPool, recv_upper
+from adaptive_limiter import AdaptiveLimiter, AIMDLimiter, fetch
+from content_store import ContentStore
+from framing import HEADER, FrameDecoder, FrameError, encode_frame, read_frame
+from pooled_fetcher import PooledFetcher
+from server import Server
+from stub_server import make_aio_stub_app, start_server
+from word_counter import TAG_MAX_LEN, BoundedCounter, StreamingWordCounter, batch_count_words, count_words
+
+
+class TestWordCounter(unittest.TestCase):
+    PAGE = (
+        '<html><head><style>p {color: red}</style><SCRIPT>var x = 1;</script></head>'
+        '<body><p>Hello world hello</p> <b>Wor</b>ld café café &amp; &nbsp;hello&#39;s</body></html>'
+    ).encode() * 20
+
+    def test_chunk_boundaries(self):
+        expected = batch_count_words(self.PAGE, 10)
+        for size in (1, 2, 3, 7, 64, len(self.PAGE)):
+            chunks = [self.PAGE[i:i + size] for i in range(0, len(self.PAGE), size)]
+            self.assertListEqual(expected, count_words(chunks, 10), size)
+
+    def test_skip_tags_and_entities(self):
+        words = dict(count_words([self.PAGE], 20))
+        self.assertEqual(words['hello'], 60)
+        self.assertEqual(words['café'], 40)
+        for word in ('color', 'var', 'amp', 'nbsp', '39'):
+            self.assertNotIn(word, words)
+
+    def test_long_or_unterminated_tag(self):
+        chunks = [b'<p>hello ', b'<img src="data:', *[b'x' * 16384] * 64, b'"> world',
+                  b'<script ', b'a' * 10_000, b'>var x</script> again <', *[b'y' * 16384] * 64]
+        counter = StreamingWordCounter()
+        for chunk in chunks:
+            counter.feed_bytes(chunk)
+            self.assertLessEqual(len(counter._pending), TAG_MAX_LEN)
+        counter.close()
+        self.assertEqual({'hello': 1, 'world': 1, 'again': 1}, dict(counter.most_common(10)))
+
+    def test_bounded_counter(self):
+        counter = BoundedCounter(capacity=100)
+        for i in range(10_000):
+            counter.update(['the', 'the', 'a', f'w{i}'])
+            self.assertLessEqual(len(counter), 100)
+
+        self.assertListEqual([('the', 20_000), ('a', 10_000)], counter.most_common(2))
+        self.assertLessEqual(counter.error, 1)
+
+
+class TestBufferPool(unittest.TestCase):
+    def test_recv_upper(self):
+        pool = BufferPool(count=1, size=8)
+        server, client = socket.socketpair()
+        client.sendall('abc_xyz мир'.encode())
+
+        received = b''
+        with pool.buffer() as buf:
+            while len(received) < len('ABC_XYZ мир'.encode()):
+                data = recv_upper(server, buf)
+                self.assertIs(data.obj, buf.obj)
+                received += data
+        server.close()
+        client.close()
+
+        self.assertEqual('ABC_XYZ мир'.encode(), received)
+
+    def test_pool_grows(self):
+        pool = BufferPool(count=1, size=8)
+        first, second = pool.acquire(), pool.acquire()
+        self.assertIsNot(first.obj, second.obj)
+        pool.release(first)
+        self.assertIs(first, pool.acquire())
+
+
+class TestFraming(unittest.TestCase):
+    def test_split_frames(self):
+        messages = [{'id': i, 'url': f'http://host/{i}', 'text': 'слово' * i} for i in range(20)]
+        stream = b''.join(encode_frame(msg) for msg in messages)
+
+        for size in (1, 5, 100, len(stream)):
+            decoder = FrameDecoder()
+            decoded = []
+            for i in range(0, len(stream), size):
+                decoded.extend(decoder.feed(stream[i:i + size]))
+            self.assertListEqual(messages, decoded)
+
+    def test_too_large(self):
+        with self.assertRaises(FrameError):
+            FrameDecoder().feed(b'\xff\xff\xff\xff')
+
+    def test_not_a_json_object(self):
+        for payload in (b'abc', b'\xff', b'[1, 2]', b'"url"'):
+            decoder = FrameDecoder()
+            with self.assertRaises(FrameError):
+                decoder.feed(HEADER.pack(len(payload)) + payload)
+            # the bad frame is consumed, the stream stays in step
+            self.assertEqual([{'id': 1}], decoder.feed(encode_frame({'id': 1})))
+
+
+class TestPooledFetcher(unittest.TestCase):
+    def test_connections_reused(self):
+        server = start_server(latency=0.01, body=b'hello')
+        with PooledFetcher(per_host=3) as fetcher, ThreadPoolExecutor(8) as pool:
+            bodies = list(pool.map(fetcher.fetch, [server.url] * 30))
+        server.stop()
+
+        self.assertListEqual([b'hello'] * 30, bodies)
+        self.assertLessEqual(server.connections, 3)
+
+    def test_stream_holds_the_slot_until_closed(self):
+        server = start_server(body=b'hello')
+        with PooledFetcher(per_host=1) as fetcher:
+            first = fetcher.get(server.url, stream=True)
+            with ThreadPoolExecutor(1) as pool:
+                second = pool.submit(fetcher.fetch, server.url)
+                with self.assertRaises(FutureTimeout):
+                    second.result(timeout=0.2)
+                with first:
+                    self.assertEqual(b'hello', first.content)
+                self.assertEqual(b'hello', second.result(timeout=5))
+            # closing twice gives the slot back once
+            first.close()
+            with fetcher.get(server.url, stream=True):
+                pass
+        server.stop()
+
+    def test_retry_with_backoff(self):
+        server = start_server(failure_rate=1.0)
+        with PooledFetcher(retries=2, backoff=0.01) as fetcher:
+            with self.assertRaises(requests.HTTPError):
+                fetcher.fetch(server.url)
+        server.stop()
+
+        self.assertEqual(server.requests, 3)
+
+
+class TestContentStore(unittest.IsolatedAsyncioTestCase):
+    async def _chunks(self, data, size=1000):
+        for i in range(0, len(data), size):
+            await asyncio.sleep(0)
+            yield data[i:i + size]
+
+    async def test_deduplication(self):
+        payloads = [b'a' * 5000, b'b' * 700_000, b'a' * 5000]
+        with tempfile.TemporaryDirectory() as root:
+            store = ContentStore(root, write_size=4096)
+            entries = await asyncio.gather(*[
+                store.save(self._chunks(data), f'http://host/{i}', 'image/jpeg')
+                for i, data in enumerate(payloads)
+            ])
+            store.close()
+
+            self.assertEqual(2, len(store.index))
+            self.assertEqual(1, store.duplicates)
+            self.assertEqual(entries[0]['path'], entries[2]['path'])
+            with open(entries[1]['path'], 'rb') as f:
+                self.assertEqual(payloads[1], f.read())
+            self.assertListEqual(
+                sorted(['manifest.jsonl'] + [os.path.basename(e['path']) for e in entries[:2]]),
+                sorted(os.listdir(root)),
+            )
+
+            reopened = ContentStore(root)
+            reopened.close()
+            self.assertDictEqual(store.index, reopened.index)
+
+
+class TestAdaptiveLimiter(unittest.IsolatedAsyncioTestCase):
+    async def _serve(self, **kwargs):
+        runner = web.AppRunner(make_aio_stub_app(**kwargs))
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        self.addAsyncCleanup(runner.cleanup)
+        return f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/'
+
+    async def test_aimd(self):
+        limiter = AIMDLimiter(initial=4, latency_target=0.5)
+        for _ in range(4):
+            await limiter.acquire()
+            await limiter.release(0.0, 0.1, True)
+        self.assertAlmostEqual(5.0, limiter.limit, delta=0.1)
+
+        await limiter.acquire()
+        await limiter.release(1.0, 0.1, False)
+        self.assertAlmostEqual(2.5, limiter.limit, delta=0.1)
+
+        # started before the last decrease, the limit is not halved again
+        await limiter.acquire()
+        await limiter.release(0.5, 2.0, True)
+        self.assertAlmostEqual(2.5, limiter.limit, delta=0.1)
+        self.assertEqual(0, limiter.in_flight)
+
+    async def test_grows_when_healthy(self):
+        url = await self._serve(latency=0.01)
+        limiter = AdaptiveLimiter(initial=2)
+        async with aiohttp.ClientSession() as session:
+            await asyncio.gather(*[fetch(url, session, limiter) for _ in range(200)])
+
+        self.assertGreater(limiter.global_limiter.limit, 10)
+        self.assertEqual(0, limiter.stats.errors)
+
+    async def test_backs_off_on_overload(self):
+        url = await self._serve(latency=0.01, capacity=8)
+        limiter = AdaptiveLimiter(initial=32, max_limit=64, per_host_initial=32, per_host_max=64)
+        async with aiohttp.ClientSession() as session:
+            results = await asyncio.gather(
+                *[fetch(url, session, limiter) for _ in range(500)], return_exceptions=True,
+            )
+
+        errors = [res for res in results if isinstance(res, aiohttp.ClientResponseError)]
+        self.assertEqual(len(errors), limiter.stats.errors)
+        self.assertGreater(len(errors), 0)
+        self.assertLess(limiter.hosts[url[7:-1]].limit, 16)
+
+    async def test_client_errors_do_not_back_off(self):
+        app = web.Application()
+        app.router.add_get('/{tail:.*}', lambda request: web.Response(status=404))
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        self.addAsyncCleanup(runner.cleanup)
+        url = f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/missing'
+
+        limiter = AdaptiveLimiter(initial=4)
+        async with aiohttp.ClientSession() as session:
+            results = await asyncio.gather(*[fetch(url, session, limiter) for _ in range(50)], return_exceptions=True)
+
+        self.assertTrue(all(isinstance(res, aiohttp.ClientResponseError) for res in results))
+        self.assertEqual(0, limiter.stats.errors)
+        self.assertGreater(limiter.global_limiter.limit, 4)
+
+    async def test_cancelled_wait_frees_the_host_slot(self):
+        limiter = AdaptiveLimiter(initial=1, per_host_initial=4)
+        async with limiter.slot('http://a/'):
+            waiting = asyncio.create_task(limiter.slot('http://b/').__aenter__())
+            await asyncio.sleep(0.01)
+            self.assertEqual(1, limiter.hosts['b'].in_flight)
+            waiting.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiting
+        self.assertEqual(0, limiter.hosts['b'].in_flight)
+        self.assertEqual(4, int(limiter.hosts['b'].limit))
+        self.assertEqual(0, limiter.global_limiter.in_flight)
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.http = start_server(latency=0.01, body=b'<p>hello world, hello</p>')
+        self.addCleanup(self.http.stop)
+        # the server and client print progress and results
+        self.output = io.StringIO()
+        stdout = redirect_stdout(self.output)
+        stdout.__enter__()
+        self.addCleanup(stdout.__exit__, None, None, None)
+
+    def start(self, **kwargs):
+        server = Server('127.0.0.1', 0, kwargs.pop('workers_num', 4), 2, **kwargs)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def connect(self, server):
+        sock = socket.create_connection(server.address, timeout=10)
+        self.addCleanup(sock.close)
+        return sock
+
+    def test_client_and_server(self):
+        server = self.start()
+        urls = [f'{self.http.url}page/{i}' for i in range(30)]
+        histogram = client.run(urls, 3, server.address, window=4)
+
+        self.assertEqual(30, histogram.count)
+        lines = [line for line in self.output.getvalue().splitlines() if line.startswith('http')]
+        self.assertEqual(sorted(f'{url}: {{"hello": 2, "world": 1}}' for url in urls), sorted(lines))
+
+    def test_errors_are_answered(self):
+        server = self.start()
+        sock = self.connect(server)
+        sock.sendall(encode_frame({'id': 1, 'url': 'http://127.0.0.1:1/'}))
+        response = read_frame(sock.makefile('rb'))
+        self.assertEqual(1, response['id'])
+        self.assertIn('ConnectionError', response['error'])
+
+    def test_full_queue_is_refused(self):
+        server = self.start(workers_num=1)
+        sock = self.connect(server)
+        sock.sendall(b''.join(encode_frame({'id': i, 'url': self.http.url}) for i in range(60)))
+        reader = sock.makefile('rb')
+        responses = [read_frame(reader) for _ in range(60)]
+
+        self.assertEqual(set(range(60)), {response['id'] for response in responses})
+        busy = [response for response in responses if response.get('error') == 'server busy']
+        self.assertTrue(busy)
+        self.assertTrue(all(response['top'] == {'hello': 2, 'world': 1} for response in responses if response not in busy))
+
+    def test_client_that_does_not_read_is_dropped(self):
+        server = self.start(max_outbox=4096)
+        greedy = socket.socket()
+        greedy.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        greedy.connect(server.address)
+        self.addCleanup(greedy.close)
+        # never reads its answers, ~8 KiB each, more than the socket buffers hold
+        request = encode_frame({'id': 1, 'url': self.http.url + '?' + 'x' * 8000})
+        try:
+            for _ in range(2000):
+                greedy.sendall(request)
+        except OSError:
+            pass
+
+        # others are still served meanwhile
+        sock = self.connect(server)
+        sock.sendall(encode_frame({'id': 7, 'url': self.http.url}))
+        self.assertEqual(7, read_frame(sock.makefile('rb'))['id'])
+
+        # and it is disconnected: EOF or a reset, not a timeout
+        greedy.settimeout(10)
+        try:
+            while greedy.recv(64 * 1024):
+                pass
+        except ConnectionResetError:
+            pass
+
+    def test_malformed_frames(self):
+        server = self.start(workers_num=1)
+        for payload in (b'abc', b'[1, 2]'):
+            sock = self.connect(server)
+            sock.sendall(HEADER.pack(len(payload)) + payload)
+            # that client is disconnected
+            self.assertEqual(b'', sock.recv(1024))
+
+        # requests without a usable url are answered, the worker lives on
+        sock = self.connect(server)
+        reader = sock.makefile('rb')
+        for request in ({'id': 1}, {'id': 2, 'url': [1, 2]}):
+            sock.sendall(encode_frame(request))
+            response = read_frame(reader)
+            self.assertEqual(request['id'], response['id'])
+            self.assertIn('url', response['error'])
+        sock.sendall(encode_frame({'id': 3, 'url': self.http.url}))
+        self.assertEqual({'hello': 2, 'world': 1}, read_frame(reader)['top'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,202 @@
+import re
+import sys
+import codecs
+import tracemalloc
+from time import perf_counter
+from collections import Counter
+
+import requests
+
+
+WORD_RE = re.compile(r'\w+')
+TAG_RE = re.compile(r'<[^>]*>')
+TAG_NAME_RE = re.compile(r'([a-zA-Z][a-zA-Z0-9]*)')
+ENTITY_RE = re.compile(r'&#?\w+;')
+ENTITY_MAX_LEN = 10
+# a tag is buffered up to this many chars until its '>' arrives, a longer one
+# (a data: URI, or a '<' that never closes) is skipped without buffering
+TAG_MAX_LEN = 4096
+TAG_END_RE = re.compile('>')
+SKIP_TAGS = {'script', 'style'}
+
+
+class BoundedCounter:
+    # Counter that never holds more than `capacity` words. When it overflows
+    # only the `capacity // 2` most frequent words are kept (lossy counting),
+    # `error` is an upper bound on how much any kept count is underestimated.
+    def __init__(self, capacity=100_000):
+        self.capacity = capacity
+        self.counts = Counter()
+        self.error = 0
+
+    def update(self, words):
+        self.counts.update(words)
+        if len(self.counts) > self.capacity:
+            self._prune()
+
+    def _prune(self):
+        keep = Counter(dict(self.counts.most_common(self.capacity // 2)))
+        dropped = max((cnt for word, cnt in self.counts.items() if word not in keep), default=0)
+        self.error = max(self.error, dropped)
+        self.counts = keep
+
+    def most_common(self, k):
+        return self.counts.most_common(k)
+
+    def __len__(self):
+        return len(self.counts)
+
+
+class StreamingWordCounter:
+    # Feed raw bytes chunks, tags are stripped incrementally and words (or
+    # tags, entities) split across chunk boundaries are glued back together.
+    def __init__(self, capacity=100_000, encoding='utf-8'):
+        self.counter = BoundedCounter(capacity)
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self._pending = ''
+        self._tail = ''
+        self._skip_until = None
+        # what to skip after the '>' of a long tag: a script or style body
+        self._after_tag = None
+        self._words = []
+
+    def feed_bytes(self, chunk):
+        self.feed(self._decoder.decode(chunk))
+
+    def feed(self, text):
+        self._feed(text)
+        self.counter.update(self._words)
+        self._words.clear()
+
+    def _feed(self, text):
+        buf = self._pending + text
+        self._pending = ''
+        pos = 0
+
+        while pos < len(buf):
+            if self._skip_until is not None:
+                match = self._skip_until.search(buf, pos)
+                if match is None:
+                    # keep enough to find closing tag split between chunks
+                    self._pending = buf[-16:]
+                    return
+                if self._skip_until is TAG_END_RE:
+                    self._skip_until, self._after_tag = self._after_tag, None
+                    pos = match.end()
+                    continue
+                self._skip_until = None
+                pos = match.start()
+
+            lt = buf.find('<', pos)
+            if lt < 0:
+                self._text(buf[pos:], final=False)
+                return
+
+            self._text(buf[pos:lt], final=True)
+            gt = buf.find('>', lt)
+            if gt < 0 and len(buf) - lt <= TAG_MAX_LEN:
+                self._pending = buf[lt:]
+                return
+
+            name = TAG_NAME_RE.match(buf, lt + 1)
+            skip = None
+            if name and name.group(1).lower() in SKIP_TAGS:
+                skip = re.compile(f'</{name.group(1)}', re.I)
+            if gt < 0:
+                # too long to keep until its end comes: rescanning it with
+                # every chunk would be quadratic and memory unbounded
+                self._skip_until, self._after_tag = TAG_END_RE, skip
+                return
+            self._skip_until = skip
+            pos = gt + 1
+
+    def close(self):
+        self._feed(self._decoder.decode(b'', final=True))
+        if self._skip_until is None and not self._pending.startswith('<'):
+            self._text(self._pending, final=True)
+        self._pending = ''
+        self._flush()
+        self.counter.update(self._words)
+        self._words.clear()
+
+    def _text(self, data, final):
+        if not final:
+            amp = data.rfind('&', -ENTITY_MAX_LEN)
+            if amp >= 0 and ';' not in data[amp:]:
+                data, self._pending = data[:amp], data[amp:]
+
+        text = self._tail + ENTITY_RE.sub(' ', data)
+        words = WORD_RE.findall(text.lower())
+        # the last word may continue in the next chunk
+        if not final and words and WORD_RE.match(text[-1:]):
+            self._tail = words.pop()
+        else:
+            self._tail = ''
+        self._words.extend(words)
+
+    def _flush(self):
+        if self._tail:
+            self._words.append(self._tail)
+            self._tail = ''
+
+    def most_common(self, k):
+        return self.counter.most_common(k)
+
+
+def count_words(chunks, k, capacity=100_000):
+    counter = StreamingWordCounter(capacity)
+    for chunk in chunks:
+        counter.feed_bytes(chunk)
+    counter.close()
+    return counter.most_common(k)
+
+
+def batch_count_words(data, k):
+    text = data.decode('utf-8', errors='replace')
+    text = re.sub(r'<(script|style)\b.*?</\1>', ' ', text, flags=re.S | re.I)
+    words = WORD_RE.findall(ENTITY_RE.sub(' ', TAG_RE.sub(' ', text)).lower())
+    return Counter(words).most_common(k)
+
+
+def fetch_top_words(url, k, session=None, chunk_size=16 * 1024):
+    getter = session or requests
+    with getter.get(url, stream=True, timeout=10) as resp:
+        resp.raise_for_status()
+        return count_words(resp.iter_content(chunk_size), k)
+
+
+def read_chunks(path, chunk_size=16 * 1024):
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+
+def _measure(func):
+    t1 = perf_counter()
+    result = func()
+    t2 = perf_counter()
+
+    # tracemalloc slows everything down, so memory is measured in a separate run
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, t2 - t1, peak
+
+
+def run(paths, k=7):
+    for path in paths:
+        def batch():
+            with open(path, 'rb') as f:
+                return batch_count_words(f.read(), k)
+
+        batch_top, batch_time, batch_peak = _measure(batch)
+        stream_top, stream_time, stream_peak = _measure(lambda: count_words(read_chunks(path), k))
+
+        print(path)
+        print(f'  batch:  time = {batch_time:.3f}s, peak = {batch_peak / 2 ** 20:.1f} MiB, {batch_top}')
+        print(f'  stream: time = {stream_time:.3f}s, peak = {stream_peak / 2 ** 20:.1f} MiB, {stream_top}')
+
+
+if __name__ == '__main__':
+    run(sys.argv[1:])